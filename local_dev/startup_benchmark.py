@@ -0,0 +1,289 @@
+"""
+Benchmarks the startup of RPT-RC so that startup wins can be held.
+
+Measures `python -m rptrc --help` cold, with no bytecode cached, and warm, and the warm startup of
+commands up to their first network call, which is answered by a stand-in transport so that the
+benchmark runs fully offline. Every run records its peak RSS, and the import cost of the CLI is
+broken down per module from `-X importtime`.
+
+poetry run benchmark_startup [--runs N] [--baseline FILE] [--write-baseline] [--max-regression R]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'local_dev', 'startup_baseline.json')
+DEFAULT_RUNS = 5
+DEFAULT_MAX_REGRESSION = 0.25
+TOP_IMPORTS = 15
+START_VARIABLE = 'RPTRC_BENCHMARK_START'
+
+BENCHMARK_REQUEST_BODY = json.dumps({
+    'poolName': 'benchmark',
+    'requestorDetails': {
+        'name': 'benchmark',
+        'area': 'benchmark',
+        'executionId': 'https://spinnaker.example.com/#/applications/benchmark/executions/details/benchmark',
+    },
+})
+COMMANDS = {
+    'create-queued-request': ['create-queued-request', '-b', BENCHMARK_REQUEST_BODY, '-ps', 'benchmark'],
+    'unreserve-environment': ['unreserve-environment', '-t', 'benchmark'],
+    'retrieve-test-environment-details': ['retrieve-test-environment-details', '-t', 'benchmark'],
+    'update-freshest-standby-test-environment-to-available':
+        ['update-freshest-standby-test-environment-to-available', '-pl', 'benchmark'],
+}
+
+# Runs a command in a fresh interpreter until its first network call, which the stand-in session
+# turns into an exception that no retry catches. Prints the seconds since the benchmark started the
+# interpreter and the request reached as the last line of stdout.
+FIRST_NETWORK_CALL_SCRIPT = '''
+import json, os, sys, time
+from rptrc.src.etc import transport
+
+
+class FirstNetworkCall(BaseException):
+    """Ends the command at its first network call"""
+
+
+class StandInSession:
+    """A session that sends nothing over the network"""
+    def __init__(self, proxy):
+        self.proxy = proxy
+
+    def __getattr__(self, method):
+        def send(url, **kwargs):
+            raise FirstNetworkCall(method.upper(), url)
+        return send
+
+    def close(self):
+        """Nothing to close"""
+
+
+transport.set_session_factory(StandInSession)
+from rptrc.src import app_cli
+try:
+    app_cli.cli_main.main(sys.argv[1:], prog_name='rptrc', standalone_mode=False)
+    first_network_call = None
+except FirstNetworkCall as network_call:
+    first_network_call = ' '.join(network_call.args)
+elapsed = time.time() - float(os.environ['RPTRC_BENCHMARK_START'])
+print(json.dumps({'elapsed': elapsed, 'first_network_call': first_network_call}))
+'''
+
+
+def run_interpreter(arguments, pycache_prefix):
+    """
+    Runs a fresh interpreter, measuring its wall time and peak RSS. Bytecode is always read from and
+    written to the cache directory passed in, so that whether a run is cold or warm is up to the caller.
+    :param arguments: The arguments passed to the interpreter
+    :param pycache_prefix: The directory bytecode is cached in
+    :return: elapsed, peak_rss_mb, stdout, stderr
+    :rtype: tuple
+    """
+    environment = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONPYCACHEPREFIX=pycache_prefix)
+    environment.pop('PYTHONDONTWRITEBYTECODE', None)
+    with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+        start = time.time()
+        environment[START_VARIABLE] = repr(start)
+        process = subprocess.Popen([sys.executable] + arguments,  # pylint: disable=consider-using-with
+                                   env=environment, cwd=REPO_ROOT,
+                                   stdout=stdout_file, stderr=stderr_file)
+        _, status, rusage = os.wait4(process.pid, 0)
+        elapsed = time.time() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stdout_file.seek(0)
+        stderr_file.seek(0)
+        stdout, stderr = stdout_file.read().decode('utf-8'), stderr_file.read().decode('utf-8')
+    if process.returncode != 0:
+        raise RuntimeError(f'{" ".join(arguments)} exited with {process.returncode}:\n{stderr}')
+    return elapsed, rusage.ru_maxrss / 1024, stdout, stderr
+
+
+def summarise(timings, peak_rss):
+    """
+    Summarises the runs of one benchmark
+    :param timings: The seconds taken by every run
+    :param peak_rss: The peak RSS in MB of every run
+    :return: summary
+    :rtype: dict
+    """
+    return {
+        'median_s': round(statistics.median(timings), 4),
+        'min_s': round(min(timings), 4),
+        'max_s': round(max(timings), 4),
+        'peak_rss_mb': round(max(peak_rss), 1),
+    }
+
+
+def benchmark_help(runs, warm_cache=None):
+    """
+    Benchmarks python -m rptrc --help
+    :param runs:
+    :param warm_cache: The bytecode cache to run with, or None to run every time with an empty cache
+    :return: summary
+    :rtype: dict
+    """
+    timings, peak_rss = [], []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cold_cache:
+            elapsed, rss, _, _ = run_interpreter(['-m', 'rptrc', '--help'], warm_cache or cold_cache)
+        timings.append(elapsed)
+        peak_rss.append(rss)
+    return summarise(timings, peak_rss)
+
+
+def benchmark_command(argv, runs, warm_cache):
+    """
+    Benchmarks the startup of a command up to its first network call
+    :param argv: The arguments of the command
+    :param runs:
+    :param warm_cache: The bytecode cache to run with
+    :return: summary
+    :rtype: dict
+    """
+    timings, peak_rss = [], []
+    first_network_call = None
+    run_interpreter(['-c', FIRST_NETWORK_CALL_SCRIPT] + argv, warm_cache)
+    for _ in range(runs):
+        _, rss, stdout, _ = run_interpreter(['-c', FIRST_NETWORK_CALL_SCRIPT] + argv, warm_cache)
+        result = json.loads(stdout.strip().splitlines()[-1])
+        timings.append(result['elapsed'])
+        peak_rss.append(rss)
+        first_network_call = result['first_network_call']
+    summary = summarise(timings, peak_rss)
+    summary['first_network_call'] = first_network_call
+    return summary
+
+
+def parse_import_times(importtime_output, top=TOP_IMPORTS):
+    """
+    Parses the output of -X importtime into the modules costing the most to import
+    :param importtime_output: The stderr of an interpreter run with -X importtime
+    :param top: The number of modules to keep
+    :return: total_ms, modules sorted by cumulative cost
+    :rtype: tuple
+    """
+    modules = []
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_ms': round(int(self_us) / 1000, 2),
+            'cumulative_ms': round(int(cumulative_us) / 1000, 2),
+        })
+    total_ms = round(sum(module['self_ms'] for module in modules), 2)
+    return total_ms, sorted(modules, key=lambda module: module['cumulative_ms'], reverse=True)[:top]
+
+
+def benchmark_imports(warm_cache):
+    """
+    Breaks down the warm import cost of python -m rptrc --help per module
+    :param warm_cache: The bytecode cache to run with
+    :return: breakdown
+    :rtype: dict
+    """
+    _, _, _, stderr = run_interpreter(['-X', 'importtime', '-m', 'rptrc', '--help'], warm_cache)
+    total_ms, modules = parse_import_times(stderr)
+    return {'total_ms': total_ms, 'modules': modules}
+
+
+def run_benchmarks(runs):
+    """
+    Runs every benchmark
+    :param runs: The number of runs per benchmark
+    :return: results
+    :rtype: dict
+    """
+    with tempfile.TemporaryDirectory() as warm_cache:
+        run_interpreter(['-m', 'rptrc', '--help'], warm_cache)
+        startup = {
+            'help_cold': benchmark_help(runs),
+            'help_warm': benchmark_help(runs, warm_cache),
+        }
+        for name, argv in COMMANDS.items():
+            startup[f'command:{name}'] = benchmark_command(argv, runs, warm_cache)
+        imports = benchmark_imports(warm_cache)
+    return {
+        'python': platform.python_version(),
+        'runs': runs,
+        'startup': startup,
+        'imports': imports,
+    }
+
+
+def compare_to_baseline(results, baseline, max_regression):
+    """
+    Prints the results beside the baseline and lists the benchmarks that regressed
+    :param results:
+    :param baseline:
+    :param max_regression: The fraction the median may grow by before it counts as a regression
+    :return: regressions
+    :rtype: list
+    """
+    regressions = []
+    print(f'{"benchmark":<65}{"median":>10}{"baseline":>10}{"change":>9}{"rss MB":>9}')
+    for name, summary in results['startup'].items():
+        baseline_summary = baseline.get('startup', {}).get(name)
+        if baseline_summary is None:
+            print(f'{name:<65}{summary["median_s"]:>10.3f}{"-":>10}{"-":>9}{summary["peak_rss_mb"]:>9.1f}')
+            continue
+        change = summary['median_s'] / baseline_summary['median_s'] - 1
+        print(f'{name:<65}{summary["median_s"]:>10.3f}{baseline_summary["median_s"]:>10.3f}'
+              f'{change:>+9.1%}{summary["peak_rss_mb"]:>9.1f}')
+        if change > max_regression:
+            regressions.append(name)
+    print(f'\nImporting the CLI took {results["imports"]["total_ms"]}ms, most costly modules:')
+    for module in results['imports']['modules']:
+        print(f'{module["cumulative_ms"]:>10.2f}ms{module["self_ms"]:>10.2f}ms self  {module["module"]}')
+    return regressions
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks and compares them with the baseline, failing when a benchmark regressed
+    :param argv:
+    """
+    parser = argparse.ArgumentParser(description='Benchmarks the startup of python -m rptrc')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--write-baseline', action='store_true',
+                        help='Stores the results as the baseline rather than comparing against it')
+    parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+                        help='The fraction a median may grow by over the baseline before failing')
+    parser.add_argument('--output', help='Also writes the results as JSON to this file')
+    arguments = parser.parse_args(argv)
+
+    results = run_benchmarks(arguments.runs)
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as out_file:
+            json.dump(results, out_file, indent=2)
+    if arguments.write_baseline:
+        with open(arguments.baseline, 'w', encoding='utf-8') as out_file:
+            json.dump(results, out_file, indent=2)
+            out_file.write('\n')
+        print(f'Baseline written to {arguments.baseline}')
+        return
+    baseline = {}
+    if os.path.isfile(arguments.baseline):
+        with open(arguments.baseline, 'r', encoding='utf-8') as in_file:
+            baseline = json.load(in_file)
+    regressions = compare_to_baseline(results, baseline, arguments.max_regression)
+    if regressions:
+        print(f'\nRegressed by more than {arguments.max_regression:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
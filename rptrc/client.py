@@ -0,0 +1,98 @@
+"""
+The thin client of the RPT-RC daemon started with `rptrc serve`.
+
+`python -m rptrc.client <command> [options]` forwards the command to the daemon listening on the
+socket in the RPTRC_SOCKET environment variable, streams back its output, writes the artifact
+properties files it generated and exits with its exit code. When no daemon is listening the command
+is run in-process instead. Only the standard library is imported unless that fallback is needed.
+"""
+
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET_PATH = '/tmp/rptrc.sock'
+ARTIFACT_FILES = ('/usr/src/app/in/artifact.properties', '/usr/src/app/out/artifact.properties')
+
+
+def read_artifact_files():
+    """
+    Reads the artifact properties files the command may read or append to
+    :return: artifacts by path
+    :rtype: dict
+    """
+    artifacts = {}
+    for file_path in ARTIFACT_FILES:
+        if os.path.isfile(file_path):
+            with open(file_path, 'r', encoding='utf-8') as in_stream:
+                artifacts[file_path] = in_stream.read()
+    return artifacts
+
+
+def write_artifact_files(artifacts):
+    """
+    Writes the artifact properties files generated by the command
+    :param artifacts: artifacts by path
+    """
+    for file_path, content in artifacts.items():
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w', encoding='utf-8') as out_file:
+            out_file.write(content)
+
+
+def connect(socket_path):
+    """
+    Connects to the daemon
+    :param socket_path:
+    :return: connection, or None if no daemon is listening
+    :rtype: socket.socket
+    """
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def run_in_daemon(connection, argv):
+    """
+    Runs the command in the daemon, relaying its output
+    :param connection:
+    :param argv:
+    :return: exit_code
+    :rtype: int
+    """
+    with connection:
+        connection.sendall(json.dumps({'argv': argv, 'artifacts': read_artifact_files()}).encode('utf-8') + b'\n')
+        for line in connection.makefile('rb'):
+            message = json.loads(line)
+            if 'exit_code' in message:
+                write_artifact_files(message['artifacts'])
+                return message['exit_code']
+            stream = sys.stdout if message['stream'] == 'stdout' else sys.stderr
+            stream.write(message['data'])
+            stream.flush()
+    sys.stderr.write('Error: The RPT-RC daemon stopped before the command completed\n')
+    return 1
+
+
+def main(argv=None):
+    """
+    Runs the command in the daemon, or in-process if no daemon is listening
+    :param argv: Defaults to the arguments passed on the command line
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    connection = connect(os.environ.get('RPTRC_SOCKET', DEFAULT_SOCKET_PATH))
+    if connection is None:
+        from rptrc.src import app_cli  # pylint: disable=import-outside-toplevel
+        app_cli.cli_main.main(args=argv, prog_name='rptrc')
+    sys.exit(run_in_daemon(connection, argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,20 @@
 """
 This is the CLI for the Pooling Tooling REST client.
+
+The operators, and through them the HTTP stack, are imported by each command when it runs rather
+than when the CLI is loaded, so that parsing arguments and commands that fail early stay fast.
 """
+# pylint: disable=import-outside-toplevel, too-many-locals
 import json
 import logging
 
 import click
 
 from rptrc.src.etc import logging_utils
+from rptrc.src.etc.deadline import Deadline
 from rptrc.src.etc.exceptions import FatalException
-from rptrc.src.operators.property_converter import PropertyConverter
-from rptrc.src.operators.requests import Requests
-from rptrc.src.operators.test_environments import TestEnvironments
-from rptrc.src.operators.artifact_properties import ArtifactProperties
-from rptrc.src.operators.pools import Pools
+from rptrc.src.etc.polling import WAIT_MODES, get_polling_strategy
+from rptrc.src.etc.retry_policy import RETRY_POLICIES
 
 
 def log_verbose_option(func):
@@ -91,7 +93,8 @@ def version_to_compare_environment_against_option(func):
     """A decorator for the version_to_compare_environment_against command line argument."""
     return click.option('-vfc', '--version_for_comparison', type=click.STRING, required=True,
                         help='The version of helmfile to compare against the version currently '
-                             'deployed on the environment')(func)
+                             'deployed on the environment, which must equal it exactly. Can also be a '
+                             'specification such as ">=2.1.0,<3", "~=2.1.0" or "2.1.0-56 || 2.1.0-57"')(func)
 
 
 def logging_identifier_option(func):
@@ -106,6 +109,80 @@ def retry_timeout_option(func):
                         help='The timeout in seconds between retry requests if the target host is not found')(func)
 
 
+def retry_policy_option(func):
+    """A decorator for the retry policy command line argument"""
+    return click.option('-rp', '--retry_policy', type=click.Choice(list(RETRY_POLICIES)),
+                        required=False, default=None,
+                        help='The policy deciding how long to wait between retry requests. '
+                             'Defaults to the policies set in application.ini')(func)
+
+
+def command_timeout_option(func):
+    """A decorator for the command timeout command line argument"""
+    return click.option('-ct', '--command_timeout', type=click.FLOAT, required=False, default=None,
+                        help='The overall time in seconds the command may take, including every retry and '
+                             'wait. Defaults to no overall limit')(func)
+
+
+def poll_min_interval_option(func):
+    """A decorator for the poll minimum interval command line argument"""
+    return click.option('-pmin', '--poll_min_interval', type=click.FLOAT, required=False, default=None,
+                        help='The seconds to wait before first polling a queued request again. '
+                             'Defaults to the interval set in application.ini')(func)
+
+
+def poll_max_interval_option(func):
+    """A decorator for the poll maximum interval command line argument"""
+    return click.option('-pmax', '--poll_max_interval', type=click.FLOAT, required=False, default=None,
+                        help='The most seconds to wait between polls of a queued request. '
+                             'Defaults to the interval set in application.ini')(func)
+
+
+def wait_mode_option(func):
+    """A decorator for the wait mode command line argument"""
+    return click.option('-wm', '--wait_mode', type=click.Choice(list(WAIT_MODES)), required=False, default=None,
+                        help='How to wait for the queued request. auto long polls RPT and falls back to polling '
+                             'when RPT does not support it. Defaults to the wait mode set in application.ini')(func)
+
+
+def socket_path_option(func):
+    """A decorator for the socket path command line argument"""
+    return click.option('-sp', '--socket_path', type=click.STRING, required=False, default=None,
+                        help='The Unix socket to serve on. Defaults to the socket set in application.ini')(func)
+
+
+def concurrency_option(func):
+    """A decorator for the concurrency command line argument"""
+    return click.option('-c', '--concurrency', type=click.IntRange(min=1), required=False, default=None,
+                        help='The maximum number of requests towards RPT to run at the same time. '
+                             'Defaults to the concurrency set in application.ini')(func)
+
+
+def query_fields_option(func):
+    """A decorator for the query fields command line argument"""
+    return click.option('-f', '--fields', type=click.STRING, required=False, default=None,
+                        help='The comma separated fields to output, out of id, name, status, pools, stage, '
+                             'version and properties.<key>. Defaults to all but the properties')(func)
+
+
+def query_sort_option(func):
+    """A decorator for the query sort command line argument"""
+    return click.option('-s', '--sort', type=click.STRING, required=False, default=None,
+                        help='The field to order the test environments by. Defaults to their name')(func)
+
+
+def query_descending_option(func):
+    """A decorator for the query descending command line argument"""
+    return click.option('-d', '--descending', type=click.BOOL, is_flag=True, required=False,
+                        help='Order the test environments from the highest value down')(func)
+
+
+def query_output_option(func):
+    """A decorator for the query output format command line argument"""
+    return click.option('-o', '--output', type=click.Choice(['ndjson', 'table']), required=False, default='ndjson',
+                        help='Output one JSON document per line or a table')(func)
+
+
 @click.group()
 def cli_main():
     """
@@ -122,13 +199,23 @@ def cli_main():
 @generate_artifact_properties_option
 @logging_identifier_option
 @retry_timeout_option
-def create_queued_request(verbose,
+@retry_policy_option
+@command_timeout_option
+@poll_min_interval_option
+@poll_max_interval_option
+@wait_mode_option
+def create_queued_request(verbose,  # pylint: disable=too-many-arguments
                           dev_mode,
                           request_body: str,
                           pipeline_stage,
                           generate_artifact_properties,
                           retry_timeout,
+                          retry_policy,
                           logging_identifier=None,
+                          command_timeout=None,
+                          poll_min_interval=None,
+                          poll_max_interval=None,
+                          wait_mode=None,
                           ):
     """
     Creates an instance of the Request entity in RPT with a queued status.
@@ -141,15 +228,26 @@ def create_queued_request(verbose,
     :param generate_artifact_properties:
     :param logging_identifier:
     :param retry_timeout:
-    """
+    :param retry_policy:
+    :param command_timeout:
+    :param poll_min_interval:
+    :param poll_max_interval:
+    :param wait_mode:
+    """
+    from rptrc.src.operators.artifact_properties import ArtifactProperties
+    from rptrc.src.operators.requests import Requests
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose, logging_identifier)
-    requests = Requests(dev_mode, retry_timeout)
-    request = requests.create_queued_request(json.loads(request_body))
+    deadline = Deadline(command_timeout)
+    requests = Requests(dev_mode, retry_timeout, deadline=deadline,
+                        polling_strategy=get_polling_strategy(poll_min_interval, poll_max_interval),
+                        retry_policy=retry_policy)
+    request = requests.create_queued_request(json.loads(request_body), pipeline_stage)
     if generate_artifact_properties:
         artifact_properties = ArtifactProperties({'REQUEST_ID': request['id']})
         artifact_properties.generate()
-    request = requests.wait_for_the_queued_request_be_resolved(request['id'])
-    test_environment = TestEnvironments(dev_mode, retry_timeout, None)
+    request = requests.wait_for_request_to_be_resolved(request['id'], wait_mode)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, None, deadline=deadline, retry_policy=retry_policy)
     test_environment_patch_response = \
         test_environment.update_test_environment_stage(pipeline_stage, request['testEnvironmentId'])
     if generate_artifact_properties:
@@ -162,17 +260,24 @@ def create_queued_request(verbose,
 @log_verbose_option
 @dev_mode_option
 @retry_timeout_option
-def abort_queued_request(verbose, dev_mode, retry_timeout):
+@retry_policy_option
+@command_timeout_option
+def abort_queued_request(verbose, dev_mode, retry_timeout, retry_policy, command_timeout):
     """
     Aborts a queued request using the ID stored in the local artifact.properties file.
     :param verbose:
     :param dev_mode:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.artifact_properties import ArtifactProperties
+    from rptrc.src.operators.requests import Requests
     logging_utils.initialize_logging(verbose)
+    deadline = Deadline(command_timeout)
     artifact_properties = ArtifactProperties()
     request_id = artifact_properties.read()['REQUEST_ID']
-    requests_operator = Requests(dev_mode, retry_timeout)
+    requests_operator = Requests(dev_mode, retry_timeout, deadline=deadline, retry_policy=retry_policy)
     requests_operator.abort_request_by_id(request_id)
 
 
@@ -181,16 +286,23 @@ def abort_queued_request(verbose, dev_mode, retry_timeout):
 @dev_mode_option
 @test_environment_name_option
 @retry_timeout_option
-def unreserve_environment(verbose, dev_mode, test_environment_name, retry_timeout):
+@retry_policy_option
+@command_timeout_option
+def unreserve_environment(verbose, dev_mode, test_environment_name, retry_timeout, retry_policy, command_timeout):
     """
     Unreserves a test environment in RPT.
     :param verbose:
     :param dev_mode:
     :param test_environment_name:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name)
+    deadline = Deadline(command_timeout)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name, deadline=deadline,
+                                        retry_policy=retry_policy)
     test_environment.unreserve_test_environment()
 
 
@@ -199,16 +311,23 @@ def unreserve_environment(verbose, dev_mode, test_environment_name, retry_timeou
 @dev_mode_option
 @test_environment_name_option
 @retry_timeout_option
-def quarantine_environment(verbose, dev_mode, test_environment_name, retry_timeout):
+@retry_policy_option
+@command_timeout_option
+def quarantine_environment(verbose, dev_mode, test_environment_name, retry_timeout, retry_policy, command_timeout):
     """
     Quarantines a test environment in RPT.
     :param verbose:
     :param dev_mode:
     :param test_environment_name:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name)
+    deadline = Deadline(command_timeout)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name, deadline=deadline,
+                                        retry_policy=retry_policy)
     test_environment.quarantine_test_environment()
 
 
@@ -217,16 +336,24 @@ def quarantine_environment(verbose, dev_mode, test_environment_name, retry_timeo
 @dev_mode_option
 @test_environment_name_option
 @retry_timeout_option
-def set_standby_environment_to_available(verbose, dev_mode, test_environment_name, retry_timeout):
+@retry_policy_option
+@command_timeout_option
+def set_standby_environment_to_available(verbose, dev_mode, test_environment_name, retry_timeout,
+                                         retry_policy, command_timeout):
     """
     Sets a standby test environment to available in RPT.
     :param verbose:
     :param dev_mode:
     :param test_environment_name:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name)
+    deadline = Deadline(command_timeout)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name, deadline=deadline,
+                                        retry_policy=retry_policy)
     test_environment.set_standby_test_environment_to_available()
 
 
@@ -236,7 +363,10 @@ def set_standby_environment_to_available(verbose, dev_mode, test_environment_nam
 @test_environment_name_option
 @pipeline_stage_option
 @retry_timeout_option
-def update_test_environment_stage(verbose, dev_mode, test_environment_name, pipeline_stage, retry_timeout):
+@retry_policy_option
+@command_timeout_option
+def update_test_environment_stage(verbose, dev_mode, test_environment_name, pipeline_stage, retry_timeout, retry_policy,
+                                  command_timeout):
     """
     Updates the stage of a test environment in RPT.
     :param verbose:
@@ -244,9 +374,14 @@ def update_test_environment_stage(verbose, dev_mode, test_environment_name, pipe
     :param test_environment_name:
     :param pipeline_stage:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name)
+    deadline = Deadline(command_timeout)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name, deadline=deadline,
+                                        retry_policy=retry_policy)
     test_environment.update_test_environment_stage(pipeline_stage)
 
 
@@ -256,7 +391,10 @@ def update_test_environment_stage(verbose, dev_mode, test_environment_name, pipe
 @test_environment_name_option
 @request_body_option
 @retry_timeout_option
-def store_test_environment_details(verbose, dev_mode, test_environment_name, request_body, retry_timeout):
+@retry_policy_option
+@command_timeout_option
+def store_test_environment_details(verbose, dev_mode, test_environment_name, request_body, retry_timeout, retry_policy,
+                                   command_timeout):
     """
     Updates the details/properties of a test environment in RPT.
     :param verbose:
@@ -264,16 +402,21 @@ def store_test_environment_details(verbose, dev_mode, test_environment_name, req
     :param test_environment_name:
     :param request_body:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.property_converter import PropertyConverter
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name)
+    deadline = Deadline(command_timeout)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name, deadline=deadline,
+                                        retry_policy=retry_policy)
     request_body_dict = json.loads(request_body)
     property_converter = PropertyConverter(request_body_dict)
     converted_request_body_dict = property_converter.convert_properties('uppercase_to_camelcase')
     converted_request_body = json.dumps(converted_request_body_dict)
-    patch_url = f'{test_environment.test_environment_url}/' \
-                f'{test_environment.retrieve_test_environment_by_name()["id"]}'
-    test_environment.patch(patch_url, converted_request_body)
+    test_environment.update_test_environment_details(converted_request_body,
+                                                     test_environment.retrieve_test_environment_by_name()["id"])
 
 
 @cli_main.command()
@@ -282,7 +425,12 @@ def store_test_environment_details(verbose, dev_mode, test_environment_name, req
 @pool_name_option
 @request_body_option
 @retry_timeout_option
-def store_details_for_test_environments_by_pool(verbose, dev_mode, pool_name, request_body, retry_timeout):
+@retry_policy_option
+@command_timeout_option
+@concurrency_option
+def store_details_for_test_environments_by_pool(verbose,  # pylint: disable=too-many-arguments
+                                                dev_mode, pool_name, request_body, retry_timeout, retry_policy,
+                                                concurrency, command_timeout):
     """
     Updates the details/properties of all test environments in a specified pool in RPT.
     :param verbose:
@@ -290,9 +438,16 @@ def store_details_for_test_environments_by_pool(verbose, dev_mode, pool_name, re
     :param pool_name:
     :param request_body:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
+    :param concurrency:
     """
+    from rptrc.src.operators.pools import Pools
+    from rptrc.src.operators.property_converter import PropertyConverter
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    pool = Pools(dev_mode, retry_timeout, pool_name)
+    deadline = Deadline(command_timeout)
+    pool = Pools(dev_mode, retry_timeout, pool_name, deadline=deadline, retry_policy=retry_policy)
     test_environments_in_pool = pool.retrieve_test_environments_by_pool(pool_name)
 
     request_body_dict = json.loads(request_body)
@@ -300,11 +455,9 @@ def store_details_for_test_environments_by_pool(verbose, dev_mode, pool_name, re
     converted_request_body_dict = property_converter.convert_properties('uppercase_to_camelcase')
     converted_request_body = json.dumps(converted_request_body_dict)
 
-    for test_environment_id in test_environments_in_pool:
-        test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_id=test_environment_id)
-        patch_url = f'{test_environment.test_environment_url}/' \
-                    f'{test_environment.retrieve_test_environment_by_id()["id"]}'
-        test_environment.patch(patch_url, converted_request_body)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, deadline=deadline, retry_policy=retry_policy)
+    test_environment.update_details_for_test_environments(converted_request_body, test_environments_in_pool,
+                                                          concurrency)
 
 
 @cli_main.command()
@@ -313,8 +466,10 @@ def store_details_for_test_environments_by_pool(verbose, dev_mode, pool_name, re
 @test_environment_name_option
 @generate_artifact_properties_option
 @retry_timeout_option
+@retry_policy_option
+@command_timeout_option
 def retrieve_test_environment_details(verbose, dev_mode, test_environment_name,
-                                      generate_artifact_properties, retry_timeout):
+                                      generate_artifact_properties, retry_timeout, retry_policy, command_timeout):
     """
     Retrieves the details/properties of a test environment in RPT.
     :param verbose:
@@ -322,9 +477,16 @@ def retrieve_test_environment_details(verbose, dev_mode, test_environment_name,
     :param test_environment_name:
     :param generate_artifact_properties:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.artifact_properties import ArtifactProperties
+    from rptrc.src.operators.property_converter import PropertyConverter
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name)
+    deadline = Deadline(command_timeout)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name, deadline=deadline,
+                                        retry_policy=retry_policy)
     test_environment_details = test_environment.retrieve_test_environment_by_name()["properties"]
     property_converter = PropertyConverter(test_environment_details)
     converted_test_environment_details = property_converter.convert_properties('camelcase_to_uppercase')
@@ -339,8 +501,11 @@ def retrieve_test_environment_details(verbose, dev_mode, test_environment_name,
 @test_environment_name_option
 @version_to_compare_environment_against_option
 @retry_timeout_option
+@retry_policy_option
+@command_timeout_option
 def fail_if_version_specified_equals_version_on_test_environment(verbose, dev_mode, test_environment_name,
-                                                                 version_for_comparison, retry_timeout):
+                                                                 version_for_comparison, retry_timeout, retry_policy,
+                                                                 command_timeout):
     """
     Checks if the "version" present on the test environment equals that which was passed in
     If they are the same, we raise an Exception and fail the pipeline as we believe the test
@@ -350,11 +515,17 @@ def fail_if_version_specified_equals_version_on_test_environment(verbose, dev_mo
     :param test_environment_name:
     :param version_for_comparison:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.etc.versions import version_matches
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name)
+    deadline = Deadline(command_timeout)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name, deadline=deadline,
+                                        retry_policy=retry_policy)
     test_environment_details = test_environment.retrieve_test_environment_by_name()
-    if test_environment_details['properties']['version'] == version_for_comparison:
+    if version_matches(test_environment_details['properties']['version'], version_for_comparison):
         exception_message = ('Not continuing with pipeline as version on system is the same as '
                              'that passed into this job.')
         logging.critical(exception_message)
@@ -368,11 +539,14 @@ def fail_if_version_specified_equals_version_on_test_environment(verbose, dev_mo
 @version_to_compare_environment_against_option
 @generate_artifact_properties_option
 @retry_timeout_option
-def check_if_version_specified_equals_version_on_test_environment(verbose, dev_mode,
+@retry_policy_option
+@command_timeout_option
+def check_if_version_specified_equals_version_on_test_environment(verbose,  # pylint: disable=too-many-arguments
+                                                                  dev_mode,
                                                                   test_environment_name,
                                                                   version_for_comparison,
                                                                   generate_artifact_properties,
-                                                                  retry_timeout):
+                                                                  retry_timeout, retry_policy, command_timeout):
     """
     Checks if the "version" present on the test environment equals that which was passed in
     and generates artifact.properties file containing result of the check
@@ -382,9 +556,15 @@ def check_if_version_specified_equals_version_on_test_environment(verbose, dev_m
     :param version_for_comparison:
     :param generate_artifact_properties:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.artifact_properties import ArtifactProperties
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name)
+    deadline = Deadline(command_timeout)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, test_environment_name, deadline=deadline,
+                                        retry_policy=retry_policy)
     result_of_check_if_test_environment_on_specified_version = \
         test_environment.check_if_test_environment_on_specified_version(version_for_comparison)
     if generate_artifact_properties:
@@ -399,8 +579,11 @@ def check_if_version_specified_equals_version_on_test_environment(verbose, dev_m
 @pool_name_option
 @generate_artifact_properties_option
 @retry_timeout_option
+@retry_policy_option
+@command_timeout_option
 def update_freshest_standby_test_environment_to_available(verbose, dev_mode, pool_name,
-                                                          generate_artifact_properties, retry_timeout):
+                                                          generate_artifact_properties, retry_timeout,
+                                                          retry_policy, command_timeout):
     """
     Updates the status of the freshest standby test environment to available in a specified
     pool in RPT and generates artifact.properties file containing the id of updated environment
@@ -409,20 +592,31 @@ def update_freshest_standby_test_environment_to_available(verbose, dev_mode, poo
     :param pool_name:
     :param generate_artifact_properties:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.artifact_properties import ArtifactProperties
+    from rptrc.src.operators.pools import Pools
+    from rptrc.src.operators.test_environments import TestEnvironments
+    from rptrc.src.query import load_inventory
     logging_utils.initialize_logging(verbose)
-
-    pool = Pools(dev_mode, retry_timeout, pool_name)
-    test_environments_in_pool_ids = pool.retrieve_test_environments_by_pool(pool_name)
-
-    test_environment = TestEnvironments(dev_mode, retry_timeout)
-    standby_test_environments_in_pool = test_environment \
-        .retrieve_standby_test_environments(test_environments_in_pool_ids)
-
-    standby_test_environments_in_pool_ids_string = ",".join(standby_test_environments_in_pool)
-
-    freshest_standby_test_environment_in_pool = test_environment \
-        .retrieve_freshest_test_environment(standby_test_environments_in_pool_ids_string)
+    deadline = Deadline(command_timeout)
+
+    test_environment = TestEnvironments(dev_mode, retry_timeout, deadline=deadline, retry_policy=retry_policy)
+    if test_environment.freshest_selection == 'local':
+        test_environment.inventory = load_inventory(test_environment, test_environment.mirror)
+        freshest_standby_test_environment_in_pool = test_environment \
+            .retrieve_freshest_standby_test_environment_in_pool(pool_name)
+    else:
+        pool = Pools(dev_mode, retry_timeout, pool_name, deadline=deadline, retry_policy=retry_policy)
+        test_environments_in_pool_ids = pool.retrieve_test_environments_by_pool(pool_name, refresh=True)
+        standby_test_environments_in_pool = test_environment \
+            .retrieve_standby_test_environments(test_environments_in_pool_ids)
+
+        standby_test_environments_in_pool_ids_string = ",".join(standby_test_environments_in_pool)
+
+        freshest_standby_test_environment_in_pool = test_environment \
+            .retrieve_freshest_test_environment(standby_test_environments_in_pool_ids_string)
     test_environment.test_environment_name = freshest_standby_test_environment_in_pool["name"]
     test_environment.set_standby_test_environment_to_available()
 
@@ -439,9 +633,13 @@ def update_freshest_standby_test_environment_to_available(verbose, dev_mode, poo
 @pool_to_swap_environment_from_option
 @pool_to_swap_environment_to_option
 @retry_timeout_option
-def swap_in_available_environment_swap_out_current_environment(verbose, dev_mode, test_environment_name,
+@retry_policy_option
+@command_timeout_option
+def swap_in_available_environment_swap_out_current_environment(verbose,  # pylint: disable=too-many-arguments
+                                                               dev_mode, test_environment_name,
                                                                pool_to_swap_environment_from,
-                                                               pool_to_swap_environment_to, retry_timeout):
+                                                               pool_to_swap_environment_to, retry_timeout, retry_policy,
+                                                               command_timeout):
     """
     Swaps into destination pool, the environment with the id retrieved from the artifact.properties file
     and swaps out the named environment to the source pool.
@@ -451,24 +649,31 @@ def swap_in_available_environment_swap_out_current_environment(verbose, dev_mode
     :param pool_to_swap_environment_from:
     :param pool_to_swap_environment_to:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.inventory import Inventory
+    from rptrc.src.operators.artifact_properties import ArtifactProperties
+    from rptrc.src.operators.pools import Pools
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    pool = Pools(dev_mode, retry_timeout, 'new_pool')
-    artifact_properties = ArtifactProperties()
-    test_environment_id = artifact_properties.read()['AVAILABLE_TEST_ENVIRONMENT_ID']
-
-    test_environment_to_swap_in = TestEnvironments(dev_mode, retry_timeout, test_environment_id=test_environment_id)
-    test_environment_to_swap_in_pools = test_environment_to_swap_in.retrieve_test_environment_by_id()["pools"]
+    deadline = Deadline(command_timeout)
+    inventory = Inventory()
+    pool = Pools(dev_mode, retry_timeout, 'new_pool', deadline=deadline, retry_policy=retry_policy)
+    test_environment_id = ArtifactProperties().read()['AVAILABLE_TEST_ENVIRONMENT_ID']
 
+    test_environment_to_swap_in = TestEnvironments(dev_mode, retry_timeout, test_environment_id=test_environment_id,
+                                                   deadline=deadline, inventory=inventory, retry_policy=retry_policy)
     updated_test_environment_to_swap_in_pools = pool.update_list_of_pools(
-        test_environment_to_swap_in_pools, pool_to_swap_environment_from,
+        test_environment_to_swap_in.retrieve_test_environment_by_id()["pools"], pool_to_swap_environment_from,
         pool_to_swap_environment_to)
 
     test_environment_to_swap_in.update_test_environment_pool(
         updated_test_environment_to_swap_in_pools, test_environment_id)
 
     test_environment_to_swap_out = TestEnvironments(dev_mode, retry_timeout,
-                                                    test_environment_name=test_environment_name)
+                                                    test_environment_name=test_environment_name, deadline=deadline,
+                                                    inventory=inventory, retry_policy=retry_policy)
     test_environment_to_swap_out_pools = test_environment_to_swap_out.retrieve_test_environment_by_name()["pools"]
 
     updated_test_environment_to_swap_out_pools = pool.update_list_of_pools(
@@ -486,8 +691,11 @@ def swap_in_available_environment_swap_out_current_environment(verbose, dev_mode
 @pool_to_swap_environment_from_option
 @pool_to_swap_environment_to_option
 @retry_timeout_option
-def swap_test_environment_pool(verbose, dev_mode, test_environment_name, pool_to_swap_environment_from,
-                               pool_to_swap_environment_to, retry_timeout):
+@retry_policy_option
+@command_timeout_option
+def swap_test_environment_pool(verbose,  # pylint: disable=too-many-arguments
+                               dev_mode, test_environment_name, pool_to_swap_environment_from,
+                               pool_to_swap_environment_to, retry_timeout, retry_policy, command_timeout):
     """
     Swaps the pool of the environment passed in
     :param verbose:
@@ -496,11 +704,17 @@ def swap_test_environment_pool(verbose, dev_mode, test_environment_name, pool_to
     :param pool_to_swap_environment_from:
     :param pool_to_swap_environment_to:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.pools import Pools
+    from rptrc.src.operators.test_environments import TestEnvironments
     logging_utils.initialize_logging(verbose)
-    pool = Pools(dev_mode, retry_timeout, 'new_pool')
+    deadline = Deadline(command_timeout)
+    pool = Pools(dev_mode, retry_timeout, 'new_pool', deadline=deadline, retry_policy=retry_policy)
     test_env_to_swap_out_of_pool = TestEnvironments(dev_mode, retry_timeout,
-                                                    test_environment_name=test_environment_name)
+                                                    test_environment_name=test_environment_name, deadline=deadline,
+                                                    retry_policy=retry_policy)
     info_of_test_env_to_swap_out_of_pool = test_env_to_swap_out_of_pool.retrieve_test_environment_by_name()
     list_of_pools_attached_to_env = pool.update_list_of_pools(
         info_of_test_env_to_swap_out_of_pool['pools'], pool_to_swap_environment_from, pool_to_swap_environment_to)
@@ -515,9 +729,13 @@ def swap_test_environment_pool(verbose, dev_mode, test_environment_name, pool_to
 @pool_to_swap_environment_to_option
 @generate_artifact_properties_option
 @retry_timeout_option
-def update_freshest_standby_env_to_available_and_swap_its_pool(verbose, dev_mode, pool_to_swap_environment_from,
+@retry_policy_option
+@command_timeout_option
+def update_freshest_standby_env_to_available_and_swap_its_pool(verbose,  # pylint: disable=too-many-arguments
+                                                               dev_mode, pool_to_swap_environment_from,
                                                                pool_to_swap_environment_to,
-                                                               generate_artifact_properties, retry_timeout):
+                                                               generate_artifact_properties, retry_timeout,
+                                                               retry_policy, command_timeout):
     """
     This will find the freshest standby environment in the specified pool.
     It will swap its status to Available and will swap the pool the environment is in
@@ -527,20 +745,30 @@ def update_freshest_standby_env_to_available_and_swap_its_pool(verbose, dev_mode
     :param pool_to_swap_environment_to:
     :param generate_artifact_properties:
     :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
     """
+    from rptrc.src.operators.artifact_properties import ArtifactProperties
+    from rptrc.src.operators.pools import Pools
+    from rptrc.src.operators.test_environments import TestEnvironments
+    from rptrc.src.query import load_inventory
     logging_utils.initialize_logging(verbose)
-
-    pool = Pools(dev_mode, retry_timeout, pool_to_swap_environment_from)
-    test_envs_in_specified_pool = pool.retrieve_test_environments_by_pool(pool_to_swap_environment_from)
-
-    test_env = TestEnvironments(dev_mode, retry_timeout)
-    standby_test_environments_in_pool = test_env.retrieve_standby_test_environments(
-        test_envs_in_specified_pool)
-
-    standby_test_env_in_pool_ids_string = ','.join(standby_test_environments_in_pool)
-
-    freshest_standby_test_env_in_pool = test_env.retrieve_freshest_test_environment(
-        standby_test_env_in_pool_ids_string)
+    deadline = Deadline(command_timeout)
+
+    pool = Pools(dev_mode, retry_timeout, pool_to_swap_environment_from, deadline=deadline, retry_policy=retry_policy)
+    test_env = TestEnvironments(dev_mode, retry_timeout, deadline=deadline, retry_policy=retry_policy)
+    if test_env.freshest_selection == 'local':
+        test_env.inventory = load_inventory(test_env, test_env.mirror)
+        freshest_standby_test_env_in_pool = test_env.retrieve_freshest_standby_test_environment_in_pool(
+            pool_to_swap_environment_from)
+    else:
+        test_envs_in_specified_pool = pool.retrieve_test_environments_by_pool(
+            pool_to_swap_environment_from, refresh=True)
+        standby_test_environments_in_pool = test_env.retrieve_standby_test_environments(
+            test_envs_in_specified_pool)
+
+        freshest_standby_test_env_in_pool = test_env.retrieve_freshest_test_environment(
+            ','.join(standby_test_environments_in_pool))
 
     test_env.test_environment_name = freshest_standby_test_env_in_pool['name']
 
@@ -554,3 +782,113 @@ def update_freshest_standby_env_to_available_and_swap_its_pool(verbose, dev_mode
         artifact_properties = ArtifactProperties({"SWAPPED_IN_TEST_ENVIRONMENT_NAME":
                                                   test_env.test_environment_name})
         artifact_properties.generate()
+
+
+@cli_main.command()
+@log_verbose_option
+@dev_mode_option
+@click.argument('expression', required=False, default='')
+@query_fields_option
+@query_sort_option
+@query_descending_option
+@query_output_option
+@retry_timeout_option
+@retry_policy_option
+@command_timeout_option
+def query(verbose, dev_mode, expression, fields, sort,  # pylint: disable=too-many-arguments
+          descending, output, retry_timeout, retry_policy, command_timeout):
+    """
+    Lists the test environments matching a filter expression e.g.
+    "status=Standby and pool=product-staging and version<1.2.3". Conditions are joined by "and" and
+    compare id, name, status, pool, stage, version or properties.<key> using =, !=, <, <=, > or >=.
+    The test environments are read from the mirror of RPT when it is enabled and fresh.
+    :param verbose:
+    :param dev_mode:
+    :param expression:
+    :param fields:
+    :param sort:
+    :param descending:
+    :param output:
+    :param retry_timeout:
+    :param retry_policy:
+    :param command_timeout:
+    """
+    from rptrc.src.mirror import get_mirror
+    from rptrc.src.operators.test_environments import TestEnvironments
+    from rptrc.src.query import (OUTPUT_FIELDS, check_field, format_rows, load_inventory, parse_fields, parse_query,
+                                 project, run_query)
+    logging_utils.initialize_logging(verbose)
+    conditions = parse_query(expression)
+    output_fields = parse_fields(fields)
+    if sort is not None:
+        check_field(sort, OUTPUT_FIELDS)
+    test_environment = TestEnvironments(dev_mode, retry_timeout, deadline=Deadline(command_timeout),
+                                        retry_policy=retry_policy)
+    inventory = load_inventory(test_environment, get_mirror())
+    rows = project(run_query(inventory, conditions, sort, descending), output_fields)
+    for line in format_rows(rows, output_fields, output):
+        click.echo(line)
+
+
+@cli_main.command()
+@log_verbose_option
+@dev_mode_option
+@retry_timeout_option
+@retry_policy_option
+@socket_path_option
+def waiter(verbose, dev_mode, retry_timeout, retry_policy, socket_path):
+    """
+    Runs the reservation waiter for the agent. While it runs, create_queued_request hands its wait
+    for the queued request to the waiter, which polls every outstanding request once for all the
+    invocations waiting on it.
+    :param verbose:
+    :param dev_mode:
+    :param retry_timeout:
+    :param retry_policy:
+    :param socket_path:
+    """
+    from rptrc.src import configuration
+    from rptrc.src.etc.waiter import Waiter, serve_waiter
+    from rptrc.src.operators.requests import Requests
+    logging_utils.initialize_logging(verbose)
+    constants = configuration.get_config()
+    sweep_timeout = constants.getfloat('WAITER', 'sweep_timeout', fallback=10)
+    requests = Requests(dev_mode, min(retry_timeout, sweep_timeout), retry_policy=retry_policy)
+    serve_waiter(socket_path or requests.waiter_socket_path,
+                 Waiter(requests,
+                        sweep_interval=constants.getfloat('WAITER', 'sweep_interval', fallback=1),
+                        concurrency=constants.getint('PERFORMANCE', 'scan_concurrency', fallback=8),
+                        sweep_timeout=sweep_timeout),
+                 constants.getfloat('WAITER', 'max_wait', fallback=3600))
+
+
+@cli_main.command()
+@log_verbose_option
+@socket_path_option
+def serve(verbose, socket_path):
+    """
+    Runs RPT-RC as a daemon keeping its HTTP sessions and configuration warm between commands.
+    While it runs, any command can be sent to it with the thin client: python -m rptrc.client
+    :param verbose:
+    :param socket_path:
+    """
+    from rptrc.src import configuration
+    from rptrc.src.daemon import serve_daemon
+    logging_utils.initialize_logging(verbose)
+    serve_daemon(socket_path or configuration.get_config().get('DAEMON', 'socket_path'), cli_main)
+
+
+@cli_main.command()
+@log_verbose_option
+@click.argument('plan_file', type=click.Path(exists=True, dir_okay=False))
+def run_plan(verbose, plan_file):
+    """
+    Runs the commands listed in a JSON plan one after another in this process. Later steps can reference
+    the artifact properties generated by earlier ones as ${KEY}, and a single artifact.properties file
+    holding those generated by every step is written once all steps have succeeded.
+    :param verbose:
+    :param plan_file:
+    """
+    from rptrc.src import plan
+    logging_utils.initialize_logging(verbose)
+    plan.run_plan(cli_main, plan.load_plan(plan_file))
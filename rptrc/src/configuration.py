@@ -1,9 +1,12 @@
 """This module contains configuration functions."""
 
-
+import os
+import threading
 from configparser import ConfigParser
 from os.path import expanduser, join, dirname
 
+ENVIRONMENT_OVERRIDE_PREFIX = 'RPTRC_'
+
 
 # pylint: disable=too-many-ancestors
 class ApplicationConfig(ConfigParser):
@@ -23,3 +26,76 @@ class ApplicationConfig(ConfigParser):
             join(dirname(__file__), 'etc/application.ini'),
             expanduser('~/.application.ini')
         ], encoding=None)
+
+
+class FrozenApplicationConfig(ApplicationConfig):
+    """
+    The application config shared by the whole process. Environment variables named
+    RPTRC_<SECTION>_<OPTION> override the options read from the application.ini files, e.g.
+    RPTRC_PERFORMANCE_CONNECTION_POOL_SIZE=20, after which the config can no longer be changed.
+    """
+
+    def __init__(self, environment=None):
+        """Initialize a FrozenApplicationConfig object."""
+        self.__frozen = False
+        super().__init__()
+        self.__apply_environment_overrides(os.environ if environment is None else environment)
+        self.__frozen = True
+
+    def __apply_environment_overrides(self, environment):
+        """
+        Overrides options with the environment variables named after an existing section
+        :param environment:
+        """
+        for variable, value in environment.items():
+            for section in self.sections():
+                section_prefix = f'{ENVIRONMENT_OVERRIDE_PREFIX}{section.upper()}_'
+                if variable.startswith(section_prefix) and len(variable) > len(section_prefix):
+                    self.set(section, variable[len(section_prefix):].lower(), value)
+
+    def __check_not_frozen(self):
+        if self.__frozen:
+            raise TypeError('The application config is read-only once loaded')
+
+    def set(self, section, option, value=None):
+        self.__check_not_frozen()
+        super().set(section, option, value)
+
+    def add_section(self, section):
+        self.__check_not_frozen()
+        super().add_section(section)
+
+    def remove_option(self, section, option):
+        self.__check_not_frozen()
+        return super().remove_option(section, option)
+
+    def remove_section(self, section):
+        self.__check_not_frozen()
+        return super().remove_section(section)
+
+
+_CONFIG = None
+_CONFIG_LOCK = threading.Lock()
+
+
+def get_config():
+    """
+    Returns the application config of the process, reading the application.ini files on first use
+    :return: config
+    :rtype: FrozenApplicationConfig
+    """
+    global _CONFIG  # pylint: disable=global-statement
+    if _CONFIG is None:
+        with _CONFIG_LOCK:
+            if _CONFIG is None:
+                _CONFIG = FrozenApplicationConfig()
+    return _CONFIG
+
+
+def reset_config():
+    """
+    Forgets the application config of the process so that it is read again on next use
+    """
+    global _CONFIG  # pylint: disable=global-statement
+    with _CONFIG_LOCK:
+        _CONFIG = None
@@ -0,0 +1,187 @@
+"""
+This module holds the RPT-RC daemon. The daemon keeps the interpreter, imported packages, pooled
+HTTP sessions and parsed configuration warm between commands, and runs every CLI command sent to it
+over a Unix socket by the thin client in rptrc/client.py.
+
+An invocation sends one JSON line holding its argv and the content of the artifact properties files
+it can see. It receives one JSON line per write to stdout or stderr, which includes its logs, then a
+final line holding its exit code and the artifact properties files it generated.
+"""
+
+import io
+import json
+import logging
+import os
+import socketserver
+import sys
+import threading
+import traceback
+
+import click
+
+from rptrc.src.etc.waiter import remove_stale_socket
+from rptrc.src.operators.artifact_properties import capture_artifacts
+
+DAEMON_COMMANDS = ('serve', 'waiter')
+
+_INVOCATION = threading.local()
+
+
+class InvocationOutput:
+    """
+    The connection an invocation receives its output on
+    """
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.__lock = threading.Lock()
+
+    def send(self, message):
+        """
+        Sends a message to the invocation, which may have gone away already
+        :param message:
+        """
+        with self.__lock:
+            try:
+                self.wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except OSError:
+                logging.debug('Invocation went away before its command completed')
+
+
+class StreamRouter(io.TextIOBase):
+    """
+    Stands in for sys.stdout or sys.stderr, sending what the invocation running on the current thread
+    writes to that invocation and everything else to the stream of the daemon
+    """
+    def __init__(self, name, daemon_stream):
+        super().__init__()
+        self.name = name
+        self.daemon_stream = daemon_stream
+
+    @property
+    def encoding(self):
+        """
+        The encoding of the text written, which is sent to the invocation as JSON
+        :return: encoding
+        :rtype: str
+        """
+        return 'utf-8'
+
+    def write(self, data):
+        output = getattr(_INVOCATION, 'output', None)
+        if output is None:
+            return self.daemon_stream.write(data)
+        output.send({'stream': self.name, 'data': data})
+        return len(data)
+
+    def flush(self):
+        self.daemon_stream.flush()
+
+
+def run_command(cli, argv):
+    """
+    Runs a CLI command the way the command line would, without exiting the process
+    :param cli: The click group holding the commands
+    :param argv: The arguments passed to the client
+    :return: exit_code
+    :rtype: int
+    """
+    if argv and argv[0].replace('-', '_') in DAEMON_COMMANDS:
+        click.echo(f'Error: {argv[0]} cannot be run through the daemon', err=True)
+        return 2
+    try:
+        exit_code = cli.main(args=argv, prog_name='rptrc', standalone_mode=False)
+    except click.ClickException as click_exception:
+        click_exception.show()
+        return click_exception.exit_code
+    except click.Abort:
+        click.echo('Aborted!', err=True)
+        return 1
+    except SystemExit as system_exit:
+        return system_exit.code if isinstance(system_exit.code, int) else int(system_exit.code is not None)
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+        return 1
+    return exit_code if isinstance(exit_code, int) else 0
+
+
+def run_invocation(cli, argv, artifacts, output):
+    """
+    Runs a command for an invocation, sending its output and artifact properties files back to it
+    :param cli: The click group holding the commands
+    :param argv: The arguments passed to the client
+    :param artifacts: The content of the artifact properties files the client can see, by path
+    :param output: The connection of the invocation
+    :return: exit_code
+    :rtype: int
+    """
+    _INVOCATION.output = output
+    try:
+        with capture_artifacts(artifacts) as capture:
+            exit_code = run_command(cli, argv)
+    finally:
+        _INVOCATION.output = None
+    output.send({'exit_code': exit_code, 'artifacts': capture.written_files()})
+    return exit_code
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles a single invocation of the thin client
+    """
+    def handle(self):
+        output = InvocationOutput(self.wfile)
+        try:
+            message = json.loads(self.rfile.readline())
+            argv = [str(argument) for argument in message['argv']]
+            artifacts = dict(message.get('artifacts') or {})
+        except (ValueError, KeyError, TypeError):
+            output.send({'stream': 'stderr', 'data': 'Error: Invalid message sent to the daemon\n'})
+            output.send({'exit_code': 2, 'artifacts': {}})
+            return
+        logging.debug(f'Running command for invocation: {argv}')
+        run_invocation(self.server.cli, argv, artifacts, output)
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves the CLI on a Unix socket, running every invocation on its own thread
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, cli):
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, DaemonRequestHandler)
+        self.cli = cli
+
+
+def route_streams():
+    """
+    Replaces sys.stdout and sys.stderr, and the root log handlers writing to them, with routers
+    sending the output of each invocation back to it
+    """
+    for name in ('stdout', 'stderr'):
+        daemon_stream = getattr(sys, name)
+        if isinstance(daemon_stream, StreamRouter):
+            continue
+        router = StreamRouter(name, daemon_stream)
+        setattr(sys, name, router)
+        for handler in logging.getLogger('').handlers:
+            if isinstance(handler, logging.StreamHandler) and handler.stream is daemon_stream:
+                handler.setStream(router)
+
+
+def serve_daemon(socket_path, cli):
+    """
+    Runs the daemon on the Unix socket until interrupted
+    :param socket_path:
+    :param cli: The click group holding the commands
+    """
+    server = DaemonServer(socket_path, cli)
+    route_streams()
+    logging.info(f'RPT-RC daemon serving on {socket_path}')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
@@ -0,0 +1,139 @@
+"""
+This module holds a per-process cache of the entities retrieved from RPT, e.g. test environments by
+id and by name. Operators consult it before sending a GET and update it from the responses to their
+own PATCH requests, so that a command reads back what it has just written without asking RPT again.
+
+Entities are kept for a short time to live and the least recently used are evicted once the cache
+is full. Lookups RPT answered with nothing are remembered too, for a shorter time, so that a missing
+entity is not asked for again straight away.
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from rptrc.src import configuration
+
+DEFAULT_TTL = 5.0
+DEFAULT_NEGATIVE_TTL = 2.0
+DEFAULT_MAX_ENTRIES = 1024
+TEST_ENVIRONMENT_BY_ID = 'test_environment_by_id'
+TEST_ENVIRONMENT_BY_NAME = 'test_environment_by_name'
+POOL_BY_NAME = 'pool_by_name'
+
+
+class EntityCache:
+    """
+    Entities keyed by their kind and a key, e.g. ('test_environment_by_name', 'env1'), expiring after a
+    time to live and evicted least recently used first
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()
+
+    def look_up(self, kind, key):
+        """
+        Looks an entity up
+        :param kind: e.g. test_environment_by_id
+        :param key:
+        :return: (found, entity), entity being None when RPT was found not to hold the entity
+        :rtype: tuple
+        """
+        with self.__lock:
+            entry = self.__entries.get((kind, key))
+            if entry is None:
+                return False, None
+            expires_at, entity = entry
+            if self.__clock() >= expires_at:
+                del self.__entries[(kind, key)]
+                return False, None
+            self.__entries.move_to_end((kind, key))
+        logging.debug(f'Using cached {kind} "{key}"')
+        return True, copy.deepcopy(entity)
+
+    def store(self, kind, key, entity):
+        """
+        Stores an entity retrieved from, or returned by a mutation in, RPT
+        :param kind:
+        :param key:
+        :param entity:
+        """
+        self.__put((kind, key), copy.deepcopy(entity), self.ttl)
+
+    def store_absent(self, kind, key):
+        """
+        Remembers that RPT does not hold an entity
+        :param kind:
+        :param key:
+        """
+        self.__put((kind, key), None, self.negative_ttl)
+
+    def invalidate(self, kind, key):
+        """
+        Forgets an entity, e.g. once RPT changed it as a side effect of another mutation
+        :param kind:
+        :param key:
+        :return: entity, the entity forgotten or None if none was cached
+        :rtype: dict
+        """
+        with self.__lock:
+            entry = self.__entries.pop((kind, key), None)
+        return None if entry is None else entry[1]
+
+    def clear(self, kind=None):
+        """
+        Forgets every entity, or every entity of a kind
+        :param kind:
+        """
+        with self.__lock:
+            if kind is None:
+                self.__entries.clear()
+                return
+            for cache_key in [cache_key for cache_key in self.__entries if cache_key[0] == kind]:
+                del self.__entries[cache_key]
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __put(self, cache_key, entity, ttl):
+        if ttl <= 0:
+            return
+        with self.__lock:
+            self.__entries[cache_key] = (self.__clock() + ttl, entity)
+            self.__entries.move_to_end(cache_key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+
+_ENTITY_CACHE = None
+_ENTITY_CACHE_LOADED = False
+_ENTITY_CACHE_LOCK = threading.Lock()
+
+
+def get_entity_cache():
+    """
+    Returns the entity cache of this process configured in application.ini, or None if it is disabled
+    :return: entity_cache
+    :rtype: EntityCache
+    """
+    global _ENTITY_CACHE, _ENTITY_CACHE_LOADED  # pylint: disable=global-statement
+    if not _ENTITY_CACHE_LOADED:
+        with _ENTITY_CACHE_LOCK:
+            if not _ENTITY_CACHE_LOADED:
+                constants = configuration.get_config()
+                ttl = constants.getfloat('PERFORMANCE', 'entity_cache_ttl', fallback=DEFAULT_TTL)
+                if ttl > 0:
+                    _ENTITY_CACHE = EntityCache(
+                        max_entries=constants.getint('PERFORMANCE', 'entity_cache_size', fallback=DEFAULT_MAX_ENTRIES),
+                        ttl=ttl,
+                        negative_ttl=constants.getfloat('PERFORMANCE', 'entity_cache_negative_ttl',
+                                                        fallback=DEFAULT_NEGATIVE_TTL))
+                _ENTITY_CACHE_LOADED = True
+    return _ENTITY_CACHE
@@ -0,0 +1,225 @@
+"""
+This module declares a circuit breaker shared by every RPT-RC invocation on an agent.
+The breaker state is kept in a small lock-protected file, so once one invocation trips the breaker
+for a host, every other invocation sharing the file backs off without sending requests, and only a
+single probe request is sent once the cool-down has passed
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from rptrc.src import configuration
+from rptrc.src.etc.exceptions import CircuitOpenException
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+CLOSED_CIRCUIT = {'state': CLOSED, 'failures': 0}
+
+DEFAULT_STATE_FILE = '/usr/src/app/state/rptrc_circuit_breaker.json'
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_COOLDOWN = 30.0
+DEFAULT_PROBE_TIMEOUT = 60.0
+
+
+class CircuitBreaker:
+    """
+    A closed, open and half-open circuit breaker with its state persisted in a shared file
+    """
+    def __init__(self, state_file=DEFAULT_STATE_FILE, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 cooldown=DEFAULT_COOLDOWN, probe_timeout=DEFAULT_PROBE_TIMEOUT):
+        self.state_file = state_file
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+
+    @staticmethod
+    def build_circuit_key(url):
+        """
+        Builds the key a host's breaker state is stored under
+        :param url:
+        :return: circuit_key
+        :rtype: str
+        """
+        split_url = urlsplit(url)
+        return f'{split_url.scheme}://{split_url.netloc}'
+
+    def __parse_state__(self, state_file):
+        """
+        Parses the state read from the state file, discarding it if it is unreadable
+        :param state_file:
+        :return: state
+        :rtype: dict
+        """
+        state_file.seek(0)
+        try:
+            return json.loads(state_file.read() or '{}')
+        except ValueError:
+            logging.warning(f'Discarding unreadable circuit breaker state in {self.state_file}')
+            return {}
+
+    def __read_state__(self):
+        """
+        Reads the state under a shared lock, so invocations only checking the state do not wait on each other
+        :return: state
+        :rtype: dict
+        """
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as state_file:
+                fcntl.flock(state_file, fcntl.LOCK_SH)
+                try:
+                    return self.__parse_state__(state_file)
+                finally:
+                    fcntl.flock(state_file, fcntl.LOCK_UN)
+        except FileNotFoundError:
+            return {}
+
+    @contextmanager
+    def __locked_state__(self):
+        """
+        Holds an exclusive lock on the state file while the state is read and modified, rewriting the
+        file only if the state was changed
+        :return: state
+        :rtype: dict
+        """
+        state_directory = os.path.dirname(self.state_file)
+        if state_directory:
+            os.makedirs(state_directory, exist_ok=True)
+        with open(self.state_file, 'a+', encoding='utf-8') as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                state = self.__parse_state__(state_file)
+                original_state = json.dumps(state)
+                yield state
+                if json.dumps(state) != original_state:
+                    state_file.seek(0)
+                    state_file.truncate()
+                    state_file.write(json.dumps(state))
+                    state_file.flush()
+            finally:
+                fcntl.flock(state_file, fcntl.LOCK_UN)
+
+    def before_request(self, url):
+        """
+        Checks whether a request towards the host may be sent. Raises if the circuit is open, or if it
+        is half-open and another invocation is already sending the probe request. The state is only
+        locked exclusively and rewritten when this invocation is to send the probe request.
+        :param url:
+        """
+        circuit_key = self.build_circuit_key(url)
+        now = time.time()
+        if not self.__probe_due__(circuit_key, self.__read_state__().get(circuit_key), now):
+            return
+        with self.__locked_state__() as state:
+            circuit = state.get(circuit_key)
+            if not self.__probe_due__(circuit_key, circuit, now):
+                return
+            logging.info(f'Circuit breaker for {circuit_key} is half-open, sending a probe request')
+            circuit['state'] = HALF_OPEN
+            circuit['probe_started_at'] = now
+
+    def __probe_due__(self, circuit_key, circuit, now):
+        """
+        Checks whether a probe request is due for the circuit. Raises if the circuit is open, or if it is
+        half-open and another invocation is already sending the probe request.
+        :param circuit_key:
+        :param circuit:
+        :param now:
+        :return: probe_due
+        :rtype: bool
+        """
+        if circuit is None or circuit['state'] == CLOSED:
+            return False
+        if circuit['state'] == OPEN:
+            time_open = now - circuit['opened_at']
+            if time_open < self.cooldown:
+                self.__raise_circuit_open__(circuit_key, self.cooldown - time_open)
+        elif now - circuit['probe_started_at'] < self.probe_timeout:
+            self.__raise_circuit_open__(circuit_key, min(self.cooldown,
+                                                         self.probe_timeout - (now - circuit['probe_started_at'])))
+        return True
+
+    @staticmethod
+    def __raise_circuit_open__(circuit_key, retry_after):
+        """
+        Raises the exception used when a request may not be sent
+        :param circuit_key:
+        :param retry_after:
+        """
+        exception_message = f'Circuit breaker for {circuit_key} is open, backing off for {retry_after:.1f} seconds'
+        logging.warning(exception_message)
+        raise CircuitOpenException(exception_message, retry_after=retry_after)
+
+    def record_success(self, url):
+        """
+        Records that the host responded, closing the circuit
+        :param url:
+        """
+        circuit_key = self.build_circuit_key(url)
+        if self.__read_state__().get(circuit_key, CLOSED_CIRCUIT) == CLOSED_CIRCUIT:
+            return
+        with self.__locked_state__() as state:
+            circuit = state.get(circuit_key)
+            if circuit and circuit['state'] != CLOSED:
+                logging.info(f'Circuit breaker for {circuit_key} is now closed')
+            state[circuit_key] = dict(CLOSED_CIRCUIT)
+
+    def record_failure(self, url):
+        """
+        Records that the host could not be reached or failed, opening the circuit once the failure
+        threshold is reached or straight away if the failed request was the probe
+        :param url:
+        """
+        circuit_key = self.build_circuit_key(url)
+        with self.__locked_state__() as state:
+            circuit = state.setdefault(circuit_key, dict(CLOSED_CIRCUIT))
+            circuit['failures'] = circuit.get('failures', 0) + 1
+            if circuit['state'] == HALF_OPEN or circuit['failures'] >= self.failure_threshold:
+                logging.warning(f'Circuit breaker for {circuit_key} is now open after '
+                                f'{circuit["failures"]} consecutive failures')
+                circuit['state'] = OPEN
+                circuit['opened_at'] = time.time()
+                circuit.pop('probe_started_at', None)
+
+    def get_state(self, url):
+        """
+        Returns the state of the circuit for the host
+        :param url:
+        :return: state
+        :rtype: str
+        """
+        return self.__read_state__().get(self.build_circuit_key(url), CLOSED_CIRCUIT)['state']
+
+
+_CIRCUIT_BREAKER = None
+_CIRCUIT_BREAKER_LOADED = False
+_CIRCUIT_BREAKER_LOCK = threading.Lock()
+
+
+def get_circuit_breaker():
+    """
+    Returns the circuit breaker configured in application.ini, or None if it is disabled
+    :return: circuit_breaker
+    :rtype: CircuitBreaker
+    """
+    global _CIRCUIT_BREAKER, _CIRCUIT_BREAKER_LOADED  # pylint: disable=global-statement
+    if not _CIRCUIT_BREAKER_LOADED:
+        with _CIRCUIT_BREAKER_LOCK:
+            if not _CIRCUIT_BREAKER_LOADED:
+                constants = configuration.get_config()
+                if constants.getboolean('CIRCUIT_BREAKER', 'enabled', fallback=False):
+                    _CIRCUIT_BREAKER = CircuitBreaker(
+                        state_file=constants.get('CIRCUIT_BREAKER', 'state_file', fallback=DEFAULT_STATE_FILE),
+                        failure_threshold=constants.getint('CIRCUIT_BREAKER', 'failure_threshold',
+                                                           fallback=DEFAULT_FAILURE_THRESHOLD),
+                        cooldown=constants.getfloat('CIRCUIT_BREAKER', 'cooldown', fallback=DEFAULT_COOLDOWN),
+                        probe_timeout=constants.getfloat('CIRCUIT_BREAKER', 'probe_timeout',
+                                                         fallback=DEFAULT_PROBE_TIMEOUT))
+                _CIRCUIT_BREAKER_LOADED = True
+    return _CIRCUIT_BREAKER
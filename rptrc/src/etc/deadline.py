@@ -0,0 +1,125 @@
+"""
+This module declares the deadline shared by every request and polling loop of a single CLI command.
+A deadline is created once per command from its overall time budget, uses the monotonic clock and
+keeps a breakdown of where the time went so that a command running out of time can say why
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from time import monotonic
+
+from rptrc.src.etc.exceptions import DeadlineExceededException
+
+
+class Deadline:
+    """
+    An overall time budget measured on the monotonic clock. A budget of None never expires.
+    The time spent against a child deadline is also recorded against its parent.
+    """
+    def __init__(self, budget=None, parent=None):
+        self.budget = budget
+        self.parent = parent
+        self.started = monotonic()
+        self.__timings = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        """
+        The time in seconds since the deadline was created
+        :return: elapsed
+        :rtype: float
+        """
+        return monotonic() - self.started
+
+    def remaining(self):
+        """
+        The time in seconds left in the budget, or None if the budget is unbounded
+        :return: remaining
+        :rtype: float
+        """
+        if self.budget is None:
+            return None
+        return max(0.0, self.budget - self.elapsed)
+
+    @property
+    def expired(self):
+        """
+        Whether the budget has been spent
+        :return: expired
+        :rtype: bool
+        """
+        return self.budget is not None and self.elapsed >= self.budget
+
+    def bound(self, timeout):
+        """
+        Bounds a timeout by the time left in the budget
+        :param timeout: A timeout in seconds, or None for no timeout
+        :return: min(timeout, remaining)
+        :rtype: float
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if timeout is None:
+            return remaining
+        return min(timeout, remaining)
+
+    def child(self, timeout):
+        """
+        Creates a deadline for part of the command, e.g. a scan, expiring after the timeout or with this
+        deadline, whichever comes first
+        :param timeout: A timeout in seconds, or None for no timeout
+        :return: deadline
+        :rtype: Deadline
+        """
+        return Deadline(self.bound(timeout), parent=self)
+
+    def record(self, activity, elapsed):
+        """
+        Adds time spent on an activity to the timing breakdown
+        :param activity: e.g. GET
+        :param elapsed: Time spent in seconds
+        """
+        with self.__lock:
+            count, total = self.__timings.get(activity, (0, 0.0))
+            self.__timings[activity] = (count + 1, total + elapsed)
+        if self.parent is not None:
+            self.parent.record(activity, elapsed)
+
+    @contextmanager
+    def track(self, activity):
+        """
+        Records the time spent in the block against the activity
+        :param activity:
+        """
+        started = monotonic()
+        try:
+            yield self
+        finally:
+            self.record(activity, monotonic() - started)
+
+    def breakdown(self):
+        """
+        Describes where the time was spent
+        :return: breakdown
+        :rtype: str
+        """
+        with self.__lock:
+            timings = sorted(self.__timings.items(), key=lambda timing: -timing[1][1])
+        spent = ', '.join(f'{activity}: {count} x {total:.1f}s' for activity, (count, total) in timings)
+        return f'{self.elapsed:.1f}s elapsed ({spent or "no requests made"})'
+
+    def check(self, activity):
+        """
+        Raises if the budget has been spent before the activity could start
+        :param activity: What was about to be done e.g. GET http://...
+        """
+        if not self.expired:
+            return
+        breakdown = self.breakdown()
+        exception_message = (f'Command timeout of {self.budget}s exceeded before {activity}. '
+                             f'Timing breakdown: {breakdown}')
+        logging.critical(exception_message)
+        raise DeadlineExceededException(exception_message, breakdown)
@@ -56,3 +56,35 @@ class FatalException(Exception):
     def __init__(self, message=None):
         self.message = message
         super().__init__(self.message)
+
+
+class RequestFailedException(FatalException):
+    """Exception for a request towards RPT that could not be completed"""
+    def __init__(self, message=None, status_code=None, attempts=0, elapsed=0.0):
+        self.status_code = status_code
+        self.attempts = attempts
+        self.elapsed = elapsed
+        super().__init__(message)
+
+
+class NonRetryableRequestException(RequestFailedException):
+    """Exception for a request that failed in a way that retrying cannot fix"""
+
+
+class RetriesExhaustedException(RequestFailedException):
+    """Exception for a request that kept failing until its retry timeout was spent"""
+
+
+class CircuitOpenException(Exception):
+    """Exception for a request that was not sent because the circuit breaker for its host is open"""
+    def __init__(self, message=None, retry_after=0.0):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class DeadlineExceededException(FatalException):
+    """Exception for a command that ran out of its overall time budget"""
+    def __init__(self, message=None, breakdown=None):
+        self.breakdown = breakdown
+        super().__init__(message)
@@ -0,0 +1,92 @@
+"""
+This module allows a user to run the same operation against many items on a bounded pool of
+worker threads, collecting the outcome of every item rather than stopping at the first failure
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+
+from rptrc.src.etc.exceptions import FatalException
+
+
+class FanOutResult:
+    """
+    The outcome of running an operation against a single item
+    """
+    __slots__ = ('item', 'value', 'error')
+
+    def __init__(self, item, value=None, error=None):
+        self.item = item
+        self.value = value
+        self.error = error
+
+    @property
+    def succeeded(self):
+        """
+        Whether the operation completed without raising
+        :return: succeeded
+        :rtype: bool
+        """
+        return self.error is None
+
+
+def run_operation(operation, item):
+    """
+    Runs the operation against a single item, capturing any exception raised
+    :param operation:
+    :param item:
+    :return: result
+    :rtype: FanOutResult
+    """
+    try:
+        return FanOutResult(item, value=operation(item))
+    except Exception as operation_exception:
+        logging.error(f'Operation failed for "{item}": {operation_exception}')
+        return FanOutResult(item, error=operation_exception)
+
+
+def raise_fan_out_timeout(timeout, outstanding, total):
+    """
+    Raises the exception used when the items could not all be processed within the timeout
+    :param timeout:
+    :param outstanding:
+    :param total:
+    """
+    exception_message = (f'Timed out after {timeout} seconds with {outstanding} of {total} '
+                         'operations still outstanding')
+    logging.critical(exception_message)
+    raise FatalException(exception_message)
+
+
+def fan_out(operation, items, concurrency=1, timeout=None):
+    """
+    Runs the operation against every item using at most `concurrency` worker threads.
+    :param operation: Callable taking a single item
+    :param items: The items to run the operation against
+    :param concurrency: The maximum number of operations in flight at any time
+    :param timeout: Overall time in seconds allowed for every item to complete, None for no limit
+    :return: results, in the same order as the items passed in
+    :rtype: list
+    """
+    items = list(items)
+    if concurrency <= 1 or len(items) <= 1:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = []
+        for item in items:
+            if deadline is not None and time.monotonic() > deadline:
+                raise_fan_out_timeout(timeout, len(items) - len(results), len(items))
+            results.append(run_operation(operation, item))
+        return results
+
+    logging.debug(f'Running {len(items)} operations with a concurrency of {concurrency}')
+    executor = ThreadPoolExecutor(max_workers=min(concurrency, len(items)))
+    futures = [executor.submit(run_operation, operation, item) for item in items]
+    try:
+        for _ in as_completed(futures, timeout=timeout):
+            pass
+    except FuturesTimeoutError:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise_fan_out_timeout(timeout, len([future for future in futures if not future.done()]), len(items))
+    executor.shutdown()
+    return [future.result() for future in futures]
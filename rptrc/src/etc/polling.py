@@ -0,0 +1,71 @@
+"""
+This module declares the strategy used to poll RPT while waiting for an entity to change status.
+Polling starts fast so that a quick change is noticed straight away, then backs off with jitter so
+that many waiting clients neither hammer RPT nor poll it in lock-step
+"""
+
+import logging
+import random
+
+from rptrc.src import configuration
+from rptrc.src.etc.exceptions import FatalException
+
+DEFAULT_MIN_INTERVAL = 2.0
+DEFAULT_MAX_INTERVAL = 30.0
+DEFAULT_MULTIPLIER = 1.5
+DEFAULT_JITTER = 0.2
+WAIT_MODES = ('auto', 'poll')
+
+
+class PollingStrategy:
+    """
+    Grows the interval between polls geometrically from min_interval up to max_interval. Every
+    interval is randomised by up to +/- jitter of its length, without ever exceeding max_interval.
+    """
+    def __init__(self, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                 multiplier=DEFAULT_MULTIPLIER, jitter=DEFAULT_JITTER):
+        if min_interval <= 0 or max_interval < min_interval:
+            exception_message = (f'Invalid poll intervals: minimum {min_interval}s, maximum {max_interval}s. '
+                                 'The minimum must be positive and no greater than the maximum')
+            logging.critical(exception_message)
+            raise FatalException(exception_message)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.multiplier = max(multiplier, 1.0)
+        self.jitter = min(max(jitter, 0.0), 1.0)
+
+    def next_interval(self, polls):
+        """
+        Returns the time in seconds to wait before the next poll
+        :param polls: The number of polls made so far, starting at 1
+        :return: interval
+        :rtype: float
+        """
+        interval = min(self.max_interval, self.min_interval * self.multiplier ** (polls - 1))
+        interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(interval, self.max_interval)
+
+    def __repr__(self):
+        return (f'{type(self).__name__}(min_interval={self.min_interval}, max_interval={self.max_interval}, '
+                f'multiplier={self.multiplier}, jitter={self.jitter})')
+
+
+def get_polling_strategy(min_interval=None, max_interval=None):
+    """
+    Builds the polling strategy from the PERFORMANCE section of application.ini. Intervals passed in
+    take precedence over the configured ones, and a configured maximum below the minimum passed in is
+    raised to it.
+    :param min_interval: The interval in seconds before the first poll
+    :param max_interval: The interval in seconds the backoff is capped at
+    :return: polling_strategy
+    :rtype: PollingStrategy
+    """
+    constants = configuration.get_config()
+    if min_interval is None:
+        min_interval = constants.getfloat('PERFORMANCE', 'poll_min_interval', fallback=DEFAULT_MIN_INTERVAL)
+    if max_interval is None:
+        max_interval = max(min_interval, constants.getfloat('PERFORMANCE', 'poll_max_interval',
+                                                            fallback=DEFAULT_MAX_INTERVAL))
+    return PollingStrategy(min_interval, max_interval,
+                           constants.getfloat('PERFORMANCE', 'poll_multiplier', fallback=DEFAULT_MULTIPLIER),
+                           constants.getfloat('PERFORMANCE', 'poll_jitter', fallback=DEFAULT_JITTER))
@@ -4,122 +4,234 @@ temporarily down
 """
 
 import logging
-from time import sleep
+from time import monotonic, sleep
 import requests
-import urllib3
 
-from rptrc.src.etc.exceptions import FatalException
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-SLEEP_TIME_MULTIPLIER = 5
+from rptrc.src import configuration
+from rptrc.src.etc import transport
+from rptrc.src.etc.circuit_breaker import get_circuit_breaker
+from rptrc.src.etc.deadline import Deadline
+from rptrc.src.etc.exceptions import (CircuitOpenException, FatalException, NonRetryableRequestException,
+                                      RetriesExhaustedException)
+from rptrc.src.etc.retry_policy import get_retry_policy, parse_retry_after
+from rptrc.src.etc.status_classification import RETRYABLE, classify_exception, classify_status_code, is_retryable
+
+REQUEST_TIMEOUTS = {
+    'GET': 10,
+    'PATCH': 20,
+    'PUT': 5,
+    'POST': 20,
+    'DELETE': 10,
+}
+
+
+def get_request_timeout(request_type):
+    """
+    Returns the timeout of a single attempt of the HTTP method, from the timeout_<method> setting of
+    the PERFORMANCE section of application.ini
+    :param request_type: The HTTP method e.g. GET
+    :return: timeout in seconds
+    :rtype: float
+    """
+    return configuration.get_config().getfloat('PERFORMANCE', f'timeout_{request_type.lower()}',
+                                               fallback=REQUEST_TIMEOUTS.get(request_type))
 
 
-# pylint: disable=no-member, too-many-arguments
-def request_retry(type_of_request, url, retry_timeout, body=None, proxy=None, ssl=False):
+# pylint: disable=no-member, too-many-arguments, too-many-locals
+def request_retry(type_of_request, url, retry_timeout, body=None, proxy=None, ssl=False, retry_policy=None,
+                  idempotent=None, deadline=None, headers=None, before_retry=None, request_timeout=None):
     """
-    Function to retry requests if the target host is not found. Geometric retry is used here.
+    Function to retry requests if the target host is not found. The delay between attempts is
+    decided by the retry policy configured for the type of request. Failures that retrying cannot
+    fix, such as a 404, are raised on the first attempt. Every attempt and every sleep is bounded by
+    the deadline of the command making the request.
     :param type_of_request: Which REST request is being conducted
     :param url: URL you want to run your request against
     :param retry_timeout: The total sleep time of a request retry
     :param body: The payload which will be sent in the request body
     :param proxy: Proxy dict if you would like to route request through proxy
     :param ssl: Should be set to True if you want to enable SSL verification.
+    :param retry_policy: The policy deciding the delay between attempts. Defaults to the configured policy.
+    :param idempotent: Whether repeating the request is safe. Defaults to whether the method is idempotent.
+    :param deadline: The deadline of the command making the request. Defaults to no deadline.
+    :param headers: Extra headers sent with every attempt
+    :param before_retry: Callable run before every retry. If it returns True the earlier attempt is known
+    to have taken effect, so the request is not repeated and None is returned.
+    :param request_timeout: Timeout in seconds of every attempt. Defaults to the timeout for the request type.
     :return: response
     :rtype: requests.Response
     """
-    count = 0
+    attempt = 0
+    total_time_slept = 0
+    delay = 0
     response = None
-    max_retry = calculate_max_retry_based_on_retry_timeout(retry_timeout)
+    if retry_policy is None:
+        retry_policy = get_retry_policy(type_of_request)
+    if deadline is None:
+        deadline = Deadline()
+    if request_timeout is None:
+        request_timeout = get_request_timeout(type_of_request)
     valid_response_codes = [requests.codes.ok, requests.codes.created]
     logging.debug(f"type_of_request: {str(type_of_request)}")
     logging.debug(f"url: {str(url)}")
-    while count < max_retry:
+    logging.debug(f"retry_policy: {retry_policy}")
+    started = monotonic()
+    while True:
+        attempt += 1
+        deadline.check(f'{type_of_request} {url}')
+        if attempt > 1 and before_retry is not None and before_retry():
+            logging.info(f'{type_of_request} request already took effect, not repeating it')
+            return None
+        response = None
+        request_exception = None
         try:
-            response = make_request_based_on_input(type_of_request, url, body, proxy, ssl)
-            if response and response.status_code in valid_response_codes:
-                break
-            raise requests.exceptions.RequestException
-        except Exception:
-            logging.error(f"Could not make the {type_of_request} request")
-            if response is not None:
-                logging.error(f"Response status code: {str(response.status_code)}")
-                logging.error(f"Response reason: {str(response.reason)}")
-                logging.error(f"Response output: {str(response.text)}")
-                handle_response_exception(response=response)
-
-        count += 1
-        if count == max_retry:
-            exception_message = f"Failed to execute {type_of_request} request after {max_retry} tries."
+            with deadline.track(type_of_request):
+                response = send_request(type_of_request, url, body, proxy, ssl,
+                                        deadline.bound(request_timeout), headers)
+        except Exception as exception:
+            request_exception = exception
+        if response is not None and response.status_code in valid_response_codes:
+            break
+        handle_failed_attempt(type_of_request, response, request_exception, attempt, monotonic() - started,
+                              idempotent)
+
+        remaining_time = retry_timeout - total_time_slept
+        if remaining_time <= 0:
+            exception_message = f"Failed to execute {type_of_request} request after {attempt} tries."
             logging.critical(exception_message)
-            raise FatalException(exception_message)
+            raise RetriesExhaustedException(exception_message,
+                                            status_code=getattr(response, 'status_code', None),
+                                            attempts=attempt, elapsed=monotonic() - started)
 
+        retry_after = request_exception.retry_after if isinstance(request_exception, CircuitOpenException) \
+            else parse_retry_after(response)
+        delay = deadline.bound(min(retry_policy.next_delay(attempt, delay, retry_after), remaining_time))
         logging.warning(f"Failed to make {type_of_request} request. "
-                        f"Sleeping and then trying again...")
-        sleep(SLEEP_TIME_MULTIPLIER * count)
+                        f"Sleeping for {delay:.1f} seconds and then trying again...")
+        with deadline.track('retry backoff'):
+            sleep(delay)
+        total_time_slept += delay
     return response
 
 
-def calculate_max_retry_based_on_retry_timeout(retry_timeout):
+# pylint: disable=too-many-arguments
+def handle_failed_attempt(type_of_request, response, request_exception, attempts, elapsed, idempotent=None):
     """
-    Function to calculate the amount of retries needed based on the retry timeout passed to the request_retry function
-    :param retry_timeout
-    :return: retry_count-1
+    Logs a failed attempt and raises straight away if the failure is not worth retrying
+    :param type_of_request: Which REST request is being conducted
+    :param response: The response received, if any
+    :param request_exception: The exception raised while making the request, if any
+    :param attempts: The number of attempts made so far
+    :param elapsed: The time in seconds spent on the request so far
+    :param idempotent: Whether repeating the request is safe. Defaults to whether the method is idempotent.
     """
-    retry_count = 1
-    total_time_slept = 0
-    while total_time_slept <= retry_timeout:
-        total_time_slept += SLEEP_TIME_MULTIPLIER * retry_count
-        retry_count += 1
-
-    return retry_count-1
-
-
-def handle_response_exception(response):
+    logging.error(f"Could not make the {type_of_request} request")
+    if response is not None:
+        logging.error(f"Response status code: {str(response.status_code)}")
+        logging.error(f"Response reason: {str(response.reason)}")
+        logging.error(f"Response output: {str(response.text)}")
+        classification = classify_status_code(response.status_code)
+    elif request_exception is not None:
+        logging.error(f"Request exception: {str(request_exception)}")
+        classification = classify_exception(request_exception)
+    else:
+        classification = RETRYABLE
+
+    if is_retryable(classification, type_of_request, idempotent):
+        return
+    if response is not None:
+        handle_response_exception(response, attempts, elapsed)
+    if isinstance(request_exception, FatalException):
+        raise request_exception
+    exception_message = f"Could not make the {type_of_request} request due to a non-retryable error."
+    logging.critical(exception_message)
+    raise NonRetryableRequestException(exception_message, attempts=attempts, elapsed=elapsed) \
+        from request_exception
+
+
+def handle_response_exception(response, attempts=1, elapsed=0.0):
     """
-    Function to handle the exceptions raised due to Response
+    Function to handle the exceptions raised due to a Response that is not worth retrying
     :param response:
+    :param attempts: The number of attempts made so far
+    :param elapsed: The time in seconds spent on the request so far
     """
     if response.status_code == requests.codes.bad_request:
         exception_message = "Bad request detected. It is possible you may be missing " \
                             "required information in your request. Please see above."
-        logging.error(exception_message)
-        raise requests.exceptions.RequestException(exception_message)
-
-    if response.status_code == requests.codes.internal_server_error:
+    elif response.status_code == requests.codes.internal_server_error:
         exception_message = "Error thrown by RPT. The request could not be processed."
-        logging.error(exception_message)
-        raise requests.exceptions.RequestException(exception_message)
+    else:
+        exception_message = f"Non-retryable response from RPT: {response.status_code} {response.reason}."
+    logging.error(exception_message)
+    logging.error(f"Giving up after {attempts} attempt(s) in {elapsed:.3f} seconds")
+    raise NonRetryableRequestException(exception_message, status_code=response.status_code,
+                                       attempts=attempts, elapsed=elapsed)
+
+
+def send_request(request_type, url, body, proxy, ssl, timeout=None, headers=None):
+    """
+    Sends a single request, guarded by the shared circuit breaker when one is configured
+    :param request_type: Which REST request is being conducted
+    :param url: URL you want to run your request against
+    :param body: The payload which will be sent in the request body
+    :param proxy: Proxy dict if you would like to route request through proxy
+    :param timeout: Timeout in seconds. Defaults to the timeout for the request type.
+    :param headers: Extra headers to send with the request
+    :return: response
+    :rtype: requests.Response
+    """
+    circuit_breaker = get_circuit_breaker()
+    if circuit_breaker is None:
+        return make_request_based_on_input(request_type, url, body, proxy, ssl, timeout, headers)
+
+    circuit_breaker.before_request(url)
+    try:
+        response = make_request_based_on_input(request_type, url, body, proxy, ssl, timeout, headers)
+    except Exception:
+        circuit_breaker.record_failure(url)
+        raise
+    if response is None or response.status_code == requests.codes.too_many_requests \
+            or response.status_code >= requests.codes.internal_server_error:
+        circuit_breaker.record_failure(url)
+    else:
+        circuit_breaker.record_success(url)
+    return response
 
 
-def make_request_based_on_input(request_type, url, body, proxy, ssl):
+def make_request_based_on_input(request_type, url, body, proxy, ssl, timeout=None, headers=None):
     """
-    Makes a request based on the request type passed in
+    Makes a request based on the request type passed in, using the pooled session for the target host
     :param request_type: Which REST request is being conducted
     :param url: URL you want to run your request against
     :param body: The payload which will be sent in the request body
     :param proxy: Proxy dict if you would like to route request through proxy
+    :param timeout: Timeout in seconds. Defaults to the timeout for the request type.
+    :param headers: Extra headers to send with the request
     :return: response
     :rtype: requests.Response
     """
     logging.debug(f"Trying to make {request_type} request")
+    if timeout is None:
+        timeout = get_request_timeout(request_type)
     response = None
+    session = transport.get_session(url, proxy)
     try:
         if request_type == "GET":
             logging.debug("Doing a GET request")
-            response = requests.get(url, proxies=proxy, timeout=10, verify=ssl)
+            response = session.get(url, proxies=proxy, timeout=timeout, verify=ssl, headers=headers)
         elif request_type == "PATCH":
             logging.debug("Doing a PATCH request")
-            response = requests.patch(url, json=body, timeout=20, proxies=proxy, verify=ssl)
+            response = session.patch(url, json=body, timeout=timeout, proxies=proxy, verify=ssl, headers=headers)
         elif request_type == "PUT":
             logging.debug("Doing a PUT request")
-            response = requests.put(url, json=body, timeout=5, proxies=proxy, verify=ssl)
+            response = session.put(url, json=body, timeout=timeout, proxies=proxy, verify=ssl, headers=headers)
         elif request_type == "POST":
             logging.debug("Doing a POST request")
-            response = requests.post(url, json=body, timeout=20, proxies=proxy, verify=ssl)
+            response = session.post(url, json=body, timeout=timeout, proxies=proxy, verify=ssl, headers=headers)
         elif request_type == "DELETE":
             logging.debug("Doing a DELETE request")
-            response = requests.delete(url, timeout=10, proxies=proxy, verify=ssl)
+            response = session.delete(url, timeout=timeout, proxies=proxy, verify=ssl, headers=headers)
         else:
             exception_message = f"Unsupported type of request: {request_type}"
             logging.critical(exception_message)
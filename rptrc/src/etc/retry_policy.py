@@ -0,0 +1,165 @@
+"""
+This module declares the policies used to decide how long to wait between request retries.
+Policies are selected per HTTP method from the PERFORMANCE section of application.ini and can be
+overridden for a single invocation from the CLI, which passes the policy through its operators
+"""
+
+import abc
+import logging
+import random
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+from rptrc.src import configuration
+from rptrc.src.etc.exceptions import FatalException
+
+DEFAULT_RETRY_POLICY = 'exponential_full_jitter'
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+LINEAR_SLEEP_TIME_MULTIPLIER = 5
+
+
+class RetryPolicy(abc.ABC):
+    """
+    The base class of all retry policies
+    """
+    def __init__(self, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @abc.abstractmethod
+    def compute_delay(self, attempt, previous_delay):
+        """
+        Computes the delay before the next attempt, before it is capped
+        :param attempt: The number of attempts made so far, starting at 1
+        :param previous_delay: The delay slept before the previous attempt
+        :return: delay
+        :rtype: float
+        """
+
+    def next_delay(self, attempt, previous_delay=0.0, retry_after=None):
+        """
+        Returns the delay in seconds to sleep before the next attempt. A Retry-After value sent by the
+        server is always honoured, even if it is longer than the delay the policy would have chosen.
+        :param attempt: The number of attempts made so far, starting at 1
+        :param previous_delay: The delay slept before the previous attempt
+        :param retry_after: The delay requested by the server, if any
+        :return: delay
+        :rtype: float
+        """
+        delay = min(self.compute_delay(attempt, previous_delay), self.max_delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def __repr__(self):
+        return f'{type(self).__name__}(base_delay={self.base_delay}, max_delay={self.max_delay})'
+
+
+class LinearBackoff(RetryPolicy):
+    """
+    Sleeps a fixed multiple of the attempt count between attempts, up to the max delay
+    """
+    def __init__(self, base_delay=LINEAR_SLEEP_TIME_MULTIPLIER, max_delay=DEFAULT_MAX_DELAY):
+        super().__init__(base_delay, max_delay)
+
+    def compute_delay(self, attempt, previous_delay):
+        return self.base_delay * attempt
+
+
+class ExponentialBackoff(RetryPolicy):
+    """
+    Doubles the delay after every attempt, without any randomisation
+    """
+    def compute_delay(self, attempt, previous_delay):
+        return self.base_delay * 2 ** (attempt - 1)
+
+
+class ExponentialFullJitterBackoff(RetryPolicy):
+    """
+    Sleeps a random delay between zero and an exponentially growing ceiling, so that many clients
+    retrying after the same outage spread out rather than retrying in lock-step
+    """
+    def compute_delay(self, attempt, previous_delay):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class DecorrelatedJitterBackoff(RetryPolicy):
+    """
+    Sleeps a random delay between the base delay and three times the previous delay
+    """
+    def compute_delay(self, attempt, previous_delay):
+        return random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3))
+
+
+RETRY_POLICIES = {
+    'linear': LinearBackoff,
+    'exponential': ExponentialBackoff,
+    'exponential_full_jitter': ExponentialFullJitterBackoff,
+    'decorrelated_jitter': DecorrelatedJitterBackoff,
+}
+
+
+def build_retry_policy(policy_name, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+    """
+    Builds a retry policy from its name
+    :param policy_name:
+    :param base_delay:
+    :param max_delay:
+    :return: retry_policy
+    :rtype: RetryPolicy
+    """
+    if policy_name not in RETRY_POLICIES:
+        exception_message = (f'Unsupported retry policy: {policy_name}. '
+                             f'Supported retry policies are: {", ".join(RETRY_POLICIES)}')
+        logging.critical(exception_message)
+        raise FatalException(exception_message)
+    if policy_name == 'linear':
+        return LinearBackoff(max_delay=max_delay)
+    return RETRY_POLICIES[policy_name](base_delay, max_delay)
+
+
+def get_retry_policy(request_type, policy_name=None):
+    """
+    Returns the retry policy to use for the HTTP method. The policy named, e.g. from the CLI, takes
+    precedence, followed by a retry_policy_<method> setting and finally the default retry_policy setting.
+    :param request_type: The HTTP method e.g. GET
+    :param policy_name: The name of the policy overriding those configured, if any
+    :return: retry_policy
+    :rtype: RetryPolicy
+    """
+    constants = configuration.get_config()
+    if policy_name is None:
+        policy_name = constants.get('PERFORMANCE', f'retry_policy_{request_type.lower()}',
+                                    fallback=constants.get('PERFORMANCE', 'retry_policy',
+                                                           fallback=DEFAULT_RETRY_POLICY))
+    return build_retry_policy(policy_name,
+                              constants.getfloat('PERFORMANCE', 'retry_base_delay', fallback=DEFAULT_BASE_DELAY),
+                              constants.getfloat('PERFORMANCE', 'retry_max_delay', fallback=DEFAULT_MAX_DELAY))
+
+
+def parse_retry_after(response):
+    """
+    Parses the Retry-After header of a response, which may be a number of seconds or an HTTP date
+    :param response:
+    :return: retry_after in seconds, or None if the header is absent or invalid
+    :rtype: float
+    """
+    headers = getattr(response, 'headers', None)
+    if not isinstance(headers, Mapping):
+        return None
+    retry_after = headers.get('Retry-After')
+    if not isinstance(retry_after, str):
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime  # pylint: disable=import-outside-toplevel
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
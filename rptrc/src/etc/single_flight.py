@@ -0,0 +1,86 @@
+"""
+This module allows a user to coalesce identical calls made at the same time, e.g. GET requests for the
+same URL sent by the workers of a fan out or by the commands a daemon runs at the same time. The
+first caller for a key runs the call, and every caller arriving while it is in flight waits for it and
+shares its result instead of running the call again.
+
+Waiting callers only share the exceptions the call was declared to share, e.g. a definitive answer
+from RPT. Any other exception may come from the limits of the caller running the call, e.g. its
+deadline or retry budget, so every waiting caller then runs the call itself, as does a waiting caller
+whose own timeout passes first.
+"""
+
+import copy
+import logging
+import threading
+
+
+class InFlightCall:
+    """
+    A call in flight and, once it completed, its outcome
+    """
+    __slots__ = ('completed', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.completed = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces calls with the same key made while one of them is in flight
+    """
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__calls = {}
+
+    def run(self, key, function, timeout=None, shared_errors=()):
+        """
+        Runs the function unless a call with the same key is in flight, in which case its outcome is
+        waited for and shared. Callers sharing a result get a copy of it, so that none of them can change
+        the result another is using.
+        :param key: e.g. the URL of a GET request
+        :param function: Callable taking no arguments
+        :param timeout: Seconds this caller waits for a call in flight before running the function itself,
+        None to wait for as long as the call takes
+        :param shared_errors: The exception types raised by a call in flight that are raised to the callers
+        waiting on it too
+        :return: result
+        """
+        with self.__lock:
+            call = self.__calls.get(key)
+            leading = call is None
+            if leading:
+                call = self.__calls[key] = InFlightCall()
+            else:
+                call.waiters += 1
+
+        if not leading:
+            logging.debug(f'Waiting for the call in flight for "{key}"')
+            if not call.completed.wait(timeout):
+                logging.debug(f'Gave up waiting for the call in flight for "{key}", running it')
+                return function()
+            if call.error is None:
+                return copy.deepcopy(call.result)
+            if isinstance(call.error, shared_errors):
+                raise call.error
+            logging.debug(f'The call in flight for "{key}" failed, running it')
+            return function()
+
+        try:
+            call.result = function()
+        except BaseException as call_exception:
+            call.error = call_exception
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            if call.waiters:
+                logging.debug(f'Shared the call for "{key}" with {call.waiters} waiting callers')
+            call.completed.set()
+        return copy.deepcopy(call.result) if call.waiters else call.result
+
+    def __len__(self):
+        return len(self.__calls)
@@ -0,0 +1,97 @@
+"""
+This module classifies failed requests as retryable, fatal or conditional.
+Conditional failures are only retried when repeating the request cannot change the outcome,
+i.e. for idempotent requests
+"""
+
+from http import HTTPStatus
+
+import requests
+
+from rptrc.src.etc.exceptions import FatalException
+
+RETRYABLE = 'retryable'
+FATAL = 'fatal'
+CONDITIONAL = 'conditional'
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'PUT', 'DELETE', 'HEAD', 'OPTIONS'])
+
+STATUS_CLASSIFICATIONS = {
+    HTTPStatus.BAD_REQUEST: FATAL,
+    HTTPStatus.UNAUTHORIZED: FATAL,
+    HTTPStatus.FORBIDDEN: FATAL,
+    HTTPStatus.NOT_FOUND: FATAL,
+    HTTPStatus.METHOD_NOT_ALLOWED: FATAL,
+    HTTPStatus.REQUEST_TIMEOUT: RETRYABLE,
+    HTTPStatus.CONFLICT: FATAL,
+    HTTPStatus.GONE: FATAL,
+    HTTPStatus.REQUEST_ENTITY_TOO_LARGE: FATAL,
+    HTTPStatus.UNSUPPORTED_MEDIA_TYPE: FATAL,
+    HTTPStatus.UNPROCESSABLE_ENTITY: FATAL,
+    HTTPStatus.TOO_EARLY: RETRYABLE,
+    HTTPStatus.TOO_MANY_REQUESTS: RETRYABLE,
+    HTTPStatus.INTERNAL_SERVER_ERROR: FATAL,
+    HTTPStatus.NOT_IMPLEMENTED: FATAL,
+    HTTPStatus.BAD_GATEWAY: RETRYABLE,
+    HTTPStatus.SERVICE_UNAVAILABLE: RETRYABLE,
+    HTTPStatus.GATEWAY_TIMEOUT: CONDITIONAL,
+}
+
+# Checked in order, so more specific exception types must come before the types they extend
+EXCEPTION_CLASSIFICATIONS = (
+    (FatalException, FATAL),
+    (requests.exceptions.InvalidURL, FATAL),
+    (requests.exceptions.MissingSchema, FATAL),
+    (requests.exceptions.InvalidSchema, FATAL),
+    (requests.exceptions.ConnectTimeout, RETRYABLE),
+    (requests.exceptions.ProxyError, RETRYABLE),
+    (requests.exceptions.SSLError, FATAL),
+    (requests.exceptions.ConnectionError, RETRYABLE),
+    (requests.exceptions.ReadTimeout, CONDITIONAL),
+    (requests.exceptions.ChunkedEncodingError, CONDITIONAL),
+)
+
+
+def classify_status_code(status_code):
+    """
+    Classifies a response status code which is not a success
+    :param status_code:
+    :return: classification
+    :rtype: str
+    """
+    if status_code in STATUS_CLASSIFICATIONS:
+        return STATUS_CLASSIFICATIONS[status_code]
+    if isinstance(status_code, int) and 400 <= status_code < 500:
+        return FATAL
+    if isinstance(status_code, int) and status_code >= 500:
+        return CONDITIONAL
+    return RETRYABLE
+
+
+def classify_exception(exception):
+    """
+    Classifies an exception raised while making a request
+    :param exception:
+    :return: classification
+    :rtype: str
+    """
+    for exception_type, classification in EXCEPTION_CLASSIFICATIONS:
+        if isinstance(exception, exception_type):
+            return classification
+    return RETRYABLE
+
+
+def is_retryable(classification, type_of_request, idempotent=None):
+    """
+    Decides whether a failure with the given classification should be retried
+    :param classification:
+    :param type_of_request: Which REST request is being conducted
+    :param idempotent: Whether repeating the request is safe. Defaults to whether the method is idempotent.
+    :return: retryable
+    :rtype: bool
+    """
+    if classification == CONDITIONAL:
+        if idempotent is None:
+            idempotent = type_of_request in IDEMPOTENT_METHODS
+        return idempotent
+    return classification == RETRYABLE
@@ -0,0 +1,148 @@
+"""
+This module holds the process-wide HTTP transport used by RPT-RC.
+A single requests.Session is kept per target host and proxy so that connections are pooled and
+kept alive between requests rather than a new TCP connection being opened for every request
+"""
+
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from rptrc.src import configuration
+
+DEFAULT_CONNECTION_POOL_SIZE = 10
+
+
+class SessionRegistry:
+    """
+    A thread-safe registry of requests.Session objects, one per target host and proxy
+    """
+    def __init__(self, connection_pool_size=DEFAULT_CONNECTION_POOL_SIZE, connection_pool_block=False,
+                 session_factory=None):
+        self.connection_pool_size = connection_pool_size
+        self.connection_pool_block = connection_pool_block
+        self.session_factory = session_factory
+        self.__sessions = {}
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def build_session_key(url, proxy=None):
+        """
+        Builds the key a session is registered under. Requests to the same scheme and host through
+        the same proxy share a session and therefore a connection pool.
+        :param url:
+        :param proxy:
+        :return: session_key
+        :rtype: tuple
+        """
+        split_url = urlsplit(url)
+        proxy_key = tuple(sorted(proxy.items())) if proxy else ()
+        return split_url.scheme, split_url.netloc, proxy_key
+
+    def get_session(self, url, proxy=None):
+        """
+        Returns the session for the target host of the URL, creating it on first use
+        :param url:
+        :param proxy:
+        :return: session
+        :rtype: requests.Session
+        """
+        session_key = self.build_session_key(url, proxy)
+        session = self.__sessions.get(session_key)
+        if session is not None:
+            return session
+        with self.__lock:
+            session = self.__sessions.get(session_key)
+            if session is None:
+                logging.debug(f'Creating a pooled HTTP session for: {session_key[0]}://{session_key[1]}')
+                session = self.__create_session__(proxy)
+                self.__sessions[session_key] = session
+        return session
+
+    def __create_session__(self, proxy):
+        """
+        Creates a session with a connection pool mounted for both http and https, or through the
+        session factory when one is set
+        :param proxy:
+        :return: session
+        :rtype: requests.Session
+        """
+        if self.session_factory is not None:
+            return self.session_factory(proxy)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=self.connection_pool_size,
+                              pool_block=self.connection_pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if proxy:
+            session.proxies.update(proxy)
+        return session
+
+    def close(self):
+        """
+        Closes every session in the registry and the connections held by them
+        """
+        with self.__lock:
+            for session in self.__sessions.values():
+                session.close()
+            self.__sessions.clear()
+
+    def __len__(self):
+        return len(self.__sessions)
+
+
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+_SESSION_FACTORY = None
+
+
+def get_registry():
+    """
+    Returns the process-wide session registry, building it from the application config on first use.
+    Warnings about unverified HTTPS requests are silenced then too, rather than on import
+    :return: registry
+    :rtype: SessionRegistry
+    """
+    global _REGISTRY  # pylint: disable=global-statement
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+                constants = configuration.get_config()
+                _REGISTRY = SessionRegistry(
+                    connection_pool_size=constants.getint('PERFORMANCE', 'connection_pool_size',
+                                                          fallback=DEFAULT_CONNECTION_POOL_SIZE),
+                    connection_pool_block=constants.getboolean('PERFORMANCE', 'connection_pool_block',
+                                                               fallback=False),
+                    session_factory=_SESSION_FACTORY)
+    return _REGISTRY
+
+
+def set_session_factory(session_factory):
+    """
+    Replaces how the process-wide registry creates sessions, e.g. with a stand-in that sends nothing
+    over the network. Sessions created before are closed.
+    :param session_factory: Called with the proxy to create a session, or None to restore requests.Session
+    """
+    global _REGISTRY, _SESSION_FACTORY  # pylint: disable=global-statement
+    with _REGISTRY_LOCK:
+        _SESSION_FACTORY = session_factory
+        if _REGISTRY is not None:
+            _REGISTRY.close()
+            _REGISTRY = None
+
+
+def get_session(url, proxy=None):
+    """
+    Returns the process-wide pooled session for the target host of the URL
+    :param url:
+    :param proxy:
+    :return: session
+    :rtype: requests.Session
+    """
+    return get_registry().get_session(url, proxy)
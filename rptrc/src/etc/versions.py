@@ -0,0 +1,167 @@
+"""
+This module parses and compares the versions deployed on test environments, e.g. the helmfile
+versions of EIC such as 2.1.0-56 or 2.1.0+56.
+
+A version is ordered by its numeric release first, then by its build number, with a + build, the
+released build, after the - build of the same number. A build number may be followed by further
+parts, e.g. 2.1.0-56-h1a2b3c. Any other suffix, e.g. 2.1.0-rc1, marks a pre-release ordered before
+every build of its release. Parsing is cached, so comparing
+the same versions again only compares their keys.
+
+Versions can be checked against specifications: one or more clauses joined by commas, all of which
+must hold, e.g. >=2.1.0,<3, with alternatives joined by ||, e.g. 2.1.0-56 || 2.1.0-57. A clause is
+a version preceded by ==, !=, <, <=, >, >= or ~=, a bare version meaning ==. ~=2.1 allows any 2.x
+from 2.1 up and ~=2.1.0 any 2.1.x from 2.1.0 up. A single bare version is not a specification: it
+must equal the version exactly, so 2.1 does not match 2.1.0.
+"""
+
+import functools
+import logging
+import re
+
+from rptrc.src.etc.exceptions import FatalException
+
+VERSION_PATTERN = re.compile(r'^\s*[vV]?(\d+(?:\.\d+)*)(?:([-+])(.+?))?\s*$')
+BUILD_PATTERN = re.compile(r'^(\d+)(?:[-.].*)?$')
+CLAUSE_PATTERN = re.compile(r'^\s*(==|!=|<=|>=|~=|<|>)?\s*(\S.*?)\s*$')
+SPECIFICATION_PATTERN = re.compile(r'^\s*(==|!=|<=|>=|~=|<|>)|,|\|\|')
+PRE_RELEASE, DROP, RELEASE = 0, 1, 2
+
+
+@functools.total_ordering
+class Version:
+    """
+    A parsed version, compared by its key
+    """
+    __slots__ = ('text', 'release', 'key')
+
+    def __init__(self, text):
+        self.text = text
+        match = VERSION_PATTERN.match(text or '')
+        if match is None:
+            self.release = ()
+            self.key = ((), PRE_RELEASE, -1, text or '')
+            return
+        self.release = tuple(int(part) for part in match.group(1).split('.'))
+        separator, suffix = match.group(2), match.group(3)
+        build = BUILD_PATTERN.match(suffix or '')
+        if suffix is None:
+            self.key = (self.__padded__(self.release), RELEASE, -1, '')
+        elif build is not None:
+            self.key = (self.__padded__(self.release), RELEASE if separator == '+' else DROP, int(build.group(1)),
+                        suffix)
+        else:
+            self.key = (self.__padded__(self.release), PRE_RELEASE, -1, suffix)
+
+    @staticmethod
+    def __padded__(release):
+        """
+        Pads a release to three parts so that 2.1 and 2.1.0 compare equal
+        :param release:
+        :return: release
+        :rtype: tuple
+        """
+        return release + (0,) * (3 - len(release))
+
+    def __eq__(self, other):
+        return isinstance(other, Version) and self.key == other.key
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f'Version({self.text!r})'
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_version(text):
+    """
+    Parses a version, caching the result
+    :param text:
+    :return: version
+    :rtype: Version
+    """
+    return Version(text)
+
+
+def _satisfies_clause(version, operator, other):
+    """
+    Checks a version against a single clause
+    :param version:
+    :param operator:
+    :param other:
+    :return: satisfied
+    :rtype: bool
+    """
+    if operator == '~=':
+        prefix_length = max(len(other.release) - 1, 1)
+        return version >= other and version.release[:prefix_length] == other.release[:prefix_length]
+    return {'==': version == other, '!=': version != other, '<': version < other, '<=': version <= other,
+            '>': version > other, '>=': version >= other}[operator]
+
+
+@functools.lru_cache(maxsize=256)
+def parse_specification(specification):
+    """
+    Parses a version specification into its alternatives, each a tuple of (operator, version) clauses
+    :param specification: e.g. >=2.1.0,<3 || 1.9.0-12
+    :return: alternatives
+    :rtype: tuple
+    """
+    alternatives = []
+    for alternative in (specification or '').split('||'):
+        clauses = []
+        for clause in alternative.split(','):
+            match = CLAUSE_PATTERN.match(clause)
+            if match is None:
+                exception_message = f'Invalid version specification: "{specification}"'
+                logging.critical(exception_message)
+                raise FatalException(exception_message)
+            clauses.append((match.group(1) or '==', parse_version(match.group(2))))
+        alternatives.append(tuple(clauses))
+    return tuple(alternatives)
+
+
+def is_specification(text):
+    """
+    Checks whether a version to compare against is a specification rather than a bare version, i.e.
+    it starts with an operator or holds , or ||
+    :param text:
+    :return: specification
+    :rtype: bool
+    """
+    return bool(text) and SPECIFICATION_PATTERN.search(text) is not None
+
+
+def version_matches(version, specification):
+    """
+    Checks whether a version meets a specification, or equals a bare version exactly
+    :param version: The version e.g. deployed on a test environment
+    :param specification: e.g. 2.1.0-56, >=2.1.0,<3 or 2.1.0-56 || 2.1.0-57
+    :return: matched
+    :rtype: bool
+    """
+    if not is_specification(specification):
+        return version == specification
+    if version is None:
+        return False
+    parsed_version = parse_version(str(version))
+    return any(all(_satisfies_clause(parsed_version, operator, other) for operator, other in clauses)
+               for clauses in parse_specification(specification))
+
+
+def select_freshest(test_environments):
+    """
+    Selects the test environment on the freshest version, the first passed in winning a tie
+    :param test_environments: TestEnvironment models
+    :return: test_environment, or None if none were passed in
+    :rtype: TestEnvironment
+    """
+    freshest = None
+    for test_environment in test_environments:
+        if freshest is None or parse_version(str(test_environment.version)) > parse_version(str(freshest.version)):
+            freshest = test_environment
+    return freshest
@@ -0,0 +1,280 @@
+"""
+This module holds the reservation waiter: a long-running process that waits on queued Requests for
+every RPT-RC invocation on an agent. Invocations register their Request ID over a Unix socket and
+block until it leaves the queue, while the waiter polls every outstanding Request once however many
+invocations wait on it, rather than each invocation polling RPT on its own.
+
+Every Request is polled on the backoff of the polling strategy, so that the waiter puts no more load
+on RPT than a single invocation would. Each sweep polls the Requests that are due and is bounded by a
+timeout, so that a slow request cannot hold up the Requests polled after it.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from rptrc.src.etc.exceptions import DeadlineExceededException, FatalException, RetriesExhaustedException
+from rptrc.src.etc.fan_out import fan_out
+from rptrc.src.etc.polling import get_polling_strategy
+
+DEFAULT_SWEEP_INTERVAL = 1.0
+DEFAULT_SWEEP_TIMEOUT = 10.0
+DEFAULT_MAX_WAIT = 3600.0
+DEFAULT_CONCURRENCY = 8
+TRANSIENT_ERRORS = (DeadlineExceededException, RetriesExhaustedException)
+
+
+class PendingRequest:
+    """
+    A Request being waited on, shared by every invocation waiting on the same Request ID
+    """
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.request = None
+        self.error = None
+        self.polls = 0
+        self.due_at = 0.0
+        self.__resolved = threading.Event()
+
+    def resolve(self, request=None, error=None):
+        """
+        Records the Request once it left the queue, or the error that ended the wait
+        :param request:
+        :param error:
+        """
+        self.request = request
+        self.error = error
+        self.__resolved.set()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the Request is resolved or the timeout passes
+        :param timeout:
+        :return: resolved
+        :rtype: bool
+        """
+        return self.__resolved.wait(timeout)
+
+
+# pylint: disable=too-many-instance-attributes
+class Waiter:
+    """
+    Tracks outstanding Requests and polls each of them on the backoff of the polling strategy, sweeping
+    the Requests that are due once per interval
+    """
+    def __init__(self, requests_operator, sweep_interval=DEFAULT_SWEEP_INTERVAL, concurrency=DEFAULT_CONCURRENCY,
+                 polling_strategy=None, sweep_timeout=DEFAULT_SWEEP_TIMEOUT):
+        self.requests_operator = requests_operator
+        self.sweep_interval = sweep_interval
+        self.concurrency = concurrency
+        self.polling_strategy = polling_strategy if polling_strategy is not None else get_polling_strategy()
+        self.sweep_timeout = sweep_timeout
+        self.__outstanding = {}
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+
+    def register(self, request_id):
+        """
+        Starts waiting on a Request, joining the wait already in progress for the same ID
+        :param request_id:
+        :return: pending_request
+        :rtype: PendingRequest
+        """
+        with self.__lock:
+            pending_request = self.__outstanding.get(request_id)
+            if pending_request is None:
+                logging.info(f'Waiting on Request {request_id}')
+                pending_request = PendingRequest(request_id)
+                self.__outstanding[request_id] = pending_request
+        return pending_request
+
+    def __len__(self):
+        return len(self.__outstanding)
+
+    def sweep(self, now=None):
+        """
+        Retrieves every outstanding Request that is due to be polled, resolving those that left the
+        queue or could not be retrieved. Requests still queued, or that failed to be retrieved in time,
+        are polled again once the next interval of their backoff passed.
+        :param now: The monotonic time of the sweep. Defaults to the current time.
+        :return: resolved, the number of Requests resolved
+        :rtype: int
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.__lock:
+            due = [pending_request for pending_request in self.__outstanding.values() if pending_request.due_at <= now]
+        if not due:
+            return 0
+        logging.debug(f'Sweeping {len(due)} of {len(self)} outstanding Requests')
+        requests_operator = self.requests_operator.bounded_by(self.sweep_timeout)
+        results = fan_out(lambda pending_request: requests_operator.get_request_with_id(pending_request.request_id),
+                          due, self.concurrency, self.sweep_timeout)
+        resolved = 0
+        for result in results:
+            if (result.succeeded and result.value['status'] == 'Queued') or isinstance(result.error, TRANSIENT_ERRORS):
+                result.item.polls += 1
+                result.item.due_at = now + self.polling_strategy.next_interval(result.item.polls)
+                continue
+            with self.__lock:
+                self.__outstanding.pop(result.item.request_id, None)
+            if result.succeeded:
+                result.item.resolve(request=result.value)
+            else:
+                result.item.resolve(error=str(result.error))
+            resolved += 1
+        return resolved
+
+    def run(self):
+        """
+        Sweeps the outstanding Requests once per interval until stopped
+        """
+        while not self.__stopped.is_set():
+            try:
+                self.sweep()
+            except Exception as sweep_exception:  # pylint: disable=broad-except
+                logging.error(f'Sweep of outstanding Requests failed: {sweep_exception}')
+            self.__stopped.wait(self.sweep_interval)
+
+    def stop(self):
+        """
+        Stops sweeping
+        """
+        self.__stopped.set()
+
+
+class WaiterRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles a single invocation waiting on a Request. The invocation sends one JSON line holding the
+    request_id, the target_host of RPT and the timeout it waits for, and receives one JSON line holding
+    the request or an error. An invocation the Request was not resolved in time for is told to wait by
+    itself.
+    """
+    def handle(self):
+        waiter = self.server.waiter
+        try:
+            message = json.loads(self.rfile.readline())
+            request_id = message['request_id']
+            timeout = self.server.max_wait if message.get('timeout') is None \
+                else min(float(message['timeout']), self.server.max_wait)
+        except (ValueError, KeyError, TypeError):
+            self.reply({'error': 'Invalid message sent to the waiter'})
+            return
+        if message.get('target_host') != waiter.requests_operator.target_host:
+            self.reply({'wait_locally': True,
+                        'error': f'The waiter serves {waiter.requests_operator.target_host}'})
+            return
+        pending_request = waiter.register(request_id)
+        if not pending_request.wait(timeout):
+            self.reply({'wait_locally': True,
+                        'error': f'Request {request_id} was not resolved within {timeout:.1f} seconds'})
+        elif pending_request.error is not None:
+            self.reply({'error': pending_request.error})
+        else:
+            self.reply({'request': pending_request.request})
+
+    def reply(self, body):
+        """
+        Sends the reply to the invocation, which may have given up waiting already
+        :param body:
+        """
+        try:
+            self.wfile.write(json.dumps(body).encode('utf-8') + b'\n')
+        except OSError:
+            logging.debug('Invocation went away before its Request was resolved')
+
+
+class WaiterServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves the waiter on a Unix socket, handling every waiting invocation on its own thread
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, waiter, max_wait=DEFAULT_MAX_WAIT):
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, WaiterRequestHandler)
+        self.waiter = waiter
+        self.max_wait = max_wait
+
+
+def remove_stale_socket(socket_path):
+    """
+    Removes a socket left behind by a process that is no longer serving on it
+    :param socket_path:
+    """
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+            return
+    exception_message = f'Another process is already serving on {socket_path}'
+    logging.critical(exception_message)
+    raise FatalException(exception_message)
+
+
+def serve_waiter(socket_path, waiter, max_wait=DEFAULT_MAX_WAIT):
+    """
+    Runs the waiter on the Unix socket until interrupted
+    :param socket_path:
+    :param waiter:
+    :param max_wait: Maximum seconds an invocation waits before it is told to wait by itself
+    """
+    server = WaiterServer(socket_path, waiter, max_wait)
+    sweeper = threading.Thread(target=waiter.run, daemon=True)
+    sweeper.start()
+    logging.info(f'Waiter serving {waiter.requests_operator.target_host} on {socket_path}')
+    try:
+        server.serve_forever()
+    finally:
+        waiter.stop()
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def wait_with_waiter(socket_path, request_id, target_host, deadline):
+    """
+    Waits for a queued Request through the waiter running on the agent
+    :param socket_path:
+    :param request_id:
+    :param target_host: The RPT host the Request was queued on
+    :param deadline: The deadline of the command waiting
+    :return: request, or None if no waiter could wait on the Request
+    :rtype: dict
+    """
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+    logging.info(f'Waiting for the queued request to be resolved by the waiter on {socket_path}')
+    message = json.dumps({'request_id': request_id, 'target_host': target_host,
+                          'timeout': deadline.remaining()}).encode('utf-8') + b'\n'
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(deadline.remaining())
+            connection.connect(socket_path)
+            connection.sendall(message)
+            with deadline.track('waiting for queued request'):
+                reply = connection.makefile('rb').readline()
+    except socket.timeout:
+        deadline.check(f'waiting on queued request {request_id}')
+        return None
+    except OSError as waiter_exception:
+        logging.warning(f'Could not wait through the waiter: {waiter_exception}')
+        return None
+    if not reply:
+        logging.warning('The waiter stopped before the Request was resolved')
+        return None
+    reply = json.loads(reply)
+    if reply.get('wait_locally'):
+        logging.info(f'Not waiting through the waiter: {reply["error"]}')
+        return None
+    if 'error' in reply:
+        exception_message = f'Failed to wait for Request {request_id}: {reply["error"]}'
+        logging.critical(exception_message)
+        raise FatalException(exception_message)
+    return reply['request']
@@ -0,0 +1,288 @@
+"""
+This module holds an in-process inventory of the test environments and pools of RPT. It is indexed by
+id, by name, by status and by pool, so that translating a name to an id, an id to a test environment or
+a pool to its test environments costs a dictionary lookup rather than a request to RPT.
+
+The inventory can be loaded whole from RPT, and the operators also record in it every test environment
+they retrieve or update, so that a command looking a test environment up more than once only asks RPT
+for it once. Recording a test environment again only moves it between the indexes whose key changed.
+
+The standby test environments of every pool are also kept ordered by version, so that the freshest
+standby test environment of a pool is read off the end of its list rather than ranked on every lookup.
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+
+from rptrc.src.etc.versions import parse_version
+from rptrc.src.models import Pool, TestEnvironment
+
+STANDBY = 'Standby'
+
+
+class Inventory:
+    """
+    Test environments and pools indexed by id, name, status and pool
+    """
+    def __init__(self, test_environments=(), pools=()):
+        self.__lock = threading.RLock()
+        self.__test_environments_by_id = {}
+        self.__test_environment_ids_by_name = {}
+        self.__test_environment_ids_by_status = defaultdict(set)
+        self.__test_environment_ids_by_pool = defaultdict(set)
+        self.__pools_by_name = {}
+        self.__standby_by_pool = {}
+        for test_environment in test_environments:
+            self.record_test_environment(test_environment)
+        for pool in pools:
+            self.record_pool(pool)
+
+    @classmethod
+    def load(cls, test_environments_operator, pools_operator=None):
+        """
+        Loads every test environment, and every pool if a pools operator is passed, from RPT
+        :param test_environments_operator: A TestEnvironments operator
+        :param pools_operator: A Pools operator
+        :return: inventory
+        :rtype: Inventory
+        """
+        inventory = cls()
+        inventory.refresh(test_environments_operator, pools_operator)
+        return inventory
+
+    def refresh(self, test_environments_operator, pools_operator=None):
+        """
+        Retrieves every test environment, and every pool if a pools operator is passed, from RPT and
+        brings the inventory up to date with them. This is not an incremental fetch: everything is
+        retrieved again on every refresh, and only the entities that differ from those held are re-indexed
+        :param test_environments_operator: A TestEnvironments operator
+        :param pools_operator: A Pools operator
+        :return: changed, the number of test environments and pools added, changed or removed
+        :rtype: int
+        """
+        changed = self.__replace_test_environments(
+            [TestEnvironment.from_json(document)
+             for document in test_environments_operator.retrieve_all_test_environments()])
+        if pools_operator is not None:
+            changed += self.__replace_pools(
+                [Pool.from_json(document) for document in pools_operator.retrieve_all_pools()])
+        return changed
+
+    def __replace_test_environments(self, test_environments):
+        with self.__lock:
+            changed = 0
+            for removed_id in set(self.__test_environments_by_id) - {entity.id for entity in test_environments}:
+                self.remove_test_environment(removed_id)
+                changed += 1
+            for test_environment in test_environments:
+                if self.record_test_environment(test_environment):
+                    changed += 1
+            return changed
+
+    def __replace_pools(self, pools):
+        with self.__lock:
+            changed = 0
+            for removed_name in set(self.__pools_by_name) - {pool.name for pool in pools}:
+                del self.__pools_by_name[removed_name]
+                changed += 1
+            for pool in pools:
+                if self.record_pool(pool):
+                    changed += 1
+            return changed
+
+    def record_test_environment(self, test_environment):
+        """
+        Adds a test environment to the inventory or replaces the one with the same id, moving it
+        between the name, status and pool indexes only where those changed
+        :param test_environment: A TestEnvironment, or a test environment document returned by RPT
+        :return: changed, whether the test environment is new or differs from the one it replaced
+        :rtype: bool
+        """
+        if isinstance(test_environment, dict):
+            test_environment = TestEnvironment.from_json(test_environment)
+        with self.__lock:
+            previous = self.__test_environments_by_id.get(test_environment.id)
+            self.__test_environments_by_id[test_environment.id] = test_environment
+            if previous is None:
+                self.__index_test_environment__(test_environment)
+                return True
+            if STANDBY in (previous.status, test_environment.status) and (
+                    previous.status, previous.pools, previous.version) != (
+                    test_environment.status, test_environment.pools, test_environment.version):
+                self.__unindex_standby__(previous)
+                self.__index_standby__(test_environment)
+            if previous.name != test_environment.name:
+                self.__unindex_name__(previous)
+                self.__test_environment_ids_by_name[test_environment.name] = test_environment.id
+            if previous.status != test_environment.status:
+                self.__discard__(self.__test_environment_ids_by_status, previous.status, previous.id)
+                self.__test_environment_ids_by_status[test_environment.status].add(test_environment.id)
+            for pool_name in set(previous.pools) - set(test_environment.pools):
+                self.__discard__(self.__test_environment_ids_by_pool, pool_name, previous.id)
+            for pool_name in set(test_environment.pools) - set(previous.pools):
+                self.__test_environment_ids_by_pool[pool_name].add(test_environment.id)
+            return (previous.name, previous.status, previous.pools, previous.stage, previous.properties) != (
+                test_environment.name, test_environment.status, test_environment.pools, test_environment.stage,
+                test_environment.properties)
+
+    def remove_test_environment(self, test_environment_id):
+        """
+        Removes a test environment from the inventory and from every index
+        :param test_environment_id:
+        :return: test_environment, the test environment removed or None if there was none
+        :rtype: TestEnvironment
+        """
+        with self.__lock:
+            test_environment = self.__test_environments_by_id.pop(test_environment_id, None)
+            if test_environment is not None:
+                self.__unindex_name__(test_environment)
+                self.__unindex_standby__(test_environment)
+                self.__discard__(self.__test_environment_ids_by_status, test_environment.status, test_environment.id)
+                for pool_name in test_environment.pools:
+                    self.__discard__(self.__test_environment_ids_by_pool, pool_name, test_environment.id)
+            return test_environment
+
+    def record_pool(self, pool):
+        """
+        Adds a pool to the inventory or replaces the one with the same name
+        :param pool: A Pool, or a pool document returned by RPT
+        :return: changed, whether the pool is new or differs from the one it replaced
+        :rtype: bool
+        """
+        if isinstance(pool, dict):
+            pool = Pool.from_json(pool)
+        with self.__lock:
+            previous = self.__pools_by_name.get(pool.name)
+            self.__pools_by_name[pool.name] = pool
+            return previous is None or (previous.id, previous.test_environment_ids) != (
+                pool.id, pool.test_environment_ids)
+
+    def forget_pools(self, pool_names, test_environment_id=None):
+        """
+        Removes pools from the inventory, and every pool listing a test environment if its id is passed,
+        e.g. once the pools of the test environment changed in RPT
+        :param pool_names:
+        :param test_environment_id:
+        """
+        with self.__lock:
+            for pool in list(self.__pools_by_name.values()):
+                if pool.name in pool_names or test_environment_id in pool.test_environment_ids:
+                    del self.__pools_by_name[pool.name]
+
+    def test_environment_by_id(self, test_environment_id):
+        """
+        Looks a test environment up by id
+        :param test_environment_id:
+        :return: test_environment, or None if the inventory does not hold it
+        :rtype: TestEnvironment
+        """
+        return self.__test_environments_by_id.get(test_environment_id)
+
+    def test_environment_by_name(self, test_environment_name):
+        """
+        Looks a test environment up by name
+        :param test_environment_name:
+        :return: test_environment, or None if the inventory does not hold it
+        :rtype: TestEnvironment
+        """
+        with self.__lock:
+            test_environment_id = self.__test_environment_ids_by_name.get(test_environment_name)
+            return self.__test_environments_by_id.get(test_environment_id)
+
+    def test_environments(self):
+        """
+        Lists every test environment in the inventory
+        :return: test_environments
+        :rtype: list
+        """
+        with self.__lock:
+            return list(self.__test_environments_by_id.values())
+
+    def test_environments_with_status(self, status, pool_name=None):
+        """
+        Looks up the test environments with a status, optionally only those listing a pool
+        :param status:
+        :param pool_name:
+        :return: test_environments
+        :rtype: list
+        """
+        with self.__lock:
+            test_environment_ids = self.__test_environment_ids_by_status.get(status, set())
+            if pool_name is not None:
+                test_environment_ids = test_environment_ids & self.__test_environment_ids_by_pool.get(pool_name, set())
+            return [self.__test_environments_by_id[test_environment_id] for test_environment_id in test_environment_ids]
+
+    def test_environments_in_pool(self, pool_name):
+        """
+        Looks up the test environments listing a pool in their pools
+        :param pool_name:
+        :return: test_environments
+        :rtype: list
+        """
+        with self.__lock:
+            return [self.__test_environments_by_id[test_environment_id]
+                    for test_environment_id in self.__test_environment_ids_by_pool.get(pool_name, set())]
+
+    def freshest_standby_test_environment(self, pool_name, excluded_ids=()):
+        """
+        Looks up the standby test environment on the freshest version listing a pool in its pools, the
+        greatest id winning a tie
+        :param pool_name:
+        :param excluded_ids: Ids of test environments to pass over
+        :return: test_environment, or None if the pool has no other standby test environments
+        :rtype: TestEnvironment
+        """
+        with self.__lock:
+            for _, test_environment_id in reversed(self.__standby_by_pool.get(pool_name, ())):
+                if test_environment_id not in excluded_ids:
+                    return self.__test_environments_by_id[test_environment_id]
+            return None
+
+    def pool_by_name(self, pool_name):
+        """
+        Looks a pool up by name
+        :param pool_name:
+        :return: pool, or None if the inventory does not hold it
+        :rtype: Pool
+        """
+        return self.__pools_by_name.get(pool_name)
+
+    def __len__(self):
+        return len(self.__test_environments_by_id)
+
+    def __index_test_environment__(self, test_environment):
+        self.__test_environment_ids_by_name[test_environment.name] = test_environment.id
+        self.__test_environment_ids_by_status[test_environment.status].add(test_environment.id)
+        for pool_name in test_environment.pools:
+            self.__test_environment_ids_by_pool[pool_name].add(test_environment.id)
+        self.__index_standby__(test_environment)
+
+    def __index_standby__(self, test_environment):
+        if test_environment.status == STANDBY:
+            entry = (parse_version(str(test_environment.version)), test_environment.id)
+            for pool_name in set(test_environment.pools):
+                bisect.insort(self.__standby_by_pool.setdefault(pool_name, []), entry)
+
+    def __unindex_standby__(self, test_environment):
+        if test_environment.status == STANDBY:
+            entry = (parse_version(str(test_environment.version)), test_environment.id)
+            for pool_name in set(test_environment.pools):
+                entries = self.__standby_by_pool.get(pool_name, [])
+                position = bisect.bisect_left(entries, entry)
+                if position < len(entries) and entries[position] == entry:
+                    del entries[position]
+                if not entries:
+                    self.__standby_by_pool.pop(pool_name, None)
+
+    def __unindex_name__(self, test_environment):
+        if self.__test_environment_ids_by_name.get(test_environment.name) == test_environment.id:
+            del self.__test_environment_ids_by_name[test_environment.name]
+
+    @staticmethod
+    def __discard__(index, key, test_environment_id):
+        test_environment_ids = index.get(key)
+        if test_environment_ids is not None:
+            test_environment_ids.discard(test_environment_id)
+            if not test_environment_ids:
+                del index[key]
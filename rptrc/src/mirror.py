@@ -0,0 +1,350 @@
+"""
+This module declares a local mirror of RPT shared by every RPT-RC invocation on an agent. The test
+environments, pools and Requests RPT-RC retrieves or changes are kept in an SQLite file on a shared
+volume, so that an invocation can answer a lookup another invocation made moments ago without a
+request to RPT. Rows are only served while they are younger than the configured staleness bound.
+
+Every row keeps the modifiedOn watermark of the entity. Storing a test environment identical to the
+one mirrored only marks its row as fresh rather than rewriting it. The watermark alone cannot tell,
+as RPT stamps it to the second and two mutations within a second share it.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from rptrc.src import configuration
+from rptrc.src.inventory import Inventory
+from rptrc.src.models import Pool, QueuedRequest, TestEnvironment
+
+DEFAULT_PATH = '/usr/src/app/state/rptrc_mirror.sqlite'
+DEFAULT_MAX_STALENESS = 30.0
+BUSY_TIMEOUT = 5.0
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS test_environments (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    status TEXT,
+    stage TEXT,
+    properties TEXT,
+    modified_on TEXT,
+    mirrored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS test_environments_by_name ON test_environments (name);
+CREATE INDEX IF NOT EXISTS test_environments_by_status ON test_environments (status);
+CREATE TABLE IF NOT EXISTS test_environment_pools (
+    pool_name TEXT NOT NULL,
+    test_environment_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (pool_name, test_environment_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS test_environment_pools_by_test_environment
+    ON test_environment_pools (test_environment_id);
+CREATE TABLE IF NOT EXISTS pools (
+    name TEXT PRIMARY KEY,
+    id TEXT,
+    test_environment_ids TEXT,
+    modified_on TEXT,
+    mirrored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS requests (
+    id TEXT PRIMARY KEY,
+    status TEXT,
+    pool_name TEXT,
+    idempotency_key TEXT,
+    test_environment_id TEXT,
+    modified_on TEXT,
+    mirrored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requests_by_idempotency_key ON requests (idempotency_key);
+CREATE TABLE IF NOT EXISTS refreshes (
+    entity TEXT PRIMARY KEY,
+    refreshed_at REAL NOT NULL
+);
+'''
+
+
+class Mirror:
+    """
+    Test environments, pools and Requests mirrored from RPT into an SQLite file
+    """
+    def __init__(self, path=DEFAULT_PATH, max_staleness=DEFAULT_MAX_STALENESS, clock=time.time):
+        self.path = path
+        self.max_staleness = max_staleness
+        self.clock = clock
+        self.__lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.__connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                            check_same_thread=False)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.executescript(SCHEMA)
+
+    def close(self):
+        """
+        Closes the SQLite file
+        """
+        with self.__lock:
+            self.__connection.close()
+
+    def __write__(self, statements):
+        """
+        Runs statements in a single transaction
+        :param statements: (sql, parameters) tuples
+        """
+        with self.__lock:
+            self.__connection.execute('BEGIN IMMEDIATE')
+            try:
+                for sql, parameters in statements:
+                    self.__connection.execute(sql, parameters)
+            except BaseException:
+                self.__connection.execute('ROLLBACK')
+                raise
+            self.__connection.execute('COMMIT')
+
+    def __read__(self, sql, parameters=()):
+        """
+        Runs a query, returning every row
+        :param sql:
+        :param parameters:
+        :return: rows
+        :rtype: list
+        """
+        with self.__lock:
+            return self.__connection.execute(sql, parameters).fetchall()
+
+    def __fresh_since__(self):
+        return self.clock() - self.max_staleness
+
+    def __test_environment_statements__(self, document, mirrored_at):
+        """
+        Builds the statements mirroring a test environment, only rewriting its row if it differs from the
+        one mirrored
+        :param document: A test environment document returned by RPT
+        :param mirrored_at:
+        :return: statements
+        :rtype: list
+        """
+        test_environment = TestEnvironment.from_json(document)
+        properties = document.get('properties')
+        row = (test_environment.name, test_environment.status, test_environment.stage,
+               json.dumps(properties) if properties else None, document.get('modifiedOn'))
+        mirrored_row = self.__read__('SELECT name, status, stage, properties, modified_on FROM test_environments '
+                                     'WHERE id = ?', (test_environment.id,))
+        if mirrored_row and mirrored_row[0] == row:
+            mirrored_pools = self.__read__('SELECT pool_name FROM test_environment_pools WHERE test_environment_id = ? '
+                                           'ORDER BY position', (test_environment.id,))
+            if tuple(pool_name for (pool_name,) in mirrored_pools) == tuple(test_environment.pools):
+                return [('UPDATE test_environments SET mirrored_at = ? WHERE id = ?',
+                         (mirrored_at, test_environment.id))]
+        return [
+            ('INSERT OR REPLACE INTO test_environments VALUES (?, ?, ?, ?, ?, ?, ?)',
+             (test_environment.id,) + row + (mirrored_at,)),
+            ('DELETE FROM test_environment_pools WHERE test_environment_id = ?', (test_environment.id,)),
+        ] + [('INSERT OR REPLACE INTO test_environment_pools VALUES (?, ?, ?)',
+              (pool_name, test_environment.id, position)) for position, pool_name in enumerate(test_environment.pools)]
+
+    def record_test_environments(self, documents):
+        """
+        Mirrors test environments retrieved from or returned by RPT
+        :param documents: Test environment documents returned by RPT
+        """
+        mirrored_at = self.clock()
+        statements = []
+        for document in documents:
+            if isinstance(document, dict) and document.get('id') is not None:
+                statements.extend(self.__test_environment_statements__(document, mirrored_at))
+        if statements:
+            self.__write__(statements)
+
+    @staticmethod
+    def __pool_statement__(document, mirrored_at):
+        """
+        Builds the statement mirroring a pool
+        :param document: A pool document returned by RPT
+        :param mirrored_at:
+        :return: statement
+        :rtype: tuple
+        """
+        pool = Pool.from_json(document)
+        return ('INSERT OR REPLACE INTO pools VALUES (?, ?, ?, ?, ?)',
+                (pool.name, pool.id, json.dumps(list(pool.test_environment_ids)), document.get('modifiedOn'),
+                 mirrored_at))
+
+    def record_pool(self, document):
+        """
+        Mirrors a pool retrieved from RPT
+        :param document: A pool document returned by RPT
+        """
+        if document.get('poolName') is not None:
+            self.__write__([self.__pool_statement__(document, self.clock())])
+
+    def forget_pools(self, pool_names, test_environment_id=None):
+        """
+        Deletes the rows of pools, and of every pool listing a test environment if its id is passed, e.g.
+        once the pools of the test environment changed in RPT
+        :param pool_names:
+        :param test_environment_id:
+        """
+        statements = [('DELETE FROM pools WHERE name = ?', (pool_name,)) for pool_name in pool_names]
+        if test_environment_id is not None:
+            statements.append(('DELETE FROM pools WHERE instr(test_environment_ids, ?) > 0',
+                               (json.dumps(test_environment_id),)))
+        if statements:
+            self.__write__(statements)
+
+    def record_request(self, document):
+        """
+        Mirrors a Request retrieved from or returned by RPT
+        :param document: A Request document returned by RPT
+        """
+        if not isinstance(document, dict) or document.get('id') is None:
+            return
+        request = QueuedRequest.from_json(document)
+        self.__write__([('INSERT OR REPLACE INTO requests VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (request.id, request.status, request.pool_name, request.idempotency_key,
+                          request.test_environment_id, document.get('modifiedOn'), self.clock()))])
+
+    def __select_test_environments__(self, condition, parameters):
+        """
+        Selects the test environments mirrored within the staleness bound that meet a condition, keeping
+        their properties as JSON text until first used
+        :param condition: An SQL condition on the columns of the test_environments table
+        :param parameters:
+        :return: test_environments
+        :rtype: list
+        """
+        fresh_since = self.__fresh_since__()
+        rows = self.__read__('SELECT id, name, status, stage, properties FROM test_environments '
+                             f'WHERE {condition} AND mirrored_at >= ?', list(parameters) + [fresh_since])
+        pools = {}
+        for pool_name, test_environment_id in self.__read__(
+                'SELECT pool_name, test_environment_id FROM test_environment_pools WHERE test_environment_id IN '
+                f'(SELECT id FROM test_environments WHERE {condition} AND mirrored_at >= ?) ORDER BY position',
+                list(parameters) + [fresh_since]):
+            pools.setdefault(test_environment_id, []).append(pool_name)
+        return [TestEnvironment(entity_id, name, status, pools.get(entity_id, ()), stage, properties)
+                for entity_id, name, status, stage, properties in rows]
+
+    def test_environment_by_id(self, test_environment_id):
+        """
+        Looks up a test environment mirrored within the staleness bound by id
+        :param test_environment_id:
+        :return: test_environment, or None if there is no fresh row for it
+        :rtype: TestEnvironment
+        """
+        test_environments = self.__select_test_environments__('id = ?', (test_environment_id,))
+        return test_environments[0] if test_environments else None
+
+    def test_environment_by_name(self, test_environment_name):
+        """
+        Looks up a test environment mirrored within the staleness bound by name. A name held by more than
+        one fresh row is not answered, leaving RPT to report the duplicate.
+        :param test_environment_name:
+        :return: test_environment, or None if there is no single fresh row for it
+        :rtype: TestEnvironment
+        """
+        test_environments = self.__select_test_environments__('name = ?', (test_environment_name,))
+        return test_environments[0] if len(test_environments) == 1 else None
+
+    def pool_by_name(self, pool_name):
+        """
+        Looks up a pool mirrored within the staleness bound by name
+        :param pool_name:
+        :return: pool, or None if there is no fresh row for it
+        :rtype: Pool
+        """
+        rows = self.__read__('SELECT id, name, test_environment_ids FROM pools WHERE name = ? AND mirrored_at >= ?',
+                             (pool_name, self.__fresh_since__()))
+        if not rows:
+            return None
+        pool_id, name, test_environment_ids = rows[0]
+        return Pool(pool_id, name, json.loads(test_environment_ids))
+
+    def request_by_idempotency_key(self, idempotency_key, statuses):
+        """
+        Looks up a Request mirrored within the staleness bound by idempotency key and status
+        :param idempotency_key:
+        :param statuses: The statuses the Request may have
+        :return: request, or None if there is no fresh row for it
+        :rtype: QueuedRequest
+        """
+        placeholders = ', '.join('?' * len(statuses))
+        rows = self.__read__(
+            'SELECT id, status, pool_name, idempotency_key, test_environment_id FROM requests '
+            f'WHERE idempotency_key = ? AND status IN ({placeholders}) AND mirrored_at >= ?',
+            [idempotency_key] + list(statuses) + [self.__fresh_since__()])
+        return QueuedRequest(*rows[0]) if rows else None
+
+    def refresh(self, test_environments_operator, pools_operator=None):
+        """
+        Retrieves every test environment, and every pool if a pools operator is passed, from RPT and
+        brings the mirror up to date with them. Rows of entities RPT no longer has are deleted.
+        :param test_environments_operator: A TestEnvironments operator
+        :param pools_operator: A Pools operator
+        """
+        test_environments = test_environments_operator.retrieve_all_test_environments()
+        pools = pools_operator.retrieve_all_pools() if pools_operator is not None else None
+        mirrored_at = self.clock()
+        statements = []
+        for document in test_environments:
+            statements.extend(self.__test_environment_statements__(document, mirrored_at))
+        statements.append(('DELETE FROM test_environment_pools WHERE test_environment_id IN '
+                           '(SELECT id FROM test_environments WHERE mirrored_at < ?)', (mirrored_at,)))
+        statements.append(('DELETE FROM test_environments WHERE mirrored_at < ?', (mirrored_at,)))
+        if pools is not None:
+            statements.extend(self.__pool_statement__(document, mirrored_at) for document in pools)
+            statements.append(('DELETE FROM pools WHERE mirrored_at < ?', (mirrored_at,)))
+        statements.append(('INSERT OR REPLACE INTO refreshes VALUES (?, ?)', ('test_environments', mirrored_at)))
+        self.__write__(statements)
+        logging.info(f'Mirrored {len(test_environments)} test environments from RPT into {self.path}')
+
+    def is_complete(self):
+        """
+        Whether the mirror holds every test environment of RPT, i.e. it was refreshed whole within the
+        staleness bound
+        :return: complete
+        :rtype: bool
+        """
+        return bool(self.__read__('SELECT 1 FROM refreshes WHERE entity = ? AND refreshed_at >= ?',
+                                  ('test_environments', self.__fresh_since__())))
+
+    def load_inventory(self):
+        """
+        Builds an inventory of every test environment and pool mirrored within the staleness bound
+        :return: inventory
+        :rtype: Inventory
+        """
+        pools = [Pool(pool_id, name, json.loads(test_environment_ids)) for pool_id, name, test_environment_ids
+                 in self.__read__('SELECT id, name, test_environment_ids FROM pools WHERE mirrored_at >= ?',
+                                  (self.__fresh_since__(),))]
+        return Inventory(self.__select_test_environments__('1 = 1', ()), pools)
+
+
+_MIRROR = None
+_MIRROR_LOADED = False
+_MIRROR_LOCK = threading.Lock()
+
+
+def get_mirror():
+    """
+    Returns the mirror configured in application.ini, or None if it is disabled
+    :return: mirror
+    :rtype: Mirror
+    """
+    global _MIRROR, _MIRROR_LOADED  # pylint: disable=global-statement
+    if not _MIRROR_LOADED:
+        with _MIRROR_LOCK:
+            if not _MIRROR_LOADED:
+                constants = configuration.get_config()
+                if constants.getboolean('MIRROR', 'enabled', fallback=False):
+                    _MIRROR = Mirror(path=constants.get('MIRROR', 'path', fallback=DEFAULT_PATH),
+                                     max_staleness=constants.getfloat('MIRROR', 'max_staleness',
+                                                                      fallback=DEFAULT_MAX_STALENESS))
+                _MIRROR_LOADED = True
+    return _MIRROR
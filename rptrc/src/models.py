@@ -0,0 +1,131 @@
+"""
+This module holds compact models of the RPT entities. They keep only the fields RPT-RC works with
+rather than the whole documents RPT responds with, so that scans over many entities hold little in
+memory. The properties of a test environment are kept as they were received, which may be JSON text
+e.g. when read from a local store, and only decoded when first accessed.
+"""
+
+import json
+
+
+class TestEnvironment:
+    """
+    A test environment, keeping its id, name, status, pools, stage and properties
+    """
+    __slots__ = ('id', 'name', 'status', 'pools', 'stage', '__properties')
+
+    def __init__(self, entity_id, name=None, status=None, pools=(), stage=None, properties=None):
+        self.id = entity_id  # pylint: disable=invalid-name
+        self.name = name
+        self.status = status
+        self.pools = tuple(pools)
+        self.stage = stage
+        self.__properties = properties
+
+    @classmethod
+    def from_json(cls, document):
+        """
+        Builds a test environment from a document returned by RPT, leaving out every other field
+        :param document:
+        :return: test_environment
+        :rtype: TestEnvironment
+        """
+        return cls(document.get('id'), document.get('name'), document.get('status'), document.get('pools') or (),
+                   document.get('stage'), document.get('properties'))
+
+    @property
+    def properties(self):
+        """
+        The properties of the test environment, decoded on first access
+        :return: properties
+        :rtype: dict
+        """
+        if isinstance(self.__properties, (str, bytes)):
+            self.__properties = json.loads(self.__properties)
+        elif self.__properties is None:
+            self.__properties = {}
+        return self.__properties
+
+    @property
+    def version(self):
+        """
+        The version deployed on the test environment
+        :return: version
+        :rtype: str
+        """
+        return self.properties.get('version')
+
+    def to_json(self):
+        """
+        Builds a document of the fields kept, shaped like the documents returned by RPT
+        :return: document
+        :rtype: dict
+        """
+        return {'id': self.id, 'name': self.name, 'status': self.status, 'pools': list(self.pools),
+                'stage': self.stage, 'properties': self.properties}
+
+    def __repr__(self):
+        return f'TestEnvironment(id={self.id!r}, name={self.name!r}, status={self.status!r})'
+
+
+class Pool:
+    """
+    A pool, keeping its id, name and the ids of the test environments assigned to it
+    """
+    __slots__ = ('id', 'name', 'test_environment_ids')
+
+    def __init__(self, entity_id, name=None, test_environment_ids=()):
+        self.id = entity_id  # pylint: disable=invalid-name
+        self.name = name
+        self.test_environment_ids = tuple(test_environment_ids)
+
+    @classmethod
+    def from_json(cls, document):
+        """
+        Builds a pool from a document returned by RPT, leaving out every other field
+        :param document:
+        :return: pool
+        :rtype: Pool
+        """
+        return cls(document.get('id'), document.get('poolName'), document.get('assignedTestEnvironmentIds') or ())
+
+    def __repr__(self):
+        return f'Pool(id={self.id!r}, name={self.name!r}, test_environments={len(self.test_environment_ids)})'
+
+
+class QueuedRequest:
+    """
+    A Request for a test environment, keeping its id, status, pool, idempotency key and the test
+    environment it was given
+    """
+    __slots__ = ('id', 'status', 'pool_name', 'idempotency_key', 'test_environment_id')
+
+    def __init__(self, entity_id, status=None, pool_name=None, idempotency_key=None, test_environment_id=None):
+        self.id = entity_id  # pylint: disable=invalid-name
+        self.status = status
+        self.pool_name = pool_name
+        self.idempotency_key = idempotency_key
+        self.test_environment_id = test_environment_id
+
+    @classmethod
+    def from_json(cls, document):
+        """
+        Builds a Request from a document returned by RPT, leaving out every other field
+        :param document:
+        :return: request
+        :rtype: QueuedRequest
+        """
+        return cls(document.get('id'), document.get('status'), document.get('poolName'),
+                   document.get('idempotencyKey'), document.get('testEnvironmentId'))
+
+    def to_json(self):
+        """
+        Builds a document of the fields kept, shaped like the documents returned by RPT
+        :return: document
+        :rtype: dict
+        """
+        return {'id': self.id, 'status': self.status, 'poolName': self.pool_name,
+                'idempotencyKey': self.idempotency_key, 'testEnvironmentId': self.test_environment_id}
+
+    def __repr__(self):
+        return f'QueuedRequest(id={self.id!r}, status={self.status!r})'
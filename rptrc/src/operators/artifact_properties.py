@@ -4,9 +4,48 @@ The operator for handling artifact properties files.
 
 import os
 import logging
+import threading
+from contextlib import contextmanager
 
 from rptrc.src.etc.exceptions import InDirectoryNotSetException, InFileNotSetException, KeyValuePairsNotSetException
 
+_CAPTURE = threading.local()
+
+
+class ArtifactCapture:
+    """
+    In-memory artifact properties files, used in place of the file system by the thread that
+    captured them
+    """
+    def __init__(self, files=None):
+        self.files = dict(files or {})
+        self.written = set()
+
+    def written_files(self):
+        """
+        Returns the content of every file generated while capturing
+        :return: files by path
+        :rtype: dict
+        """
+        return {file_path: self.files[file_path] for file_path in sorted(self.written)}
+
+
+@contextmanager
+def capture_artifacts(files=None):
+    """
+    Redirects the artifact properties files read and generated on the current thread to memory
+    :param files: The content of the files that already exist, by path
+    :return: capture
+    :rtype: ArtifactCapture
+    """
+    capture = ArtifactCapture(files)
+    previous_capture = getattr(_CAPTURE, 'capture', None)
+    _CAPTURE.capture = capture
+    try:
+        yield capture
+    finally:
+        _CAPTURE.capture = previous_capture
+
 
 class ArtifactProperties:
     """
@@ -27,11 +66,21 @@ class ArtifactProperties:
         if not self.key_value_pairs:
             raise KeyValuePairsNotSetException('Attempted to generate artifact properties with no keys/values.')
 
+        file_path = f'{self.out_directory}/{self.out_file}'
+        capture = getattr(_CAPTURE, 'capture', None)
+        if capture is not None:
+            logging.debug(f'Writing to captured file "{file_path}".')
+            content = ''.join(f'{key}={value}\n' for key, value in self.key_value_pairs.items())
+            if self.mode == 'a':
+                content = capture.files.get(file_path, '') + content
+            capture.files[file_path] = content
+            capture.written.add(file_path)
+            return
+
         if not os.path.exists(self.out_directory):
             logging.debug(f'Creating directory "{self.out_directory}" as it does not exist.')
             os.makedirs(self.out_directory)
 
-        file_path = f'{self.out_directory}/{self.out_file}'
         with open(file_path, self.mode, encoding='utf-8') as out_file:
             logging.debug(f'Writing to file "{file_path}".')
             for key in self.key_value_pairs:
@@ -53,6 +102,16 @@ class ArtifactProperties:
             raise InDirectoryNotSetException('No in_directory specified.')
         if not in_file:
             raise InFileNotSetException('No in_file specified.')
+        capture = getattr(_CAPTURE, 'capture', None)
+        if capture is not None:
+            if file_path not in capture.files:
+                raise InFileNotSetException('The specified in_file does not exist.')
+            if self.key_value_pairs is None:
+                self.key_value_pairs = {}
+            logging.debug(f'Reading from captured file "{file_path}".')
+            self.__store_lines__(capture.files[file_path].splitlines())
+            return self.key_value_pairs
+
         if not os.path.exists(in_directory):
             raise InDirectoryNotSetException('The specified in_directory does not exist.')
         if not os.path.isfile(file_path):
@@ -62,9 +121,16 @@ class ArtifactProperties:
 
         with open(file_path, 'r', encoding='utf-8') as in_stream:
             logging.debug(f'Reading from file "{file_path}".')
-            for line in in_stream:
-                key_value_pair = line.split('=')
-                logging.debug(f'Storing {key_value_pair[1]} at [{key_value_pair[0]}] in self.key_value_pairs.')
-                self.key_value_pairs[key_value_pair[0]] = key_value_pair[1].rstrip()
+            self.__store_lines__(in_stream)
 
         return self.key_value_pairs
+
+    def __store_lines__(self, lines):
+        """
+        Stores the key/value pairs on the lines of an artifact properties file
+        :param lines:
+        """
+        for line in lines:
+            key_value_pair = line.split('=')
+            logging.debug(f'Storing {key_value_pair[1]} at [{key_value_pair[0]}] in self.key_value_pairs.')
+            self.key_value_pairs[key_value_pair[0]] = key_value_pair[1].rstrip()
@@ -2,24 +2,57 @@
 CRUD module declares common CRUD functionality and attributes for Operators
 They should inherit this class if they are making CRUD operations
 """
+import copy
 import json
 import logging
 from json import JSONDecodeError
 
 from rptrc.src import configuration
-from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.entity_cache import get_entity_cache
+from rptrc.src.etc.deadline import Deadline
+from rptrc.src.etc.exceptions import FatalException, NonRetryableRequestException
 from rptrc.src.etc.request_retry import request_retry
+from rptrc.src.etc.retry_policy import get_retry_policy
+from rptrc.src.etc.single_flight import SingleFlight
 
+IN_FLIGHT_GETS = SingleFlight()
 
+
+# pylint: disable=too-many-instance-attributes
 class Crud:
     """
     The CRUD class for operators
     """
-    def __init__(self, dev_mode, retry_timeout=7200, proxy=None):
-        self.constants = configuration.ApplicationConfig()
+    def __init__(self, dev_mode, retry_timeout=7200, proxy=None, deadline=None, retry_policy=None):
+        self.constants = configuration.get_config()
         self.target_host = self.__determine_target_host__(dev_mode)
         self.__request_proxy = proxy
         self.__retry_timeout = retry_timeout
+        self.__retry_policy = retry_policy
+        self.deadline = deadline if deadline is not None else Deadline()
+        self.entity_cache = get_entity_cache()
+        self.coalesce_gets = self.constants.getboolean('PERFORMANCE', 'coalesce_gets', fallback=True)
+
+    def bounded_by(self, timeout):
+        """
+        Returns a copy of this operator whose requests stop once the timeout passes, or with the deadline
+        of this operator if that comes first, e.g. so that the requests of workers a fan out gave up on
+        do not carry on in the background
+        :param timeout: A timeout in seconds, or None for no timeout
+        :return: operator
+        """
+        operator = copy.copy(self)
+        operator.deadline = self.deadline.child(timeout)
+        return operator
+
+    @property
+    def retry_timeout(self):
+        """
+        The total time in seconds a single request may spend retrying
+        :return: retry_timeout
+        :rtype: int
+        """
+        return self.__retry_timeout
 
     def __determine_target_host__(self, dev_mode):
         """
@@ -73,15 +106,37 @@ class Crud:
 
     def get(self, target_url):
         """
-        Orchestrates a GET request against the specified target URL
+        Orchestrates a GET request against the specified target URL. GET requests for the same URL sent
+        while one is in flight wait for it and share its response body, or the failure RPT answered it
+        with. A request that stops waiting once its own deadline passes, or whose request in flight
+        failed otherwise, is sent on its own.
         :param target_url:
         :return: response body
         :rtype: dict
         """
+        if not self.coalesce_gets:
+            return self.__convert_response_to_json__(self.get_response(target_url))
+        return IN_FLIGHT_GETS.run(target_url,
+                                  lambda: self.__convert_response_to_json__(self.get_response(target_url)),
+                                  timeout=self.deadline.remaining(), shared_errors=(NonRetryableRequestException,))
+
+    def get_response(self, target_url, request_timeout=None, retry_timeout=None):
+        """
+        Orchestrates a GET request against the specified target URL, returning the response itself so
+        that its headers can be inspected
+        :param target_url:
+        :param request_timeout: Timeout in seconds of every attempt. Defaults to the timeout for GET requests.
+        :param retry_timeout: The total sleep time of the retries, 0 for a single attempt. Defaults to the
+        retry timeout of the operator.
+        :return: response
+        :rtype: requests.Response
+        """
         logging.info(f'Running GET request towards: {target_url}')
-        response = request_retry(type_of_request='GET', url=target_url,
-                                 retry_timeout=self.__retry_timeout, proxy=self.__request_proxy)
-        return self.__convert_response_to_json__(response)
+        if retry_timeout is None:
+            retry_timeout = self.__retry_timeout
+        return request_retry(type_of_request='GET', url=target_url, retry_timeout=retry_timeout,
+                             proxy=self.__request_proxy, deadline=self.deadline, request_timeout=request_timeout,
+                             retry_policy=get_retry_policy('GET', self.__retry_policy))
 
     def put(self, target_url, request_body):
         """
@@ -94,7 +149,8 @@ class Crud:
         logging.info(f'Running PUT request towards: {target_url}')
         request_body = self.__convert_request_body_string_to_dict__(request_body)
         response = request_retry(type_of_request='PUT', url=target_url, body=request_body,
-                                 retry_timeout=self.__retry_timeout, proxy=self.__request_proxy)
+                                 retry_timeout=self.__retry_timeout, proxy=self.__request_proxy, deadline=self.deadline,
+                                 retry_policy=get_retry_policy('PUT', self.__retry_policy))
         return self.__convert_response_to_json__(response)
 
     def patch(self, target_url, request_body):
@@ -108,21 +164,41 @@ class Crud:
         logging.info(f'Running PATCH request towards: {target_url}')
         request_body = self.__convert_request_body_string_to_dict__(request_body)
         response = request_retry(type_of_request='PATCH', url=target_url, body=request_body,
-                                 retry_timeout=self.__retry_timeout, proxy=self.__request_proxy)
+                                 retry_timeout=self.__retry_timeout, proxy=self.__request_proxy, deadline=self.deadline,
+                                 retry_policy=get_retry_policy('PATCH', self.__retry_policy))
         return self.__convert_response_to_json__(response)
 
-    def post(self, target_url, request_body):
+    def post(self, target_url, request_body, headers=None, find_existing=None):
         """
         Orchestrates a POST request against the specified target URL.
+        When find_existing is given the POST is treated as idempotent: before every retry it is called
+        to look for the entity an earlier attempt may have created, and that entity is returned
+        instead of posting again.
         :param target_url:
         :param request_body:
+        :param headers: Extra headers sent with every attempt
+        :param find_existing: Callable returning the entity created by an earlier attempt, or None
         :return: response body
         :rtype: dict
         """
         logging.info(f'Running POST request towards: {target_url}')
         request_body = self.__convert_request_body_string_to_dict__(request_body)
+        existing_entities = []
+
+        def record_existing_entity():
+            existing_entity = find_existing()
+            if existing_entity is not None:
+                existing_entities.append(existing_entity)
+            return existing_entity is not None
+
+        idempotent = find_existing is not None
         response = request_retry(type_of_request='POST', url=target_url, body=request_body,
-                                 retry_timeout=self.__retry_timeout, proxy=self.__request_proxy)
+                                 retry_timeout=self.__retry_timeout, proxy=self.__request_proxy, deadline=self.deadline,
+                                 retry_policy=get_retry_policy('POST', self.__retry_policy),
+                                 headers=headers, idempotent=idempotent or None,
+                                 before_retry=record_existing_entity if idempotent else None)
+        if existing_entities:
+            return existing_entities[0]
         return self.__convert_response_to_json__(response)
 
     def delete(self, target_url):
@@ -132,4 +208,5 @@ class Crud:
         """
         logging.info(f'Running DELETE request towards: {target_url}')
         request_retry(type_of_request='DELETE', url=target_url,
-                      retry_timeout=self.__retry_timeout, proxy=self.__request_proxy)
+                      retry_timeout=self.__retry_timeout, proxy=self.__request_proxy, deadline=self.deadline,
+                      retry_policy=get_retry_policy('DELETE', self.__retry_policy))
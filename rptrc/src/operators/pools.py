@@ -3,7 +3,10 @@ The operator for the RPT Pool RPT service.
 """
 import logging
 
+from rptrc.src.entity_cache import POOL_BY_NAME
 from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.mirror import get_mirror
+from rptrc.src.models import Pool
 from rptrc.src.operators.base import Base
 from rptrc.src.operators.crud import Crud
 
@@ -12,36 +15,54 @@ class Pools(Base, Crud):
     """
     Class to handle operations against the RPT Pools service.
     """
-    def __init__(self, dev_mode, retry_timeout, pool_name):
+    def __init__(self, dev_mode, retry_timeout, pool_name, deadline=None, inventory=None, retry_policy=None):
         Base.__init__(self)
-        Crud.__init__(self, dev_mode, retry_timeout)
+        Crud.__init__(self, dev_mode, retry_timeout, deadline=deadline, retry_policy=retry_policy)
         self.pool_name = pool_name
+        self.inventory = inventory
+        self.mirror = get_mirror()
         self.pool_url = f'{self.target_host}/api/pools'
         self.rpt_functions_url = f'{self.target_host}/api/pipeline-functions'
 
-    def retrieve_test_environments_by_pool(self, pool_name):
+    def retrieve_all_pools(self):
         """
-        Retrieves all test environments in specified pool from RPT.
-        :param: pool_name
-        :return: test_environments
+        Retrieves every pool from RPT.
+        :return: pools
         :rtype: list
         """
-        logging.info('Retrieving Test Environment Ids for Specified Pool From RPT')
+        logging.info('Retrieving all Pools From RPT')
 
-        get_url = f'{self.pool_url}/' \
-                  f'/name/{pool_name}'
+        response = self.get(self.pool_url)
+        logging.debug(f'Retrieved {len(response)} Pools')
 
-        response = self.get(get_url)
-        logging.debug(f'Response: {str(response)}')
+        self.raise_exception_if_error_in_response(response, 'Failed to retrieve pools.')
+        return response
 
-        self.raise_exception_if_error_in_response(response, 'Failed to retrieve test environments.')
-
-        if len(response) < 1:
-            exception_message = f'Pool "{self.pool_name}" does not exist!'
-            logging.critical(exception_message)
-            raise FatalException(exception_message)
+    def retrieve_test_environments_by_pool(self, pool_name, refresh=False):
+        """
+        Retrieves all test environments in specified pool from RPT, or from the inventory, entity cache or
+        mirror of this operator if they hold the pool. The pool they hold may be as old as their staleness
+        bounds, so pass refresh where the membership must be current.
+        :param: pool_name
+        :param: refresh: Whether to ask RPT even if the inventory, entity cache or mirror holds the pool
+        :return: test_environments
+        :rtype: list
+        """
+        if refresh:
+            pool = self.__retrieve_pool_by_name__(pool_name, refresh=True)
+        else:
+            pool = self.inventory.pool_by_name(pool_name) if self.inventory is not None else None
+        if pool is None and self.entity_cache is not None:
+            _, cached_pool = self.entity_cache.look_up(POOL_BY_NAME, pool_name)
+            pool = Pool.from_json(cached_pool) if cached_pool is not None else None
+        if pool is None and self.mirror is not None:
+            pool = self.mirror.pool_by_name(pool_name)
+            if pool is not None and self.inventory is not None:
+                self.inventory.record_pool(pool)
+        if pool is None:
+            pool = self.__retrieve_pool_by_name__(pool_name)
 
-        test_environments_in_pool = response[0]["assignedTestEnvironmentIds"]
+        test_environments_in_pool = list(pool.test_environment_ids)
 
         if len(test_environments_in_pool) < 1:
             exception_message = f'There are no test environments assigned to pool "{pool_name}"!'
@@ -50,6 +71,46 @@ class Pools(Base, Crud):
 
         return test_environments_in_pool
 
+    def __retrieve_pool_by_name__(self, pool_name, refresh=False):
+        """
+        Retrieves a pool from RPT, recording it in the entity cache, inventory and mirror of this operator
+        where it has them. A pool RPT was found not to hold a moment ago is not asked for again unless
+        refresh is passed.
+        :param: pool_name
+        :param: refresh
+        :return: pool
+        :rtype: Pool
+        """
+        if not refresh and self.entity_cache is not None \
+                and self.entity_cache.look_up(POOL_BY_NAME, pool_name) == (True, None):
+            response = []
+        else:
+            logging.info('Retrieving Test Environment Ids for Specified Pool From RPT')
+
+            get_url = f'{self.pool_url}/' \
+                      f'/name/{pool_name}'
+
+            response = self.get(get_url)
+            logging.debug(f'Response: {str(response)}')
+
+            self.raise_exception_if_error_in_response(response, 'Failed to retrieve test environments.')
+
+        if len(response) < 1:
+            if self.entity_cache is not None:
+                self.entity_cache.store_absent(POOL_BY_NAME, pool_name)
+            exception_message = f'Pool "{self.pool_name}" does not exist!'
+            logging.critical(exception_message)
+            raise FatalException(exception_message)
+
+        pool = Pool.from_json(response[0])
+        if self.entity_cache is not None:
+            self.entity_cache.store(POOL_BY_NAME, pool_name, response[0])
+        if self.inventory is not None:
+            self.inventory.record_pool(pool)
+        if self.mirror is not None:
+            self.mirror.record_pool(response[0])
+        return pool
+
     @staticmethod
     def update_list_of_pools(list_of_pools, pool_to_remove, pool_to_add):
         """
@@ -1,25 +1,58 @@
 """
 The operator for the Requests RPT service
 """
+import hashlib
 import json
 import logging
 import time
+import uuid
 
+from rptrc.src.entity_cache import TEST_ENVIRONMENT_BY_ID, TEST_ENVIRONMENT_BY_NAME
 from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.etc.polling import WAIT_MODES, get_polling_strategy
+from rptrc.src.etc.waiter import wait_with_waiter
+from rptrc.src.mirror import get_mirror
+from rptrc.src.models import QueuedRequest
 from rptrc.src.operators.base import Base
 from rptrc.src.operators.crud import Crud
 
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+ACTIVE_REQUEST_STATUSES = ('Queued', 'Reserved')
+LONG_POLL_HEADER = 'X-RPT-Wait-For'
+LONG_POLL_GRACE = 10
+
 
 class Requests(Base, Crud):
     """
     Class to handle operations against the Requests RPT service
     """
-    def __init__(self, dev_mode, retry_timeout):
+    def __init__(self, dev_mode, retry_timeout, deadline=None, polling_strategy=None, retry_policy=None):
         Base.__init__(self)
-        Crud.__init__(self, dev_mode, retry_timeout)
+        Crud.__init__(self, dev_mode, retry_timeout, deadline=deadline, retry_policy=retry_policy)
         self.requests_url = f'{self.target_host}/api/requests'
         self.rpt_functions_url = f'{self.target_host}/api/pipeline-functions'
-        self.sleep_duration = 10
+        self.polling_strategy = polling_strategy if polling_strategy is not None else get_polling_strategy()
+        self.long_poll_timeout = self.constants.getint('PERFORMANCE', 'long_poll_timeout', fallback=60)
+        self.wait_mode = self.constants.get('PERFORMANCE', 'wait_mode', fallback='auto')
+        self.waiter_socket_path = self.constants.get('WAITER', 'socket_path', fallback=None)
+        self.mirror = get_mirror()
+
+    def __record__(self, request):
+        """
+        Records a Request retrieved or changed in the mirror, if this operator has one. The test
+        environment a Request reserves is changed by RPT, so it is dropped from the entity cache.
+        :param request:
+        :return: request
+        :rtype: dict
+        """
+        if self.mirror is not None:
+            self.mirror.record_request(request)
+        test_environment_id = request.get('testEnvironmentId') if isinstance(request, dict) else None
+        if self.entity_cache is not None and test_environment_id:
+            test_environment = self.entity_cache.invalidate(TEST_ENVIRONMENT_BY_ID, test_environment_id)
+            if test_environment is not None:
+                self.entity_cache.invalidate(TEST_ENVIRONMENT_BY_NAME, test_environment.get('name'))
+        return request
 
     def get_request_with_id(self, request_id):
         """
@@ -31,7 +64,17 @@ class Requests(Base, Crud):
         logging.info(f'Retrieving the Request entity with ID: {request_id}')
 
         get_url = f'{self.requests_url}/{request_id}'
-        matching_requests = self.get(get_url)
+        return self.__record__(self.__select_matching_request__(self.get(get_url), request_id))
+
+    @staticmethod
+    def __select_matching_request__(matching_requests, request_id):
+        """
+        Selects the Request entity from the body of a GET for a single Request
+        :param matching_requests:
+        :param request_id:
+        :return: matching_request
+        :rtype: dict
+        """
         if not matching_requests:
             exception_message = f'No Request entity with ID {request_id} was found in RPT'
             logging.critical(exception_message)
@@ -59,12 +102,60 @@ class Requests(Base, Crud):
         self.raise_exception_if_error_in_response(response, 'Failed to abort request, please contact Thunderbee.')
 
         logging.info(f'SUCCESS: Request Aborted - {self.requests_url}/{request_id}')
-        return response
+        return self.__record__(response)
+
+    @staticmethod
+    def build_idempotency_key(execution_id, pipeline_stage=None, invocation_id=None):
+        """
+        Builds the idempotency key of a reservation. Every attempt to queue a Request for the same
+        pipeline execution and stage within one invocation shares the key, so that a Request left over
+        from an earlier run of the stage is never taken for one queued by this invocation.
+        :param execution_id:
+        :param pipeline_stage:
+        :param invocation_id: Identifies the invocation queueing the Request
+        :return: idempotency_key
+        :rtype: str
+        """
+        return hashlib.sha256(
+            f'{execution_id}:{pipeline_stage or ""}:{invocation_id or ""}'.encode('utf-8')).hexdigest()
+
+    def find_request_by_idempotency_key(self, idempotency_key):
+        """
+        Looks for an active Request entity that was created with the idempotency key, in the mirror
+        before RPT. RPT is asked once, within what is left of the deadline, as the lookup runs between
+        the retries of the POST. A failed lookup is treated as no Request found.
+        :param idempotency_key:
+        :return: request, or None if there is none
+        :rtype: dict
+        """
+        if self.mirror is not None:
+            mirrored_request = self.mirror.request_by_idempotency_key(idempotency_key, ACTIVE_REQUEST_STATUSES)
+            if mirrored_request is not None:
+                logging.info(f'Found Request {mirrored_request.id} created by an earlier attempt in the mirror of RPT')
+                return mirrored_request.to_json()
+        logging.info(f'Looking for a Request entity with idempotency key: {idempotency_key}')
+        try:
+            matching_requests = self.__convert_response_to_json__(
+                self.get_response(f'{self.requests_url}?idempotencyKey={idempotency_key}', retry_timeout=0))
+        except FatalException as lookup_exception:
+            logging.warning(f'Could not look up Requests by idempotency key: {lookup_exception}')
+            return None
+        if not isinstance(matching_requests, list):
+            return None
+        for request in matching_requests:
+            queued_request = QueuedRequest.from_json(request)
+            if queued_request.idempotency_key == idempotency_key and queued_request.status in ACTIVE_REQUEST_STATUSES:
+                logging.info(f'Found Request {queued_request.id} created by an earlier attempt')
+                return request
+        return None
 
-    def create_queued_request(self, request_body: dict):
+    def create_queued_request(self, request_body: dict, pipeline_stage=None):
         """
-        Creates a new queued Request entity in RPT
+        Creates a new queued Request entity in RPT. Every attempt carries an idempotency key derived from
+        the pipeline execution, the stage and this invocation, and before retrying RPT is checked for a Request already
+        created with that key so that a lost response never queues a second Request.
         :param request_body:
+        :param pipeline_stage:
         :return: request
         :rtype: dict
         """
@@ -81,7 +172,11 @@ class Requests(Base, Crud):
 
         logging.debug(f'Request Body: {str(request_body)}')
 
-        created_request = self.post(self.requests_url, json.dumps(request_body))
+        idempotency_key = self.build_idempotency_key(request_body['requestorDetails']['executionId'], pipeline_stage,
+                                                     uuid.uuid4().hex)
+        created_request = self.post(self.requests_url, json.dumps(request_body),
+                                    headers={IDEMPOTENCY_KEY_HEADER: idempotency_key},
+                                    find_existing=lambda: self.find_request_by_idempotency_key(idempotency_key))
 
         if 'error' in created_request:
             exception_message = ('Error found in the request response. '
@@ -92,25 +187,106 @@ class Requests(Base, Crud):
         logging.debug(f'Created Request: {str(created_request)}')
 
         logging.info('SUCCESS: Created a queued Request entity')
-        return created_request
+        return self.__record__(created_request)
 
-    def wait_for_the_queued_request_be_resolved(self, request_id):
+    def wait_for_request_to_be_resolved(self, request_id, wait_mode=None):
+        """
+        Waits for a queued Request with the specified ID to leave the queue. In auto mode the wait is
+        handed to the waiter running on the agent if there is one. Otherwise RPT is long polled,
+        falling back to polling when RPT does not support long polling.
+        :param request_id:
+        :param wait_mode: auto or poll. Defaults to the wait mode set in application.ini
+        :return: request
+        :rtype: dict
+        """
+        wait_mode = wait_mode or self.wait_mode
+        if wait_mode not in WAIT_MODES:
+            exception_message = f'Unsupported wait mode: {wait_mode}. Supported wait modes are: {", ".join(WAIT_MODES)}'
+            logging.critical(exception_message)
+            raise FatalException(exception_message)
+        if wait_mode == 'poll':
+            return self.wait_for_the_queued_request_be_resolved(request_id)
+        request = wait_with_waiter(self.waiter_socket_path, request_id, self.target_host, self.deadline)
+        if request is not None:
+            return self.__check_resolved_request__(request)
+        return self.wait_for_the_queued_request_be_resolved_by_long_poll(request_id)
+
+    def wait_for_the_queued_request_be_resolved_by_long_poll(self, request_id):
+        """
+        For a queued Request with the specified ID, it will long poll RPT until the Request status is
+        either set to reserved or timeout, or until the deadline of the command is reached. RPT holds
+        every GET open until the status of the Request changes, and marks the response with the
+        X-RPT-Wait-For header. If that header is missing RPT does not support long polling, and the
+        Request returned is waited on by polling instead.
+        :param request_id:
+        :return: request
+        :rtype: dict
+        """
+        logging.info('Waiting for the queued request to be resolved using long polling.')
+        started = time.monotonic()
+        long_polls = 0
+        while True:
+            self.deadline.check(f'long polling queued request {request_id}')
+            long_poll_timeout = max(1, int(self.deadline.bound(self.long_poll_timeout)))
+            long_poll_started = time.monotonic()
+            with self.deadline.track('waiting for queued request'):
+                response = self.get_response(
+                    f'{self.requests_url}/{request_id}?waitFor=status-change&timeout={long_poll_timeout}',
+                    request_timeout=long_poll_timeout + LONG_POLL_GRACE)
+            long_polls += 1
+            request = self.__record__(
+                self.__select_matching_request__(self.__convert_response_to_json__(response), request_id))
+            if response.headers.get(LONG_POLL_HEADER) != 'status-change':
+                logging.info('RPT does not support long polling, falling back to polling.')
+                return self.wait_for_the_queued_request_be_resolved(request_id, request)
+            if request['status'] != 'Queued':
+                break
+            if time.monotonic() - long_poll_started < self.polling_strategy.min_interval:
+                with self.deadline.track('waiting for queued request'):
+                    time.sleep(self.deadline.bound(self.polling_strategy.min_interval))
+
+        logging.info(f'Request left the queue with status "{request["status"]}" after {long_polls} long polls '
+                     f'in {time.monotonic() - started:.1f} seconds')
+        return self.__check_resolved_request__(request)
+
+    def wait_for_the_queued_request_be_resolved(self, request_id, request=None):
         """
         For a queued Request with the specified ID, it will poll RPT until the Request status is
-        either set to reserved or timeout
+        either set to reserved or timeout, or until the deadline of the command is reached.
+        The interval between polls is decided by the polling strategy.
         :param request_id:
+        :param request: The Request as last retrieved from RPT, if already retrieved
         :return: request
         :rtype: dict
         """
         logging.info('Waiting for the queued request to be resolved.')
-        request = self.get_request_with_id(request_id)
+        started = time.monotonic()
+        if request is None:
+            request = self.get_request_with_id(request_id)
+        polls = 1
 
         while request['status'] == 'Queued':
-            logging.info(f'Request still queued. Sleeping for {self.sleep_duration} '
+            self.deadline.check(f'polling queued request {request_id}')
+            poll_interval = self.deadline.bound(self.polling_strategy.next_interval(polls))
+            logging.info(f'Request still queued. Sleeping for {poll_interval:.1f} '
                          f'seconds and will try again.')
-            time.sleep(self.sleep_duration)
+            with self.deadline.track('waiting for queued request'):
+                time.sleep(poll_interval)
             request = self.get_request_with_id(request_id)
+            polls += 1
 
+        logging.info(f'Request left the queue with status "{request["status"]}" after {polls} polls '
+                     f'in {time.monotonic() - started:.1f} seconds')
+        return self.__check_resolved_request__(request)
+
+    @staticmethod
+    def __check_resolved_request__(request):
+        """
+        Raises if a Request that left the queue timed out or was aborted
+        :param request:
+        :return: request
+        :rtype: dict
+        """
         request_status = request["status"]
         if request_status == 'Timeout':
             exception_message = ('Request timed out, there are no available environments. '
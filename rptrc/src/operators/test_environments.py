@@ -4,7 +4,12 @@ The operator for the RPT Test Environment RPT service.
 import json
 import logging
 
+from rptrc.src.entity_cache import POOL_BY_NAME, TEST_ENVIRONMENT_BY_ID, TEST_ENVIRONMENT_BY_NAME
 from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.etc.fan_out import fan_out
+from rptrc.src.etc.versions import select_freshest, version_matches
+from rptrc.src.mirror import get_mirror
+from rptrc.src.models import TestEnvironment
 from rptrc.src.operators.base import Base
 from rptrc.src.operators.crud import Crud
 
@@ -13,26 +18,142 @@ class TestEnvironments(Base, Crud):
     """
     Class to handle operations against the RPT Test Environments service.
     """
-    def __init__(self, dev_mode, retry_timeout, test_environment_name=None, test_environment_id=None):
+    def __init__(self, dev_mode, retry_timeout, test_environment_name=None, test_environment_id=None,
+                 deadline=None, inventory=None, retry_policy=None):
         Base.__init__(self)
-        Crud.__init__(self, dev_mode, retry_timeout)
+        Crud.__init__(self, dev_mode, retry_timeout, deadline=deadline, retry_policy=retry_policy)
         self.test_environment_name = test_environment_name
         self.test_environment_id = test_environment_id
+        self.inventory = inventory
+        self.mirror = get_mirror()
+        self.freshest_selection = self.constants.get('PERFORMANCE', 'freshest_selection', fallback='server')
         self.test_environment_url = f'{self.target_host}/api/test-environments'
         self.rpt_functions_url = f'{self.target_host}/api/pipeline-functions'
 
+    def __record__(self, test_environment):
+        """
+        Records a test environment retrieved or updated in the entity cache, the inventory and the mirror,
+        where this operator has them
+        :param: test_environment
+        """
+        if not isinstance(test_environment, dict) or 'id' not in test_environment:
+            return
+        if self.entity_cache is not None:
+            self.entity_cache.store(TEST_ENVIRONMENT_BY_ID, test_environment['id'], test_environment)
+            if test_environment.get('name') is not None:
+                self.entity_cache.store(TEST_ENVIRONMENT_BY_NAME, test_environment['name'], test_environment)
+        if self.inventory is not None:
+            self.inventory.record_test_environment(test_environment)
+        if self.mirror is not None:
+            self.mirror.record_test_environments([test_environment])
+
+    def __forget_pools__(self, pool_names, test_environment_id):
+        """
+        Forgets the pools a test environment left or joined, in the entity cache, the inventory and the
+        mirror, where this operator has them, as RPT changed their lists of test environments
+        :param: pool_names, the pools the test environment is now assigned to
+        :param: test_environment_id
+        """
+        if isinstance(pool_names, str):
+            pool_names = [pool_names]
+        if self.entity_cache is not None:
+            self.entity_cache.clear(POOL_BY_NAME)
+        if self.inventory is not None:
+            self.inventory.forget_pools(pool_names, test_environment_id)
+        if self.mirror is not None:
+            self.mirror.forget_pools(pool_names, test_environment_id)
+
+    def __look_up_locally__(self, test_environment_name=None, test_environment_id=None):
+        """
+        Looks a test environment up by name or id in the inventory of this operator, then in the entity
+        cache and then in the mirror, so that RPT is only asked for test environments none of them holds
+        :param: test_environment_name
+        :param: test_environment_id
+        :return: test_environment, or None if none of them holds it
+        :rtype: dict
+        """
+        if self.inventory is not None:
+            test_environment = self.inventory.test_environment_by_name(test_environment_name) \
+                if test_environment_id is None else self.inventory.test_environment_by_id(test_environment_id)
+            if test_environment is not None:
+                return test_environment.to_json()
+        if self.entity_cache is not None:
+            _, test_environment = self.entity_cache.look_up(
+                *self.__cache_key__(test_environment_name, test_environment_id))
+            if test_environment is not None:
+                return test_environment
+        if self.mirror is not None:
+            test_environment = self.mirror.test_environment_by_name(test_environment_name) \
+                if test_environment_id is None else self.mirror.test_environment_by_id(test_environment_id)
+            if test_environment is not None:
+                logging.info(f'Using Test Environment "{test_environment.name}" from the mirror of RPT')
+                if self.inventory is not None:
+                    self.inventory.record_test_environment(test_environment)
+                return test_environment.to_json()
+        return None
+
+    @staticmethod
+    def __cache_key__(test_environment_name=None, test_environment_id=None):
+        """
+        Builds the key of a test environment in the entity cache
+        :param: test_environment_name
+        :param: test_environment_id
+        :return: kind, key
+        :rtype: tuple
+        """
+        if test_environment_id is None:
+            return TEST_ENVIRONMENT_BY_NAME, test_environment_name
+        return TEST_ENVIRONMENT_BY_ID, test_environment_id
+
+    def __retrieve_unless_known_absent__(self, get_url, test_environment_name=None, test_environment_id=None):
+        """
+        Sends a GET for a test environment unless the entity cache holds that RPT found no such test
+        environment a moment ago, remembering it when RPT finds none now
+        :param: get_url
+        :param: test_environment_name
+        :param: test_environment_id
+        :return: response
+        :rtype: list
+        """
+        cache_key = self.__cache_key__(test_environment_name, test_environment_id)
+        if self.entity_cache is not None and self.entity_cache.look_up(*cache_key) == (True, None):
+            logging.info(f'Test Environment "{cache_key[1]}" was found not to exist a moment ago')
+            return []
+        response = self.get(get_url)
+        if self.entity_cache is not None and isinstance(response, list) and len(response) < 1:
+            self.entity_cache.store_absent(*cache_key)
+        return response
+
+    def retrieve_all_test_environments(self):
+        """
+        Retrieves every test environment from RPT.
+        :return: test_environments
+        :rtype: list
+        """
+        logging.info('Retrieving all Test Environments From RPT')
+
+        response = self.get(self.test_environment_url)
+        logging.debug(f'Retrieved {len(response)} Test Environments')
+
+        self.raise_exception_if_error_in_response(response, 'Failed to retrieve test environments.')
+        return response
+
     def retrieve_test_environment_by_name(self):
         """
-        Retrieves a test environment from RPT.
+        Retrieves a test environment from RPT, or from the inventory or mirror of this operator if they hold it.
         :return: test_environment
         :rtype: dict
         """
+        test_environment = self.__look_up_locally__(test_environment_name=self.test_environment_name)
+        if test_environment is not None:
+            return test_environment
+
         logging.info('Retrieving Test Environment From RPT based on name')
 
         get_url = f'{self.test_environment_url}/' \
                   f'/name/{self.test_environment_name}'
 
-        response = self.get(get_url)
+        response = self.__retrieve_unless_known_absent__(get_url, test_environment_name=self.test_environment_name)
         logging.debug(f'Response: {str(response)}')
 
         self.raise_exception_if_error_in_response(response, 'Failed to retrieve test environment.')
@@ -45,28 +166,41 @@ class TestEnvironments(Base, Crud):
             exception_message = f'More than one Test Environment exists with the name "{self.test_environment_name}"!'
             logging.critical(exception_message)
             raise FatalException(exception_message)
+        self.__record__(response[0])
         return response[0]
 
-    def retrieve_test_environment_by_id(self):
+    def retrieve_test_environment_by_id(self, test_environment_id=None, refresh=False):
         """
-        Retrieves a test environment from RPT based on id.
+        Retrieves a test environment from RPT based on id, or from the inventory or mirror of this
+        operator if they hold it.
+        :param: test_environment_id: Defaults to the id this operator was created for
+        :param: refresh: Whether to ask RPT even if the inventory or mirror holds the test environment
         :return: test_environment
         :rtype: dict
         """
+        if test_environment_id is None:
+            test_environment_id = self.test_environment_id
+
+        test_environment = None if refresh else self.__look_up_locally__(test_environment_id=test_environment_id)
+        if test_environment is not None:
+            return test_environment
+
         logging.info('Retrieving Test Environment From RPT based on id')
 
         get_url = f'{self.test_environment_url}/' \
-                  f'/{self.test_environment_id}'
+                  f'/{test_environment_id}'
 
-        response = self.get(get_url)
+        response = self.get(get_url) if refresh else \
+            self.__retrieve_unless_known_absent__(get_url, test_environment_id=test_environment_id)
         logging.debug(f'Response: {str(response)}')
 
         self.raise_exception_if_error_in_response(response, 'Failed to retrieve test environment.')
 
         if len(response) < 1:
-            exception_message = f'Test environment with id "{self.test_environment_id}" does not exist!'
+            exception_message = f'Test environment with id "{test_environment_id}" does not exist!'
             logging.critical(exception_message)
             raise FatalException(exception_message)
+        self.__record__(response[0])
         return response[0]
 
     def unreserve_test_environment(self):
@@ -84,6 +218,7 @@ class TestEnvironments(Base, Crud):
         logging.debug(f'Response: {str(response)}')
 
         self.raise_exception_if_error_in_response(response, 'Failed to unreserve Test Environment!')
+        self.__record__(response)
 
         logging.info('SUCCESS: Unreserved Test Environment')
         return response
@@ -103,6 +238,7 @@ class TestEnvironments(Base, Crud):
         logging.debug(f'Response: {str(response)}')
 
         self.raise_exception_if_error_in_response(response, 'Failed to quarantine Test Environment!')
+        self.__record__(response)
 
         logging.info('SUCCESS: Quarantined Test Environment')
         return response
@@ -122,6 +258,7 @@ class TestEnvironments(Base, Crud):
         logging.debug(f'Response: {str(response)}')
 
         self.raise_exception_if_error_in_response(response, 'Failed to available Test Environment!')
+        self.__record__(response)
 
         logging.info('SUCCESS: Set Test Environment to Available')
         return response
@@ -149,26 +286,94 @@ class TestEnvironments(Base, Crud):
         logging.debug(f'Response: {str(response)}')
 
         self.raise_exception_if_error_in_response(response, 'Failed to update Test Environment stage!')
+        self.__record__(response)
 
         logging.info('SUCCESS: Updated Test Environment Stage')
         return response
 
-    def retrieve_standby_test_environments(self, test_environment_ids):
+    def update_test_environment_details(self, request_body, test_environment_id):
+        """
+        Updates the details/properties of a test environment in RPT.
+        :param: request_body
+        :param: test_environment_id
+        :return: response
+        :rtype: dict
+        """
+        logging.info(f'Updating details of Test Environment with id "{test_environment_id}"')
+
+        patch_url = f'{self.test_environment_url}/' \
+                    f'{test_environment_id}'
+
+        response = self.patch(patch_url, request_body)
+        logging.debug(f'Response: {str(response)}')
+
+        self.raise_exception_if_error_in_response(response, 'Failed to update Test Environment details!')
+        self.__record__(response)
+        return response
+
+    def update_details_for_test_environments(self, request_body, test_environment_ids, concurrency=None):
+        """
+        Updates the details/properties of many test environments in RPT, running up to
+        `concurrency` updates at once. Every test environment is attempted before failures are reported.
+        :param: request_body
+        :param: test_environment_ids
+        :param: concurrency: Defaults to the update_concurrency performance setting
+        :return: responses
+        :rtype: list
+        """
+        if concurrency is None:
+            concurrency = self.constants.getint('PERFORMANCE', 'update_concurrency', fallback=1)
+        logging.info(f'Updating details of {len(test_environment_ids)} Test Environments '
+                     f'with a concurrency of {concurrency}')
+
+        results = fan_out(lambda test_environment_id: self.update_test_environment_details(
+            request_body, test_environment_id), test_environment_ids, concurrency)
+
+        failed_test_environment_ids = [result.item for result in results if not result.succeeded]
+        logging.info(f'Updated {len(results) - len(failed_test_environment_ids)} of {len(results)} '
+                     'Test Environments')
+        if failed_test_environment_ids:
+            exception_message = (f'Failed to update details of {len(failed_test_environment_ids)} of '
+                                 f'{len(results)} Test Environments: {", ".join(failed_test_environment_ids)}')
+            logging.critical(exception_message)
+            raise FatalException(exception_message)
+
+        logging.info('SUCCESS: Updated Test Environment details')
+        return [result.value for result in results]
+
+    def retrieve_standby_test_environments(self, test_environment_ids, concurrency=None, timeout=None):
         """
         Retrieves test environments with status 'Standby' from a list of test
-        environment ids.
+        environment ids. The test environments are retrieved concurrently and only their status is
+        kept, with the whole scan bounded by a single timeout. Their status is always read from RPT,
+        never from the inventory, entity cache or mirror, as it may have changed moments ago.
         :param: test_environment_ids
-        :return: standby_test_environments
+        :param: concurrency: Defaults to the scan_concurrency performance setting
+        :param: timeout: Defaults to the retry timeout of this operator, bounded by its deadline
+        :return: standby_test_environments, in the order of the ids passed in
         :rtype: list
         """
-        logging.info('Retrieving Standby test environments')
+        if concurrency is None:
+            concurrency = self.constants.getint('PERFORMANCE', 'scan_concurrency', fallback=1)
+        if timeout is None:
+            timeout = self.deadline.bound(self.retry_timeout)
+
+        logging.info(f'Retrieving Standby test environments from {len(test_environment_ids)} test environments')
+        scan_operator = self.bounded_by(timeout)
+
+        def retrieve_id_if_standby(test_environment_id):
+            retrieved_test_environment = TestEnvironment.from_json(
+                scan_operator.retrieve_test_environment_by_id(test_environment_id, refresh=True))
+            if retrieved_test_environment.status == 'Standby':
+                return retrieved_test_environment.id
+            return None
 
-        standby_test_environments = []
-        for test_environment_id in test_environment_ids:
-            self.test_environment_id = test_environment_id
-            retrieved_test_environment = self.retrieve_test_environment_by_id()
-            if retrieved_test_environment["status"] == 'Standby':
-                standby_test_environments.append(test_environment_id)
+        results = fan_out(retrieve_id_if_standby, test_environment_ids, concurrency, timeout)
+        for result in results:
+            if not result.succeeded:
+                raise result.error
+
+        standby_test_environments = [result.value for result in results if result.value is not None]
 
         if len(standby_test_environments) < 1:
             exception_message = 'There are no test environments with status "Standby"!'
@@ -180,12 +385,67 @@ class TestEnvironments(Base, Crud):
     def retrieve_freshest_test_environment(self, test_environment_ids):
         """
         Retrieves the freshest test environment from RPT based on version.
+        The ids are sent in chunks of at most freshest_chunk_length characters, so that the URL stays
+        bounded for large pools. Chunks are retrieved concurrently and the freshest of their winners is
+        selected by this client.
         :param: test_environment_ids
         :return: response
         :rtype: dict
         """
         logging.info('Retrieving freshest test environment')
 
+        chunks = self.__chunk_test_environment_ids__(test_environment_ids)
+        if len(chunks) <= 1:
+            response = self.__retrieve_freshest_of_chunk__(test_environment_ids)
+        else:
+            logging.info(f'Retrieving freshest test environment from {len(chunks)} chunks of test environment ids')
+            concurrency = self.constants.getint('PERFORMANCE', 'scan_concurrency', fallback=1)
+            timeout = self.deadline.bound(self.retry_timeout)
+            results = fan_out(self.bounded_by(timeout).__retrieve_freshest_of_chunk__, chunks, concurrency, timeout)
+            for result in results:
+                if not result.succeeded:
+                    raise result.error
+            response = self.__select_freshest_of_chunks__([result.value for result in results if result.value])
+
+        if len(response) < 1:
+            exception_message = f'No test environments with ids "{test_environment_ids}" found!'
+            logging.critical(exception_message)
+            raise FatalException(exception_message)
+
+        return response
+
+    def __chunk_test_environment_ids__(self, test_environment_ids):
+        """
+        Splits comma separated test environment ids into comma separated chunks no longer than the
+        freshest_chunk_length performance setting, keeping every id whole
+        :param test_environment_ids:
+        :return: chunks
+        :rtype: list
+        """
+        chunk_length = self.constants.getint('PERFORMANCE', 'freshest_chunk_length', fallback=0)
+        if chunk_length <= 0 or len(test_environment_ids) <= chunk_length:
+            return [test_environment_ids]
+        chunks = []
+        chunk = []
+        length = 0
+        for test_environment_id in filter(None, test_environment_ids.split(',')):
+            if chunk and length + 1 + len(test_environment_id) > chunk_length:
+                chunks.append(','.join(chunk))
+                chunk = []
+                length = 0
+            length += len(test_environment_id) + (1 if chunk else 0)
+            chunk.append(test_environment_id)
+        if chunk:
+            chunks.append(','.join(chunk))
+        return chunks
+
+    def __retrieve_freshest_of_chunk__(self, test_environment_ids):
+        """
+        Retrieves the freshest test environment of a chunk of comma separated ids from RPT
+        :param test_environment_ids:
+        :return: response, empty if none of the test environments were found
+        :rtype: dict
+        """
         get_url = f'{self.test_environment_url}/' \
                   f'/get-freshest-test-environment/{test_environment_ids}'
 
@@ -193,14 +453,52 @@ class TestEnvironments(Base, Crud):
         logging.debug(f'Response: {str(response)}')
 
         self.raise_exception_if_error_in_response(response, 'Failed to retrieve test environment.')
-
-        if len(response) < 1:
-            exception_message = f'No test environments with ids "{test_environment_ids}" found!'
-            logging.critical(exception_message)
-            raise FatalException(exception_message)
-
         return response
 
+    @staticmethod
+    def __select_freshest_of_chunks__(responses):
+        """
+        Selects the freshest of the test environments retrieved for every chunk, the winner of the
+        earliest chunk winning a tie
+        :param responses:
+        :return: response, empty if there were none
+        :rtype: dict
+        """
+        test_environments = [TestEnvironment.from_json(response) for response in responses]
+        freshest_test_environment = select_freshest(test_environments)
+        if freshest_test_environment is None:
+            return {}
+        return next(response for response, test_environment in zip(responses, test_environments)
+                    if test_environment is freshest_test_environment)
+
+    def retrieve_freshest_standby_test_environment_in_pool(self, pool_name):
+        """
+        Picks the freshest standby test environment of a pool from the inventory of this operator and
+        confirms it with a single request to RPT. A candidate RPT reports differently is recorded, which
+        moves it in the inventory, and the freshest candidate is picked again.
+        :param: pool_name
+        :return: test_environment
+        :rtype: dict
+        """
+        logging.info(f'Picking the freshest Standby test environment in pool "{pool_name}" from the inventory')
+        rejected_ids = set()
+        while True:
+            candidate = self.inventory.freshest_standby_test_environment(pool_name, rejected_ids)
+            if candidate is None:
+                exception_message = 'There are no test environments with status "Standby"!'
+                logging.critical(exception_message)
+                raise FatalException(exception_message)
+
+            test_environment = self.retrieve_test_environment_by_id(candidate.id, refresh=True)
+            confirmed = TestEnvironment.from_json(test_environment)
+            if confirmed.status != 'Standby' or pool_name not in confirmed.pools:
+                rejected_ids.add(candidate.id)
+            else:
+                freshest = self.inventory.freshest_standby_test_environment(pool_name, rejected_ids)
+                if freshest is not None and freshest.id == confirmed.id:
+                    return test_environment
+            logging.info(f'Test Environment "{candidate.name}" changed in RPT, picking the freshest again')
+
     def update_test_environment_pool(self, new_list_of_pools, test_environment_id=None):
         """
         Updates a test environment's pool in RPT.
@@ -225,19 +523,22 @@ class TestEnvironments(Base, Crud):
         logging.debug(f'Response: {str(response)}')
 
         self.raise_exception_if_error_in_response(response, 'Failed to update Test Environment Pools!')
+        self.__record__(response)
+        self.__forget_pools__(new_list_of_pools, test_environment_id)
 
         logging.info('SUCCESS: Updated Test Environment Pools')
         return response
 
     def check_if_test_environment_on_specified_version(self, version_for_comparison):
         """
-        Checks if EIC version on a test environment equals that specified.
+        Checks if EIC version on a test environment meets that specified, either a version it must
+        equal exactly or a specification such as >=2.1.0,<3 or 2.1.0-56 || 2.1.0-57.
         :param: version_for_comparison
         :return: result
         :rtype: str
         """
-        test_environment_to_check = self.retrieve_test_environment_by_name()
+        test_environment_to_check = TestEnvironment.from_json(self.retrieve_test_environment_by_name())
         result = "false"
-        if test_environment_to_check['properties']['version'] == version_for_comparison:
+        if version_matches(test_environment_to_check.version, version_for_comparison):
             result = "true"
         return result
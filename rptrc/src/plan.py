@@ -0,0 +1,116 @@
+"""
+This module runs plans: ordered lists of RPT-RC commands run one after another in a single process,
+sharing its pooled HTTP sessions rather than paying for a process startup per command.
+
+A plan is a JSON file holding the steps to run, each naming a command and its arguments:
+
+    {"steps": [
+        {"command": "create-queued-request", "args": ["-b", "<request body>", "-ps", "install", "-gap"]},
+        {"command": "retrieve-test-environment-details", "args": ["-t", "${RESOURCE_NAME}", "-gap"]}
+    ]}
+
+The artifact properties of every step are kept in memory. Each step reads those generated by the steps
+before it, together with the artifact properties passed in to the plan, as its input file, and its
+arguments may reference them as ${KEY}. Only once every step succeeded are the artifact properties
+generated by the plan's steps written out, in a single file.
+"""
+
+import json
+import logging
+from string import Template
+
+from rptrc.src.daemon import run_command
+from rptrc.src.etc.exceptions import FatalException, InDirectoryNotSetException, InFileNotSetException
+from rptrc.src.operators.artifact_properties import ArtifactProperties, capture_artifacts
+
+IN_DIRECTORY = '/usr/src/app/in'
+OUT_DIRECTORY = '/usr/src/app/out'
+ARTIFACT_FILE = 'artifact.properties'
+UNPLANNABLE_COMMANDS = ('run-plan', 'serve', 'waiter')
+
+
+def load_plan(plan_file):
+    """
+    Loads and validates the steps of a plan
+    :param plan_file:
+    :return: steps, as (command, args) tuples
+    :rtype: list
+    """
+    try:
+        with open(plan_file, 'r', encoding='utf-8') as in_stream:
+            plan = json.load(in_stream)
+        steps = [(step['command'], [str(argument) for argument in step.get('args', [])]) for step in plan['steps']]
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as plan_exception:
+        exception_message = f'Invalid plan {plan_file}: {plan_exception!r}'
+        logging.critical(exception_message)
+        raise FatalException(exception_message) from plan_exception
+    for command, _ in steps:
+        if command.replace('_', '-') in UNPLANNABLE_COMMANDS:
+            exception_message = f'Invalid plan {plan_file}: {command} cannot be run as a step of a plan'
+            logging.critical(exception_message)
+            raise FatalException(exception_message)
+    return steps
+
+
+def read_artifact_properties(directory):
+    """
+    Reads an artifact properties file, returning no properties if there is none
+    :param directory:
+    :return: key_value_pairs
+    :rtype: dict
+    """
+    try:
+        return ArtifactProperties().read(directory, ARTIFACT_FILE)
+    except (InDirectoryNotSetException, InFileNotSetException):
+        return {}
+
+
+def resolve_arguments(step_number, command, args, properties):
+    """
+    Replaces the ${KEY} references in the arguments of a step with the artifact properties known so far
+    :param step_number:
+    :param command:
+    :param args:
+    :param properties:
+    :return: args
+    :rtype: list
+    """
+    try:
+        return [Template(argument).substitute(properties) for argument in args]
+    except (KeyError, ValueError) as reference_exception:
+        exception_message = (f'Step {step_number} ({command}) of the plan references an artifact property '
+                             f'no earlier step generated: {reference_exception}')
+        logging.critical(exception_message)
+        raise FatalException(exception_message) from reference_exception
+
+
+def run_plan(cli, steps):
+    """
+    Runs the steps of a plan in order, stopping at the first that fails, then writes the artifact
+    properties the steps generated
+    :param cli: The click group holding the commands
+    :param steps: The (command, args) of every step
+    :return: generated, the artifact properties generated by the steps
+    :rtype: dict
+    """
+    properties = read_artifact_properties(IN_DIRECTORY)
+    generated = {}
+    in_file = f'{IN_DIRECTORY}/{ARTIFACT_FILE}'
+    with capture_artifacts() as capture:
+        for step_number, (command, args) in enumerate(steps, start=1):
+            argv = [command] + resolve_arguments(step_number, command, args, properties)
+            if properties:
+                capture.files[in_file] = ''.join(f'{key}={value}\n' for key, value in properties.items())
+            logging.info(f'Running step {step_number} of {len(steps)} of the plan: {command}')
+            exit_code = run_command(cli, argv)
+            if exit_code != 0:
+                exception_message = f'Step {step_number} ({command}) of the plan failed with exit code {exit_code}'
+                logging.critical(exception_message)
+                raise FatalException(exception_message)
+            step_properties = read_artifact_properties(OUT_DIRECTORY)
+            capture.files.pop(f'{OUT_DIRECTORY}/{ARTIFACT_FILE}', None)
+            properties.update(step_properties)
+            generated.update(step_properties)
+    if generated:
+        ArtifactProperties(generated, out_directory=OUT_DIRECTORY, out_file=ARTIFACT_FILE).generate()
+    return generated
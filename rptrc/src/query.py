@@ -0,0 +1,237 @@
+"""
+This module answers queries over an inventory of test environments. A query is a filter expression
+of conditions joined by `and`, e.g.
+
+    status=Standby and pool=product-staging and version<1.2.3
+
+Conditions compare a field with a value using =, !=, <, <=, > or >=, comparing versions as ordered by
+the versions module. The fields are id, name, status, pool, stage, version and properties.<key>, and
+values holding spaces or operators can be quoted.
+Equality conditions on id, name, status and pool are answered from the indexes of the inventory, and
+only the test environments they leave are compared against the other conditions.
+"""
+
+import json
+import logging
+import re
+import shlex
+
+from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.etc.versions import parse_version, version_matches
+from rptrc.src.inventory import Inventory
+
+INDEXED_FIELDS = ('id', 'name', 'status', 'pool')
+FILTER_FIELDS = INDEXED_FIELDS + ('stage', 'version')
+OUTPUT_FIELDS = ('id', 'name', 'status', 'pools', 'stage', 'version')
+PROPERTIES_PREFIX = 'properties.'
+OUTPUT_FORMATS = ('ndjson', 'table')
+CONDITION_PATTERN = re.compile(r'^([A-Za-z_][\w.]*)\s*(<=|>=|!=|=|<|>)\s*(.*)$', re.DOTALL)
+
+
+def load_inventory(test_environments_operator, local_mirror=None):
+    """
+    Loads the inventory to query, from the mirror while it holds every test environment within its
+    staleness bound and from RPT otherwise
+    :param test_environments_operator: A TestEnvironments operator
+    :param local_mirror: The mirror of RPT, if enabled
+    :return: inventory
+    :rtype: Inventory
+    """
+    if local_mirror is None:
+        return Inventory.load(test_environments_operator)
+    if not local_mirror.is_complete():
+        local_mirror.refresh(test_environments_operator)
+    return local_mirror.load_inventory()
+
+
+def raise_invalid_query(message):
+    """
+    Raises the exception for an invalid query
+    :param message:
+    """
+    exception_message = f'Invalid query: {message}'
+    logging.critical(exception_message)
+    raise FatalException(exception_message)
+
+
+def check_field(field, allowed_fields):
+    """
+    Checks that a field can be queried
+    :param field:
+    :param allowed_fields:
+    """
+    if field not in allowed_fields and not (field.startswith(PROPERTIES_PREFIX) and field != PROPERTIES_PREFIX):
+        raise_invalid_query(f'unknown field "{field}". Fields are {", ".join(allowed_fields)} and '
+                            f'{PROPERTIES_PREFIX}<key>')
+
+
+def parse_query(expression):
+    """
+    Parses a filter expression into its conditions
+    :param expression: e.g. status=Standby and pool=product-staging and version<1.2.3
+    :return: conditions, as (field, operator, value) tuples
+    :rtype: list
+    """
+    try:
+        tokens = shlex.split(expression or '', posix=True)
+    except ValueError as split_exception:
+        raise_invalid_query(str(split_exception))
+    if not tokens:
+        return []
+    conditions = []
+    words = []
+    for token in tokens + ['and']:
+        if token.lower() != 'and':
+            words.append(token)
+            continue
+        match = CONDITION_PATTERN.match(' '.join(words))
+        if match is None:
+            raise_invalid_query(f'"{" ".join(words)}" is not a condition such as status=Standby')
+        words = []
+        field, operator, value = match.group(1), match.group(2), match.group(3).strip()
+        check_field(field, FILTER_FIELDS)
+        if operator in ('<', '<=', '>', '>=') and field in INDEXED_FIELDS:
+            raise_invalid_query(f'{field} can only be compared with = or !=')
+        conditions.append((field, operator, value))
+    return conditions
+
+
+def parse_fields(fields):
+    """
+    Parses the comma separated fields to output
+    :param fields: e.g. name,version,properties.ccdVersion. Defaults to every field but the properties
+    :return: fields
+    :rtype: list
+    """
+    if not fields:
+        return list(OUTPUT_FIELDS)
+    parsed_fields = [field.strip() for field in fields.split(',') if field.strip()]
+    for field in parsed_fields:
+        check_field(field, OUTPUT_FIELDS)
+    return parsed_fields
+
+
+def field_value(test_environment, field):
+    """
+    Reads a field of a test environment
+    :param test_environment:
+    :param field:
+    :return: value
+    """
+    if field.startswith(PROPERTIES_PREFIX):
+        return test_environment.properties.get(field[len(PROPERTIES_PREFIX):])
+    if field == 'pools':
+        return list(test_environment.pools)
+    return getattr(test_environment, field)
+
+
+def matches(test_environment, condition):
+    """
+    Checks whether a test environment meets a condition
+    :param test_environment:
+    :param condition: (field, operator, value)
+    :return: matched
+    :rtype: bool
+    """
+    field, operator, value = condition
+    if field == 'pool':
+        return (value in test_environment.pools) == (operator == '=')
+    actual = field_value(test_environment, field)
+    if operator in ('=', '!='):
+        return (str(actual) == value if actual is not None else False) == (operator == '=')
+    if actual is None:
+        return False
+    return version_matches(actual, f'{operator}{value}')
+
+
+def look_up_indexed(inventory, field, value):
+    """
+    Looks up the ids of the test environments with a value for an indexed field
+    :param inventory:
+    :param field:
+    :param value:
+    :return: test_environment_ids
+    :rtype: set
+    """
+    if field == 'id':
+        test_environments = [inventory.test_environment_by_id(value)]
+    elif field == 'name':
+        test_environments = [inventory.test_environment_by_name(value)]
+    elif field == 'status':
+        test_environments = inventory.test_environments_with_status(value)
+    else:
+        test_environments = inventory.test_environments_in_pool(value)
+    return {test_environment.id for test_environment in test_environments if test_environment is not None}
+
+
+def run_query(inventory, conditions, sort_field=None, descending=False):
+    """
+    Selects the test environments of an inventory meeting every condition
+    :param inventory:
+    :param conditions: (field, operator, value) tuples
+    :param sort_field: The field to order the test environments by
+    :param descending:
+    :return: test_environments
+    :rtype: list
+    """
+    indexed_conditions = [condition for condition in conditions
+                          if condition[0] in INDEXED_FIELDS and condition[1] == '=']
+    candidate_ids = None
+    for field, _, value in indexed_conditions:
+        test_environment_ids = look_up_indexed(inventory, field, value)
+        candidate_ids = test_environment_ids if candidate_ids is None else candidate_ids & test_environment_ids
+    if candidate_ids is None:
+        candidates = inventory.test_environments()
+    else:
+        candidates = [inventory.test_environment_by_id(test_environment_id) for test_environment_id in candidate_ids]
+    remaining_conditions = [condition for condition in conditions if condition not in indexed_conditions]
+    selected = [test_environment for test_environment in candidates
+                if all(matches(test_environment, condition) for condition in remaining_conditions)]
+    logging.debug(f'Query matched {len(selected)} of {len(candidates)} candidate test environments '
+                  f'out of {len(inventory)}')
+    if sort_field is None:
+        return sorted(selected, key=lambda test_environment: str(test_environment.name))
+    check_field(sort_field, OUTPUT_FIELDS)
+    if sort_field == 'version' or sort_field.startswith(PROPERTIES_PREFIX):
+        def sort_key(test_environment):
+            return parse_version(str(field_value(test_environment, sort_field)))
+    else:
+        def sort_key(test_environment):
+            return str(field_value(test_environment, sort_field))
+    return sorted(selected, key=sort_key, reverse=descending)
+
+
+def project(test_environments, fields=OUTPUT_FIELDS):
+    """
+    Keeps the fields asked for of every test environment
+    :param test_environments:
+    :param fields:
+    :return: rows
+    :rtype: list
+    """
+    return [{field: field_value(test_environment, field) for field in fields} for test_environment in test_environments]
+
+
+def format_rows(rows, fields, output_format):
+    """
+    Formats rows as newline delimited JSON or as a table
+    :param rows:
+    :param fields:
+    :param output_format: ndjson or table
+    :return: lines
+    :rtype: list
+    """
+    if output_format == 'ndjson':
+        return [json.dumps(row) for row in rows]
+
+    def cell(value):
+        if isinstance(value, (list, tuple)):
+            return ','.join(str(item) for item in value)
+        if isinstance(value, dict):
+            return json.dumps(value)
+        return '' if value is None else str(value)
+
+    cells = [[cell(row[field]) for field in fields] for row in rows]
+    widths = [max([len(field)] + [len(row[index]) for row in cells]) for index, field in enumerate(fields)]
+    return [' '.join(text.ljust(width) for text, width in zip(row, widths)).rstrip()
+            for row in [list(fields)] + cells]
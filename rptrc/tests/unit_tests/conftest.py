@@ -0,0 +1,16 @@
+"""
+Fixtures shared by the unit tests
+"""
+import pytest
+
+from rptrc.src import entity_cache
+
+
+@pytest.fixture(autouse=True)
+def fixture_reset_entity_cache(monkeypatch):
+    """
+    Gives every test an empty entity cache, configured from the application config of that test
+    :param monkeypatch:
+    """
+    monkeypatch.setattr(entity_cache, '_ENTITY_CACHE', None)
+    monkeypatch.setattr(entity_cache, '_ENTITY_CACHE_LOADED', False)
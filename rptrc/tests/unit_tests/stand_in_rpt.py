@@ -0,0 +1,156 @@
+"""
+A local stand-in for the Requests service of RPT, so that waiting for queued requests can be
+tested offline. It supports creating and retrieving Requests and, unless disabled, long polling
+through GET /api/requests/<id>?waitFor=status-change&timeout=<seconds>.
+
+Run it with `python -m rptrc.tests.unit_tests.stand_in_rpt [port]` to point a local RPT-RC at it.
+"""
+import json
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LONG_POLL_HEADER = 'X-RPT-Wait-For'
+
+
+class StandInRpt:
+    """
+    An in-memory Requests service served over HTTP on the loopback interface
+    """
+    def __init__(self, port=0, long_poll=True):
+        self.long_poll = long_poll
+        self.requests = {}
+        self.gets = 0
+        self.condition = threading.Condition()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.__build_handler__())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """
+        The base URL the stand-in is served on
+        :return: url
+        :rtype: str
+        """
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """
+        Starts serving on a background thread
+        :return: stand_in
+        :rtype: StandInRpt
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops serving and wakes up any long poll being held
+        """
+        with self.condition:
+            self.condition.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_request(self, request):
+        """
+        Adds a Request, assigning it an ID and a Queued status if it has none
+        :param request:
+        :return: request
+        :rtype: dict
+        """
+        with self.condition:
+            request.setdefault('id', uuid.uuid4().hex)
+            request.setdefault('status', 'Queued')
+            self.requests[request['id']] = request
+        return request
+
+    def set_status(self, request_id, status, **fields):
+        """
+        Changes the status of a Request, releasing every long poll held on it
+        :param request_id:
+        :param status:
+        :param fields: Further fields to update e.g. testEnvironmentId
+        """
+        with self.condition:
+            self.requests[request_id].update(fields, status=status)
+            self.condition.notify_all()
+
+    def wait_for_status_change(self, request_id, timeout):
+        """
+        Holds the caller until the status of the Request changes or the timeout passes
+        :param request_id:
+        :param timeout:
+        :return: request
+        :rtype: dict
+        """
+        with self.condition:
+            initial_status = self.requests[request_id]['status']
+            self.condition.wait_for(lambda: self.requests[request_id]['status'] != initial_status, timeout)
+            return dict(self.requests[request_id])
+
+    def __build_handler__(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Serves the Requests endpoints of the stand-in
+            """
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                Retrieves a single Request, holding the response when long polled
+                """
+                split_url = urlsplit(self.path)
+                request_id = split_url.path.rsplit('/', 1)[-1]
+                query = parse_qs(split_url.query)
+                with stand_in.condition:
+                    stand_in.gets += 1
+                    request = stand_in.requests.get(request_id)
+                if request is None:
+                    self.send_json([])
+                    return
+                if stand_in.long_poll and query.get('waitFor') == ['status-change']:
+                    timeout = float(query.get('timeout', ['60'])[0])
+                    self.send_json([stand_in.wait_for_status_change(request_id, timeout)],
+                                   {LONG_POLL_HEADER: 'status-change'})
+                    return
+                self.send_json([dict(request)])
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """
+                Creates a queued Request
+                """
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                self.send_json(stand_in.add_request(body), status=201)
+
+            def send_json(self, body, headers=None, status=200):
+                """
+                Sends a JSON response
+                :param body:
+                :param headers:
+                :param status:
+                """
+                content = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    STAND_IN = StandInRpt(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8080)
+    print(f'Stand-in RPT serving on {STAND_IN.url}')
+    STAND_IN.server.serve_forever()
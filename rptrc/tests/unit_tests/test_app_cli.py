@@ -1,6 +1,9 @@
 """
 Unit tests for app_cli.py
 """
+import json
+import subprocess
+import sys
 from unittest import mock
 
 from click.testing import CliRunner
@@ -19,9 +22,15 @@ from rptrc.src.app_cli import (
     update_freshest_standby_test_environment_to_available,
     swap_in_available_environment_swap_out_current_environment,
     swap_test_environment_pool,
-    update_freshest_standby_env_to_available_and_swap_its_pool
+    update_freshest_standby_env_to_available_and_swap_its_pool,
+    waiter,
+    serve,
+    run_plan,
+    query
 )
-from rptrc.src.operators.artifact_properties import ArtifactProperties
+from rptrc.src import configuration
+from rptrc.src.etc import retry_policy
+from rptrc.src.operators.artifact_properties import ArtifactProperties, capture_artifacts
 
 VALID_ARTIFACT_REQUEST_ID = {
     'REQUEST_ID': 'ckuctyf5j00000ppcdfd16196',
@@ -162,13 +171,14 @@ SAMPLE_VALID_TEST_ENV_SET_TO_STANDBY = {
 
 # pylint: disable=too-many-public-methods
 # pylint: disable=line-too-long
+# pylint: disable=too-many-lines
 class TestAppCli:
     """
     Class to run unit tests for test_environments.py.
     """
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
-    @mock.patch('rptrc.src.etc.request_retry.requests.post')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.post')
     def test_create_queued_request(self, mock_post, mock_get, mock_patch):
         """
         Tests create_queued_request CLI command.
@@ -202,9 +212,9 @@ class TestAppCli:
                                ])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
-    @mock.patch('rptrc.src.etc.request_retry.requests.post')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.post')
     def test_create_queued_request_with_error(self, mock_post, mock_get, mock_patch):
         """
         Tests create_queued_request CLI command with error.
@@ -238,7 +248,44 @@ class TestAppCli:
                                ])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
+    @mock.patch('rptrc.src.operators.requests.Requests.wait_for_the_queued_request_be_resolved')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.post')
+    def test_create_queued_request_with_poll_wait_mode(self, mock_post, mock_patch, mock_wait):
+        """
+        Tests create_queued_request CLI command polls without trying long polling in poll wait mode.
+        :param mock_post:
+        :param mock_patch:
+        :param mock_wait:
+        """
+        mock_post.return_value.status_code = 201
+        mock_post.return_value.json.return_value = VALID_SAMPLE_REQUEST
+        mock_patch.return_value.status_code = 200
+        mock_patch.return_value.json.return_value = VALID_TEST_ENVIRONMENT_PATCH_RESPONSE
+        mock_wait.return_value = VALID_SAMPLE_REQUEST
+
+        runner = CliRunner()
+        result = runner.invoke(create_queued_request,
+                               ["-ps", "new stage", "-b", json.dumps(VALID_REQUEST_BODY), "--dev_mode",
+                                "--wait_mode", "poll"])
+        assert result.exit_code == 0
+        mock_wait.assert_called_once_with(VALID_SAMPLE_REQUEST['id'])
+
+    @mock.patch('rptrc.src.etc.transport.requests.Session.post')
+    def test_create_queued_request_with_invalid_poll_intervals(self, mock_post):
+        """
+        Tests create_queued_request CLI command rejects a minimum poll interval above the maximum.
+        :param mock_post:
+        """
+        runner = CliRunner()
+        result = runner.invoke(create_queued_request,
+                               ["-ps", "new stage", "-b", '{}', "--dev_mode",
+                                "--poll_min_interval", "5", "--poll_max_interval", "1"])
+        assert result.exit_code == 1
+        assert str(result.exception).startswith('Invalid poll intervals: minimum 5.0s, maximum 1.0s.')
+        mock_post.assert_not_called()
+
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
     @mock.patch.object(ArtifactProperties, 'read')
     def test_abort_queued_request(self, read, mock_patch):
         """
@@ -254,7 +301,7 @@ class TestAppCli:
         result = runner.invoke(abort_queued_request, ["--verbose", "--dev_mode"])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
     @mock.patch.object(ArtifactProperties, 'read')
     def test_abort_queued_request_error(self, read, mock_patch):
         """
@@ -270,7 +317,7 @@ class TestAppCli:
         result = runner.invoke(abort_queued_request, ["--verbose", "--dev_mode"])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
     def test_unreserve_test_environment(self, mock_patch):
         """
         Tests unreserve_environment CLI command.
@@ -283,7 +330,7 @@ class TestAppCli:
         result = runner.invoke(unreserve_environment, ["-t", "validTestEnvironment", "--verbose", "--dev_mode"])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
     def test_unreserve_test_environment_error(self, mock_patch):
         """
         Tests unreserve_environment CLI command with error.
@@ -296,7 +343,42 @@ class TestAppCli:
         result = runner.invoke(unreserve_environment, ["-t", "validTestEnvironment", "--verbose", "--dev_mode"])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
+    @mock.patch('rptrc.src.operators.crud.get_retry_policy', wraps=retry_policy.get_retry_policy)
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    def test_unreserve_test_environment_with_retry_policy(self, mock_patch, mock_get_retry_policy):
+        """
+        Tests unreserve_environment CLI command with the retry policy overridden, which only applies to
+        the requests of that invocation.
+        :param mock_patch:
+        :param mock_get_retry_policy:
+        """
+        mock_patch.return_value.status_code = 200
+        mock_patch.return_value.json.return_value = VALID_SAMPLE_TEST_ENVIRONMENT
+
+        runner = CliRunner()
+        result = runner.invoke(unreserve_environment, ["-t", "validTestEnvironment", "--dev_mode",
+                                                       "--retry_policy", "decorrelated_jitter"])
+        assert result.exit_code == 0
+        assert mock_get_retry_policy.call_args_list[-1] == mock.call('PATCH', 'decorrelated_jitter')
+
+        result = runner.invoke(unreserve_environment, ["-t", "validTestEnvironment", "--dev_mode"])
+        assert result.exit_code == 0
+        assert mock_get_retry_policy.call_args_list[-1] == mock.call('PATCH', None)
+
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    def test_unreserve_test_environment_command_timeout(self, mock_patch):
+        """
+        Tests unreserve_environment CLI command gives up without making a request once its command timeout is spent.
+        :param mock_patch:
+        """
+        runner = CliRunner()
+        result = runner.invoke(unreserve_environment, ["-t", "validTestEnvironment", "--dev_mode",
+                                                       "--command_timeout", "0"])
+        assert result.exit_code == 1
+        assert 'Command timeout of 0.0s exceeded' in str(result.exception)
+        mock_patch.assert_not_called()
+
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
     def test_quarantine_environment(self, mock_patch):
         """
         Tests quarantine_environment CLI command.
@@ -308,7 +390,7 @@ class TestAppCli:
         result = runner.invoke(quarantine_environment, ["-t", "validTestEnvironment", "--verbose", "--dev_mode"])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
     def test_quarantine_environment_error(self, mock_patch):
         """
         Tests quarantine_environment CLI command with error.
@@ -320,7 +402,7 @@ class TestAppCli:
         result = runner.invoke(quarantine_environment, ["-t", "validTestEnvironment", "--verbose", "--dev_mode"])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
     def test_set_standby_environment_to_available(self, mock_patch):
         """
         Tests set_standby_environment_to_available CLI command.
@@ -338,7 +420,7 @@ class TestAppCli:
                                ])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
     def test_set_standby_environment_to_available_error(self, mock_patch):
         """
         Tests set_standby_environment_to_available CLI command with error.
@@ -356,8 +438,8 @@ class TestAppCli:
                                ])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_update_test_environment_stage(self, mock_get, mock_patch):
         """
         Tests update_test_environment_stage CLI command.
@@ -380,8 +462,8 @@ class TestAppCli:
                                ])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_update_test_environment_stage_error(self, mock_get, mock_patch):
         """
         Tests update_test_environment_stage CLI command with error.
@@ -403,8 +485,8 @@ class TestAppCli:
                                 ])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_store_test_environment_details(self, mock_get, mock_patch):
         """
         Tests store_test_environment_details CLI command.
@@ -435,8 +517,36 @@ class TestAppCli:
                                ])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
+    def test_store_test_environment_details_read_back(self, mock_get, mock_patch):
+        """
+        Tests that the details stored by store_test_environment_details are read back by a later command
+        in the same process without asking RPT again.
+        :param mock_get:
+        :param mock_patch:
+        """
+
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = [{'id': 'ckuctyf5j00000ppcdfd16196'}]
+        mock_patch.return_value.status_code = 200
+        mock_patch.return_value.json.return_value = dict(VALID_SAMPLE_TEST_ENVIRONMENT,
+                                                         properties={'version': '2.0.0'})
+
+        runner = CliRunner()
+        result = runner.invoke(store_test_environment_details,
+                               ["-t", "validTestEnvironment", "-b", '{"properties": {"VERSION": "2.0.0"}}',
+                                "--dev_mode"])
+        assert result.exit_code == 0
+        with capture_artifacts() as capture:
+            result = runner.invoke(retrieve_test_environment_details,
+                                   ["-t", "validTestEnvironment", "-gap", "--dev_mode"])
+        assert result.exit_code == 0
+        assert capture.written_files() == {'/usr/src/app/out/artifact.properties': 'VERSION=2.0.0\n'}
+        assert mock_get.call_count == 1
+
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_store_test_environment_details_error(self, mock_get, mock_patch):
         """
         Tests store_test_environment_details CLI command with error.
@@ -467,8 +577,8 @@ class TestAppCli:
                                ])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_store_details_for_test_environments_by_pool(self, mock_get, mock_patch):
         """
         Tests store_details_for_test_environments_by_pool CLI command.
@@ -503,8 +613,8 @@ class TestAppCli:
                                ])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_store_details_for_test_environments_by_pool_error(self, mock_get, mock_patch):
         """
         Tests store_details_for_test_environments_by_pool CLI command with error.
@@ -539,7 +649,36 @@ class TestAppCli:
                                ])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
+    def test_store_details_for_test_environments_by_pool_concurrently(self, mock_get, mock_patch):
+        """
+        Tests store_details_for_test_environments_by_pool CLI command with a concurrency greater than one.
+        :param mock_get:
+        :param mock_patch:
+        """
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = [{
+            'id': 'ckuctyf5j00000ppcdfd16196',
+            'assignedTestEnvironmentIds': ['env1', 'env2', 'env3', 'env4'],
+            'poolName': 'testPool'
+        }]
+        mock_patch.return_value.status_code = 200
+        mock_patch.return_value.json.return_value = VALID_SAMPLE_TEST_ENVIRONMENT
+
+        runner = CliRunner()
+        result = runner.invoke(store_details_for_test_environments_by_pool,
+                               [
+                                "-pl", "validPool",
+                                "-b", '{"properties": {"VERSION": "1.0.0"}}',
+                                "--concurrency", "4",
+                                "--dev_mode"
+                               ])
+        assert result.exit_code == 0
+        assert mock_get.call_count == 1
+        assert mock_patch.call_count == 4
+
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_retrieve_test_environment_details(self, mock_get):
         """
         Tests retrieve_test_environment_details CLI command.
@@ -558,7 +697,7 @@ class TestAppCli:
                                ])
         result.exit_code = 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_retrieve_test_environment_details_error(self, mock_get):
         """
         Tests retrieve_test_environment_details CLI command with error.
@@ -577,7 +716,7 @@ class TestAppCli:
                                ])
         result.exit_code = 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_fail_if_version_specified_equals_version_on_test_environment_with_matching_version(self, mock_get):
         """
         Tests fail_if_version_specified_equals_version_on_test_environment CLI command.
@@ -597,7 +736,7 @@ class TestAppCli:
                                ])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_fail_if_version_specified_equals_version_on_test_environment_without_matching_version(self, mock_get):
         """
         Tests fail_if_version_specified_equals_version_on_test_environment CLI command.
@@ -608,16 +747,17 @@ class TestAppCli:
         mock_get.return_value.json.return_value = [SAMPLE_TEST_ENVIRONMENT]
 
         runner = CliRunner()
-        result = runner.invoke(fail_if_version_specified_equals_version_on_test_environment,
-                               [
-                                "-t", "validTestEnvironment",
-                                "-vfc", "1.3.1",
-                                "--verbose",
-                                "--dev_mode"
-                               ])
-        assert result.exit_code == 0
-
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+        for version_for_comparison in ("1.3.1", "2.8", "v2.8.6"):
+            result = runner.invoke(fail_if_version_specified_equals_version_on_test_environment,
+                                   [
+                                    "-t", "validTestEnvironment",
+                                    "-vfc", version_for_comparison,
+                                    "--verbose",
+                                    "--dev_mode"
+                                   ])
+            assert result.exit_code == 0
+
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_check_if_version_specified_equals_version_on_test_environment(self, mock_get):
         """
         Tests check_if_version_specified_equals_version_on_test_environment CLI command.
@@ -637,7 +777,7 @@ class TestAppCli:
                                ])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_check_if_version_specified_equals_version_on_test_environment_error(self, mock_get):
         """
         Tests check_if_version_specified_equals_version_on_test_environment CLI command with error.
@@ -657,8 +797,8 @@ class TestAppCli:
                                ])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_update_freshest_standby_test_environment_to_available(self, mock_get, mock_patch):
         """
         Tests update_freshest_standby_test_environment_to_available CLI command.
@@ -686,8 +826,48 @@ class TestAppCli:
                                ])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
+    def test_update_freshest_standby_test_environment_to_available_locally(self, mock_get, mock_patch, monkeypatch):
+        """
+        Tests update_freshest_standby_test_environment_to_available CLI command picking the freshest
+        standby test environment from the inventory and confirming it with a single request.
+        :param mock_get:
+        :param mock_patch:
+        :param monkeypatch:
+        """
+        monkeypatch.setattr(configuration, '_CONFIG', configuration.FrozenApplicationConfig({
+            'RPTRC_PERFORMANCE_FRESHEST_SELECTION': 'local'}))
+        standby_test_environments = [
+            dict(SAMPLE_TEST_ENVIRONMENT, pools=['validPool']),
+            dict(SAMPLE_TEST_ENVIRONMENT, id='freshestId', name='freshestTestEnvironment', pools=['validPool'],
+                 properties={'version': '2.10.0'}),
+            dict(SAMPLE_TEST_ENVIRONMENT, id='otherPoolId', name='otherTestEnvironment', pools=['otherPool'],
+                 properties={'version': '3.0.0'}),
+        ]
+        fake_get_responses = [mock.Mock(), mock.Mock()]
+        fake_get_responses[0].status_code = 200
+        fake_get_responses[0].json.return_value = standby_test_environments
+        fake_get_responses[1].status_code = 200
+        fake_get_responses[1].json.return_value = [standby_test_environments[1]]
+        mock_get.side_effect = fake_get_responses
+        mock_patch.return_value.status_code = 200
+        mock_patch.return_value.json.return_value = dict(standby_test_environments[1], status='Available')
+
+        runner = CliRunner()
+        result = runner.invoke(update_freshest_standby_test_environment_to_available,
+                               [
+                                "-pl", "validPool",
+                                "--verbose",
+                                "--dev_mode"
+                               ])
+        assert result.exit_code == 0
+        assert mock_get.call_count == 2
+        assert mock_patch.call_args[0][0].endswith('/test-environment-from-standby-to-available/'
+                                                   'freshestTestEnvironment')
+
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_update_freshest_standby_test_environment_to_available_error(self, mock_get, mock_patch):
         """
         Tests update_freshest_standby_test_environment_to_available CLI command with error.
@@ -714,8 +894,8 @@ class TestAppCli:
                                ])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     @mock.patch.object(ArtifactProperties, 'read')
     def test_swap_in_available_environment_swap_out_current_environment(self, read, mock_get, mock_patch):
         """
@@ -725,13 +905,13 @@ class TestAppCli:
         :param mock_patch:
         """
 
-        fake_get_responses = [mock.Mock(), mock.Mock(), mock.Mock()]
+        fake_get_responses = [mock.Mock(), mock.Mock()]
         fake_get_responses[0].status_code = 200
-        fake_get_responses[0].json.return_value = [VALID_SAMPLE_TEST_ENVIRONMENT]
+        fake_get_responses[0].json.return_value = [dict(VALID_SAMPLE_TEST_ENVIRONMENT, name='availableTestEnvironment',
+                                                        pools=['validPool'])]
         fake_get_responses[1].status_code = 200
-        fake_get_responses[1].json.return_value = [VALID_SAMPLE_TEST_ENVIRONMENT]
-        fake_get_responses[2].status_code = 200
-        fake_get_responses[2].json.return_value = [VALID_SAMPLE_TEST_ENVIRONMENT]
+        fake_get_responses[1].json.return_value = [dict(VALID_SAMPLE_TEST_ENVIRONMENT, id='currentTestEnvironmentId',
+                                                        pools=['newValidPool'])]
         fake_patch_responses = [mock.Mock(), mock.Mock()]
         fake_patch_responses[0].status_code = 200
         fake_patch_responses[0].json.return_value = VALID_TEST_ENVIRONMENT_PATCH_RESPONSE
@@ -751,9 +931,10 @@ class TestAppCli:
                                 "--dev_mode"
                                ])
         assert result.exit_code == 0
+        assert mock_get.call_count == 2
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     @mock.patch.object(ArtifactProperties, 'read')
     def test_swap_in_available_environment_swap_out_current_environment_error(self, read, mock_get, mock_patch):
         """
@@ -763,13 +944,13 @@ class TestAppCli:
         :param mock_patch:
         """
 
-        fake_get_responses = [mock.Mock(), mock.Mock(), mock.Mock()]
+        fake_get_responses = [mock.Mock(), mock.Mock()]
         fake_get_responses[0].status_code = 200
-        fake_get_responses[0].json.return_value = [VALID_SAMPLE_TEST_ENVIRONMENT]
+        fake_get_responses[0].json.return_value = [dict(VALID_SAMPLE_TEST_ENVIRONMENT, name='availableTestEnvironment',
+                                                        pools=['validPool'])]
         fake_get_responses[1].status_code = 200
-        fake_get_responses[1].json.return_value = [VALID_SAMPLE_TEST_ENVIRONMENT]
-        fake_get_responses[2].status_code = 200
-        fake_get_responses[2].json.return_value = [VALID_SAMPLE_TEST_ENVIRONMENT]
+        fake_get_responses[1].json.return_value = [dict(VALID_SAMPLE_TEST_ENVIRONMENT, id='currentTestEnvironmentId',
+                                                        pools=['newValidPool'])]
         fake_patch_responses = [mock.Mock(), mock.Mock()]
         fake_patch_responses[0].status_code = 200
         fake_patch_responses[0].json.return_value = VALID_TEST_ENVIRONMENT_PATCH_RESPONSE
@@ -789,9 +970,10 @@ class TestAppCli:
                                 "--dev_mode"
                                ])
         assert result.exit_code == 1
+        assert mock_patch.call_count == 2
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_swap_test_environment_pool(self, mock_get, mock_patch):
         """
         Tests swap_test_environment_pool CLI command.
@@ -824,8 +1006,8 @@ class TestAppCli:
                                ])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_swap_test_environment_pool_error(self, mock_get, mock_patch):
         """
         Tests swap_test_environment_pool CLI command with error.
@@ -859,8 +1041,8 @@ class TestAppCli:
                                ])
         assert result.exit_code == 1
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_update_freshest_standby_env_to_available_and_swap_its_pool(self, mock_get, mock_patch):
         """
         Tests update_freshest_standby_env_to_available_and_swap_its_pool CLI command.
@@ -893,8 +1075,8 @@ class TestAppCli:
                                ])
         assert result.exit_code == 0
 
-    @mock.patch('rptrc.src.etc.request_retry.requests.patch')
-    @mock.patch('rptrc.src.etc.request_retry.requests.get')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.patch')
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
     def test_update_freshest_standby_env_to_available_and_swap_its_pool_error(self, mock_get, mock_patch):
         """
         Tests update_freshest_standby_env_to_available_and_swap_its_pool CLI command with error.
@@ -926,3 +1108,87 @@ class TestAppCli:
                                 "--dev_mode"
                                ])
         assert result.exit_code == 1
+
+    @mock.patch('rptrc.src.etc.waiter.serve_waiter')
+    def test_waiter(self, mock_serve):
+        """
+        Tests waiter CLI command serves a waiter on the socket passed in.
+        :param mock_serve:
+        """
+        runner = CliRunner()
+        result = runner.invoke(waiter, ["--dev_mode", "--socket_path", "/tmp/test_waiter.sock"])
+        assert result.exit_code == 0
+        socket_path, request_waiter, max_wait = mock_serve.call_args[0]
+        assert (socket_path, max_wait) == ('/tmp/test_waiter.sock', 3600)
+        assert request_waiter.requests_operator.target_host == 'http://rpt-staging.ews.gic.ericsson.se'
+        assert (request_waiter.sweep_interval, request_waiter.sweep_timeout) == (1, 10)
+        assert request_waiter.requests_operator.retry_timeout == 10
+
+    @mock.patch('rptrc.src.daemon.serve_daemon')
+    def test_serve(self, mock_serve_daemon):
+        """
+        Tests serve CLI command runs the daemon on the configured socket unless one is passed in.
+        :param mock_serve_daemon:
+        """
+        runner = CliRunner()
+        result = runner.invoke(serve, [])
+        assert result.exit_code == 0
+        assert mock_serve_daemon.call_args[0][0] == '/tmp/rptrc.sock'
+        result = runner.invoke(serve, ["--socket_path", "/tmp/test_rptrc.sock"])
+        assert result.exit_code == 0
+        assert mock_serve_daemon.call_args[0][0] == '/tmp/test_rptrc.sock'
+
+    def test_cli_loads_without_http_stack(self):
+        """
+        Tests loading the CLI and parsing a command's arguments does not import the HTTP stack.
+        """
+        script = ('import sys\n'
+                  'from rptrc.src.app_cli import cli_main\n'
+                  'cli_main.main(["abort-queued-request", "--help"], standalone_mode=False)\n'
+                  'print(sorted(name for name in ("requests", "urllib3") if name in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        assert result.stdout.splitlines()[-1] == '[]'
+
+    @mock.patch('rptrc.src.plan.run_plan')
+    def test_run_plan(self, mock_run_plan, tmp_path):
+        """
+        Tests run_plan CLI command runs the steps of the plan file passed in.
+        :param mock_run_plan:
+        :param tmp_path:
+        """
+        plan_file = tmp_path / 'plan.json'
+        plan_file.write_text(json.dumps({'steps': [{'command': 'unreserve-environment', 'args': ['-t', 'env1']}]}))
+        runner = CliRunner()
+        result = runner.invoke(run_plan, [str(plan_file)])
+        assert result.exit_code == 0
+        assert mock_run_plan.call_args[0][1] == [('unreserve-environment', ['-t', 'env1'])]
+
+    @mock.patch('rptrc.src.etc.transport.requests.Session.get')
+    def test_query(self, mock_get):
+        """
+        Tests query CLI command lists the test environments matching the expression passed in.
+        :param mock_get:
+        """
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = [
+            dict(VALID_SAMPLE_TEST_ENVIRONMENT, pools=['validPool']),
+            dict(VALID_SAMPLE_TEST_ENVIRONMENT, id='env2Id', name='env2', status='Standby', pools=['validPool']),
+            dict(VALID_SAMPLE_TEST_ENVIRONMENT, id='env3Id', name='env3', status='Standby', pools=['validPool'],
+                 properties={'version': '1.0.10'}),
+        ]
+        runner = CliRunner()
+        result = runner.invoke(query, ['status=Standby and version>1.0.0', '-f', 'name,version', '--dev_mode'])
+        assert result.exit_code == 0
+        assert result.stdout.splitlines() == ['{"name": "env3", "version": "1.0.10"}']
+        assert mock_get.call_args[0][0] == 'http://rpt-staging.ews.gic.ericsson.se/api/test-environments'
+
+        result = runner.invoke(query, ['pool=validPool', '-f', 'name,status', '-s', 'name', '-d', '-o', 'table'])
+        assert result.exit_code == 0
+        assert result.stdout.splitlines() == ['name                 status',
+                                              'validTestEnvironment Available',
+                                              'env3                 Standby',
+                                              'env2                 Standby']
+
+        result = runner.invoke(query, ['status<Standby'])
+        assert result.exit_code == 1
+        assert str(result.exception) == 'Invalid query: status can only be compared with = or !='
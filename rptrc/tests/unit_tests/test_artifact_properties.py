@@ -5,7 +5,7 @@ Unit tests for artifact_properties.py
 import os
 import pytest
 
-from rptrc.src.operators.artifact_properties import ArtifactProperties
+from rptrc.src.operators.artifact_properties import ArtifactProperties, capture_artifacts
 from rptrc.src.etc.exceptions import InDirectoryNotSetException, InFileNotSetException, KeyValuePairsNotSetException
 
 
@@ -119,3 +119,27 @@ class TestArtifactProperties:
         artifact_properties = ArtifactProperties()
         key_value_pairs = artifact_properties.read(str(in_directory), in_file)
         assert key_value_pairs['KEY'] == 'VALUE'
+
+    def test_generate_and_read_while_capturing(self, tmp_path):
+        """
+        Tests that files generated and read while capturing stay in memory.
+        :param tmp_path:
+        """
+        out_directory = str(tmp_path / 'out')
+        with capture_artifacts({'/usr/src/app/in/artifact.properties': 'KEY=VALUE\n'}) as capture:
+            assert ArtifactProperties().read() == {'KEY': 'VALUE'}
+            ArtifactProperties({'REQUEST_ID': '1234'}, out_directory=out_directory).generate()
+            ArtifactProperties({'RESOURCE_NAME': 'env1'}, out_directory=out_directory, mode='a').generate()
+        assert not os.path.exists(out_directory)
+        assert capture.written_files() == {
+            f'{out_directory}/artifact.properties': 'REQUEST_ID=1234\nRESOURCE_NAME=env1\n'
+        }
+
+    def test_read_missing_file_while_capturing(self):
+        """
+        Tests that reading a file that was not captured fails as if it did not exist. (negative case)
+        """
+        with capture_artifacts():
+            with pytest.raises(InFileNotSetException) as exception:
+                ArtifactProperties().read()
+        assert str(exception.value) == 'In File Not Set Exception, The specified in_file does not exist.'
@@ -0,0 +1,225 @@
+"""
+Unit tests for circuit_breaker.py
+"""
+import os
+
+import pytest
+
+from rptrc.src.etc import circuit_breaker, request_retry, retry_policy
+from rptrc.src.etc.circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+from rptrc.src.etc.exceptions import CircuitOpenException
+from rptrc.tests.unit_tests.mock_response import MockResponse
+
+URL = 'http://rpt.example.com/api/test-environments'
+
+
+class FakeClock:
+    """
+    A clock that only moves when told to
+    """
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        """
+        Returns the current fake time
+        :return: now
+        :rtype: float
+        """
+        return self.now
+
+
+@pytest.fixture(name='clock')
+def fixture_clock(monkeypatch):
+    """
+    Replaces the wall clock used by the circuit breaker
+    :param monkeypatch:
+    :return: clock
+    :rtype: FakeClock
+    """
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, 'time', clock.time)
+    return clock
+
+
+def build_breakers(tmp_path, count=2):
+    """
+    Builds breakers sharing one state file, as separate invocations on an agent would
+    :param tmp_path:
+    :param count:
+    :return: breakers
+    :rtype: list
+    """
+    state_file = str(tmp_path / 'state' / 'circuit.json')
+    return [CircuitBreaker(state_file, failure_threshold=3, cooldown=30, probe_timeout=60) for _ in range(count)]
+
+
+class TestCircuitBreaker:
+    """
+    Class to run unit tests for circuit_breaker.py
+    """
+
+    def test_circuit_opens_after_threshold(self, tmp_path, clock):
+        """
+        Tests that the circuit only opens once the failure threshold is reached
+        :param tmp_path:
+        :param clock:
+        """
+        breaker, = build_breakers(tmp_path, 1)
+        breaker.record_failure(URL)
+        breaker.record_failure(URL)
+        breaker.before_request(URL)
+        assert breaker.get_state(URL) == CLOSED
+        breaker.record_failure(URL)
+        assert breaker.get_state(URL) == OPEN
+        clock.now += 10
+        with pytest.raises(CircuitOpenException) as exception:
+            breaker.before_request(URL)
+        assert exception.value.retry_after == 20
+
+    def test_success_resets_failures(self, tmp_path, clock):
+        """
+        Tests that a success resets the count of consecutive failures
+        :param tmp_path:
+        :param clock:
+        """
+        breaker, = build_breakers(tmp_path, 1)
+        breaker.record_failure(URL)
+        breaker.record_failure(URL)
+        breaker.record_success(URL)
+        breaker.record_failure(URL)
+        assert breaker.get_state(URL) == CLOSED
+        assert clock.now == 1000.0
+
+    def test_closed_circuit_is_not_rewritten(self, tmp_path, clock):
+        """
+        Tests that requests towards a closed circuit only read the state, and that the state file is only
+        rewritten once the state changes
+        :param tmp_path:
+        :param clock:
+        """
+        breaker, = build_breakers(tmp_path, 1)
+        breaker.before_request(URL)
+        breaker.record_success(URL)
+        assert not os.path.exists(breaker.state_file)
+        breaker.record_failure(URL)
+        breaker.record_success(URL)
+        os.utime(breaker.state_file, (0, 0))
+        breaker.before_request(URL)
+        breaker.record_success(URL)
+        assert breaker.get_state(URL) == CLOSED
+        assert os.stat(breaker.state_file).st_mtime == 0
+        assert clock.now == 1000.0
+
+    def test_open_circuit_is_shared_between_invocations(self, tmp_path, clock):
+        """
+        Tests that once one invocation trips the breaker, other invocations back off
+        :param tmp_path:
+        :param clock:
+        """
+        first_breaker, second_breaker = build_breakers(tmp_path)
+        for _ in range(3):
+            first_breaker.record_failure(URL)
+        clock.now += 1
+        with pytest.raises(CircuitOpenException):
+            second_breaker.before_request(URL)
+        second_breaker.before_request('http://other-host.example.com/api')
+
+    def test_single_probe_when_half_open(self, tmp_path, clock):
+        """
+        Tests that only one invocation sends a probe after the cool-down and its success closes the circuit
+        :param tmp_path:
+        :param clock:
+        """
+        first_breaker, second_breaker = build_breakers(tmp_path)
+        for _ in range(3):
+            first_breaker.record_failure(URL)
+        clock.now += 31
+        first_breaker.before_request(URL)
+        assert second_breaker.get_state(URL) == HALF_OPEN
+        with pytest.raises(CircuitOpenException):
+            second_breaker.before_request(URL)
+        first_breaker.record_success(URL)
+        second_breaker.before_request(URL)
+        assert second_breaker.get_state(URL) == CLOSED
+
+    def test_failed_probe_reopens_circuit(self, tmp_path, clock):
+        """
+        Tests that a failed probe opens the circuit for another cool-down
+        :param tmp_path:
+        :param clock:
+        """
+        breaker, = build_breakers(tmp_path, 1)
+        for _ in range(3):
+            breaker.record_failure(URL)
+        clock.now += 31
+        breaker.before_request(URL)
+        breaker.record_failure(URL)
+        assert breaker.get_state(URL) == OPEN
+        with pytest.raises(CircuitOpenException) as exception:
+            breaker.before_request(URL)
+        assert exception.value.retry_after == 30
+
+    def test_abandoned_probe_is_taken_over(self, tmp_path, clock):
+        """
+        Tests that a probe that never reports back is taken over once the probe timeout passes
+        :param tmp_path:
+        :param clock:
+        """
+        first_breaker, second_breaker = build_breakers(tmp_path)
+        for _ in range(3):
+            first_breaker.record_failure(URL)
+        clock.now += 31
+        first_breaker.before_request(URL)
+        clock.now += 61
+        second_breaker.before_request(URL)
+        assert second_breaker.get_state(URL) == HALF_OPEN
+
+    def test_request_retry_backs_off_without_sending_while_open(self, tmp_path, clock, monkeypatch):
+        """
+        Tests that request_retry does not send requests while the circuit is open and waits for the cool-down
+        :param tmp_path:
+        :param clock:
+        :param monkeypatch:
+        """
+        breaker, = build_breakers(tmp_path, 1)
+        for _ in range(3):
+            breaker.record_failure(URL)
+        sent = []
+        slept = []
+
+        def sleep_mock(delay):
+            """
+            Moves the fake clock forward instead of sleeping
+            :param delay:
+            """
+            slept.append(delay)
+            clock.now += delay
+
+        def request_mock(*args):
+            """
+            A mock for a successful request
+            :param args:
+            :return: Mock Response
+            :rtype: MockResponse
+            """
+            sent.append(args)
+            return MockResponse('{}', 200)
+
+        monkeypatch.setattr(request_retry, 'get_circuit_breaker', lambda: breaker)
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', request_mock)
+        monkeypatch.setattr(request_retry, 'sleep', sleep_mock)
+        response = request_retry.request_retry('GET', URL, 120, retry_policy=retry_policy.ExponentialBackoff(1, 60))
+        assert response.status_code == 200
+        assert slept == [30]
+        assert len(sent) == 1
+        assert breaker.get_state(URL) == CLOSED
+
+    def test_get_circuit_breaker_disabled_by_default(self, monkeypatch):
+        """
+        Tests that no circuit breaker is used unless it is enabled in application.ini
+        :param monkeypatch:
+        """
+        monkeypatch.setattr(circuit_breaker, '_CIRCUIT_BREAKER_LOADED', False)
+        monkeypatch.setattr(circuit_breaker, '_CIRCUIT_BREAKER', None)
+        assert circuit_breaker.get_circuit_breaker() is None
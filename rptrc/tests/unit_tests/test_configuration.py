@@ -0,0 +1,56 @@
+"""
+Unit tests for configuration.py
+"""
+import pytest
+
+from rptrc.src import configuration
+from rptrc.src.configuration import FrozenApplicationConfig
+
+
+class TestConfiguration:
+    """
+    Class to run unit tests for configuration.py
+    """
+
+    def test_environment_overrides(self):
+        """
+        Tests that environment variables named after a section override its options
+        """
+        config = FrozenApplicationConfig(environment={
+            'RPTRC_PERFORMANCE_CONNECTION_POOL_SIZE': '20',
+            'RPTRC_CIRCUIT_BREAKER_ENABLED': 'true',
+            'RPTRC_SOCKET': '/tmp/rptrc.sock',
+            'RPTRC_PERFORMANCE_': 'ignored',
+        })
+        assert config.getint('PERFORMANCE', 'connection_pool_size') == 20
+        assert config.getboolean('CIRCUIT_BREAKER', 'enabled')
+        assert config.get('RPT_URLS', 'prod') == 'http://rpt.ews.gic.ericsson.se'
+        assert not config.has_section('SOCKET')
+
+    def test_config_is_read_only(self):
+        """
+        Tests that the config cannot be changed once loaded
+        """
+        config = FrozenApplicationConfig(environment={})
+        with pytest.raises(TypeError):
+            config.set('PERFORMANCE', 'connection_pool_size', '20')
+        with pytest.raises(TypeError):
+            config['PERFORMANCE']['scan_concurrency'] = '1'
+        with pytest.raises(TypeError):
+            config.remove_section('RPT_URLS')
+        assert config.getint('PERFORMANCE', 'scan_concurrency') == 8
+
+    def test_get_config_is_loaded_once(self, monkeypatch):
+        """
+        Tests that the process shares one config until it is reset
+        :param monkeypatch:
+        """
+        configuration.reset_config()
+        monkeypatch.setenv('RPTRC_PERFORMANCE_SCAN_CONCURRENCY', '3')
+        try:
+            config = configuration.get_config()
+            assert configuration.get_config() is config
+            assert config.getint('PERFORMANCE', 'scan_concurrency') == 3
+        finally:
+            configuration.reset_config()
+        assert configuration.get_config() is not config
@@ -0,0 +1,156 @@
+"""
+Unit tests for daemon.py and the thin client in client.py
+"""
+import json
+import logging
+import sys
+import threading
+
+import click
+import pytest
+
+from rptrc import client
+from rptrc.src.daemon import DaemonServer, route_streams, run_command
+from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.operators.artifact_properties import ArtifactProperties
+
+IN_FILE = '/usr/src/app/in/artifact.properties'
+OUT_FILE = '/usr/src/app/out/artifact.properties'
+
+
+@click.group()
+def stand_in_cli():
+    """
+    A small CLI standing in for the commands of RPT-RC
+    """
+
+
+@stand_in_cli.command()
+@click.option('--name', default='world')
+def greet(name):
+    """
+    Writes to stdout, stderr and the log
+    :param name:
+    """
+    click.echo(f'hello {name}')
+    click.echo('a warning', err=True)
+    logging.info('a log line')
+
+
+@stand_in_cli.command()
+def store_request_id():
+    """
+    Reads the Request ID passed in and generates an artifact properties file holding it
+    """
+    request_id = ArtifactProperties().read()['REQUEST_ID']
+    ArtifactProperties({'REQUEST_ID': request_id, 'RESOURCE_NAME': 'env1'}).generate()
+
+
+@stand_in_cli.command()
+def fail():
+    """
+    Fails the way RPT-RC commands do
+    """
+    raise FatalException('No Request entity with ID 1234 was found in RPT')
+
+
+@pytest.fixture(name='daemon_socket')
+def fixture_daemon_socket(tmp_path):
+    """
+    Serves the stand-in CLI through the daemon on a Unix socket for the duration of a test
+    :param tmp_path:
+    :return: socket_path
+    :rtype: str
+    """
+    streams = sys.stdout, sys.stderr
+    root_logger = logging.getLogger('')
+    handler = logging.StreamHandler(sys.stderr)
+    root_logger.addHandler(handler)
+    previous_level = root_logger.level
+    root_logger.setLevel(logging.INFO)
+    route_streams()
+    socket_path = str(tmp_path / 'rptrc.sock')
+    server = DaemonServer(socket_path, stand_in_cli)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield socket_path
+    server.shutdown()
+    server.server_close()
+    sys.stdout, sys.stderr = streams
+    root_logger.removeHandler(handler)
+    root_logger.setLevel(previous_level)
+
+
+class TestDaemon:
+    """
+    Class to run unit tests for daemon.py and client.py
+    """
+
+    def test_run_in_daemon_streams_output(self, daemon_socket, capsys):
+        """
+        Tests that the output and logs of a command are streamed back to the invocation
+        :param daemon_socket:
+        :param capsys:
+        """
+        assert client.run_in_daemon(client.connect(daemon_socket), ['greet', '--name', 'rpt']) == 0
+        captured = capsys.readouterr()
+        assert captured.out == 'hello rpt\n'
+        assert 'a warning\n' in captured.err
+        assert 'a log line\n' in captured.err
+
+    def test_run_in_daemon_round_trips_artifacts(self, daemon_socket, monkeypatch, tmp_path):
+        """
+        Tests that the artifact properties files the client sees are read by the command and the ones
+        it generates are written by the client
+        :param daemon_socket:
+        :param monkeypatch:
+        :param tmp_path:
+        """
+        in_file = tmp_path / 'in' / 'artifact.properties'
+        in_file.parent.mkdir()
+        in_file.write_text('REQUEST_ID=1234\n')
+        out_file = tmp_path / 'out' / 'artifact.properties'
+        monkeypatch.setattr(client, 'read_artifact_files', lambda: {IN_FILE: in_file.read_text()})
+        written = {}
+        monkeypatch.setattr(client, 'write_artifact_files', written.update)
+        assert client.run_in_daemon(client.connect(daemon_socket), ['store-request-id']) == 0
+        assert written == {OUT_FILE: 'REQUEST_ID=1234\nRESOURCE_NAME=env1\n'}
+        assert not out_file.exists()
+
+    def test_run_in_daemon_exit_codes(self, daemon_socket, capsys):
+        """
+        Tests that failing commands, usage errors and daemon commands are reported with their exit codes
+        :param daemon_socket:
+        :param capsys:
+        """
+        assert client.run_in_daemon(client.connect(daemon_socket), ['fail']) == 1
+        assert 'No Request entity with ID 1234 was found in RPT' in capsys.readouterr().err
+        assert client.run_in_daemon(client.connect(daemon_socket), ['greet', '--unknown']) == 2
+        assert 'no such option: --unknown' in capsys.readouterr().err
+        assert client.run_in_daemon(client.connect(daemon_socket), ['serve']) == 2
+        assert capsys.readouterr().err == 'Error: serve cannot be run through the daemon\n'
+
+    def test_daemon_rejects_invalid_message(self, daemon_socket):
+        """
+        Tests that a message without an argv is rejected
+        :param daemon_socket:
+        """
+        with client.connect(daemon_socket) as connection:
+            connection.sendall(b'{"artifacts": {}}\n')
+            replies = [json.loads(line) for line in connection.makefile('rb')]
+        assert replies[-1] == {'exit_code': 2, 'artifacts': {}}
+
+    def test_run_command_in_process(self, capsys):
+        """
+        Tests that a command run outside the daemon writes to the streams of the process
+        :param capsys:
+        """
+        assert run_command(stand_in_cli, ['greet']) == 0
+        assert capsys.readouterr().out == 'hello world\n'
+
+    def test_connect_without_daemon(self, tmp_path):
+        """
+        Tests that the client runs commands in-process when no daemon is listening
+        :param tmp_path:
+        """
+        assert client.connect(str(tmp_path / 'rptrc.sock')) is None
+        assert client.connect(None) is None
@@ -0,0 +1,119 @@
+"""
+Unit tests for deadline.py
+"""
+import pytest
+
+from rptrc.src.etc import deadline as deadline_module
+from rptrc.src.etc.deadline import Deadline
+from rptrc.src.etc.exceptions import DeadlineExceededException, FatalException
+
+
+class FakeClock:
+    """
+    A monotonic clock that only moves when told to
+    """
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        """
+        Moves the clock forward
+        :param seconds:
+        """
+        self.now += seconds
+
+
+@pytest.fixture(name='clock')
+def fixture_clock(monkeypatch):
+    """
+    Replaces the monotonic clock used by deadlines with a fake one
+    :param monkeypatch:
+    :return: clock
+    :rtype: FakeClock
+    """
+    clock = FakeClock()
+    monkeypatch.setattr(deadline_module, 'monotonic', clock)
+    return clock
+
+
+class TestDeadline:
+    """
+    Class to run unit tests for deadline.py
+    """
+
+    def test_unbounded_deadline_never_expires(self, clock):
+        """
+        Tests that a deadline without a budget leaves timeouts untouched and never expires
+        :param clock:
+        """
+        deadline = Deadline()
+        clock.advance(10 ** 6)
+        assert deadline.remaining() is None
+        assert deadline.bound(20) == 20
+        assert deadline.bound(None) is None
+        assert not deadline.expired
+        deadline.check('GET some_url')
+
+    def test_bound_caps_timeout_to_remaining_budget(self, clock):
+        """
+        Tests that timeouts are shortened as the budget is spent
+        :param clock:
+        """
+        deadline = Deadline(30)
+        assert deadline.bound(20) == 20
+        clock.advance(25)
+        assert deadline.bound(20) == 5
+        assert deadline.bound(None) == 5
+        clock.advance(10)
+        assert deadline.bound(20) == 0
+
+    def test_check_raises_with_breakdown_once_expired(self, clock):
+        """
+        Tests that an expired deadline raises and reports where the time was spent
+        :param clock:
+        """
+        deadline = Deadline(30)
+        with deadline.track('GET'):
+            clock.advance(12)
+        with deadline.track('retry backoff'):
+            clock.advance(20)
+        with pytest.raises(DeadlineExceededException) as exception:
+            deadline.check('GET some_url')
+        assert isinstance(exception.value, FatalException)
+        assert str(exception.value) == ('Command timeout of 30s exceeded before GET some_url. Timing breakdown: '
+                                        '32.0s elapsed (retry backoff: 1 x 20.0s, GET: 1 x 12.0s)')
+        assert exception.value.breakdown == '32.0s elapsed (retry backoff: 1 x 20.0s, GET: 1 x 12.0s)'
+
+    def test_track_records_time_when_block_raises(self, clock):
+        """
+        Tests that time spent in a failing block is still recorded
+        :param clock:
+        """
+        deadline = Deadline()
+        with pytest.raises(ValueError):
+            with deadline.track('GET'):
+                clock.advance(3)
+                raise ValueError('boom')
+        with deadline.track('GET'):
+            clock.advance(1)
+        assert deadline.breakdown() == '4.0s elapsed (GET: 2 x 4.0s)'
+
+    def test_child_expires_with_its_timeout_or_parent(self, clock):
+        """
+        Tests that a child deadline expires after its timeout, never after its parent, and records its
+        time against its parent too
+        :param clock:
+        """
+        deadline = Deadline(10)
+        assert deadline.child(None).budget == 10
+        child = deadline.child(3)
+        with child.track('GET'):
+            clock.advance(3)
+        assert child.expired
+        assert not deadline.expired
+        assert deadline.breakdown() == '3.0s elapsed (GET: 1 x 3.0s)'
+        assert deadline.child(30).budget == 7
+        assert Deadline().child(None).budget is None
@@ -0,0 +1,132 @@
+"""
+Unit tests for entity_cache.py
+"""
+from unittest import mock
+
+import pytest
+
+from rptrc.src import configuration, entity_cache
+from rptrc.src.entity_cache import POOL_BY_NAME, TEST_ENVIRONMENT_BY_ID, TEST_ENVIRONMENT_BY_NAME, EntityCache
+from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.operators.pools import Pools
+from rptrc.src.operators.requests import Requests
+from rptrc.src.operators.test_environments import TestEnvironments
+
+TEST_ENVIRONMENT = {'id': 'id1', 'name': 'env1', 'status': 'Standby', 'pools': ['pool1'],
+                    'properties': {'version': '1.0.0'}}
+
+
+class FakeClock:
+    """
+    A clock that only moves when told to
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestEntityCache:
+    """
+    Class to run unit tests for entity_cache.py
+    """
+
+    def test_entities_expire(self):
+        """
+        Tests that entities are served until their time to live passes, and missing entities until the
+        shorter negative time to live passes
+        """
+        clock = FakeClock()
+        cache = EntityCache(ttl=5, negative_ttl=2, clock=clock)
+        cache.store(TEST_ENVIRONMENT_BY_ID, 'id1', TEST_ENVIRONMENT)
+        cache.store_absent(TEST_ENVIRONMENT_BY_NAME, 'env2')
+        assert cache.look_up(TEST_ENVIRONMENT_BY_ID, 'id1') == (True, TEST_ENVIRONMENT)
+        assert cache.look_up(TEST_ENVIRONMENT_BY_NAME, 'env2') == (True, None)
+        assert cache.look_up(TEST_ENVIRONMENT_BY_NAME, 'env1') == (False, None)
+        clock.now += 2
+        assert cache.look_up(TEST_ENVIRONMENT_BY_NAME, 'env2') == (False, None)
+        clock.now += 3
+        assert cache.look_up(TEST_ENVIRONMENT_BY_ID, 'id1') == (False, None)
+        assert not cache
+
+    def test_least_recently_used_are_evicted(self):
+        """
+        Tests that the least recently used entity is evicted once the cache is full, and that cached
+        entities are copies
+        """
+        cache = EntityCache(max_entries=2)
+        cache.store(POOL_BY_NAME, 'pool1', {'poolName': 'pool1'})
+        cache.store(POOL_BY_NAME, 'pool2', {'poolName': 'pool2'})
+        _, pool = cache.look_up(POOL_BY_NAME, 'pool1')
+        pool['poolName'] = 'changed'
+        cache.store(POOL_BY_NAME, 'pool3', {'poolName': 'pool3'})
+        assert cache.look_up(POOL_BY_NAME, 'pool1') == (True, {'poolName': 'pool1'})
+        assert cache.look_up(POOL_BY_NAME, 'pool2') == (False, None)
+
+        cache.store(TEST_ENVIRONMENT_BY_ID, 'id1', TEST_ENVIRONMENT)
+        cache.clear(POOL_BY_NAME)
+        assert len(cache) == 1
+        assert cache.invalidate(TEST_ENVIRONMENT_BY_ID, 'id1') == TEST_ENVIRONMENT
+        assert cache.invalidate(TEST_ENVIRONMENT_BY_ID, 'id1') is None
+
+    def test_get_entity_cache(self, monkeypatch):
+        """
+        Tests that the entity cache is configured in application.ini and disabled by a time to live of 0
+        :param monkeypatch:
+        """
+        monkeypatch.setattr(configuration, '_CONFIG', configuration.FrozenApplicationConfig({
+            'RPTRC_PERFORMANCE_ENTITY_CACHE_SIZE': '10'}))
+        cache = entity_cache.get_entity_cache()
+        assert (cache.max_entries, cache.ttl, cache.negative_ttl) == (10, 5, 2)
+        assert entity_cache.get_entity_cache() is cache
+
+        monkeypatch.setattr(entity_cache, '_ENTITY_CACHE_LOADED', False)
+        monkeypatch.setattr(entity_cache, '_ENTITY_CACHE', None)
+        monkeypatch.setattr(configuration, '_CONFIG', configuration.FrozenApplicationConfig({
+            'RPTRC_PERFORMANCE_ENTITY_CACHE_TTL': '0'}))
+        assert entity_cache.get_entity_cache() is None
+
+    def test_operators_read_their_writes(self, monkeypatch):
+        """
+        Tests that a test environment returned by a PATCH is read back without a GET, and that it is
+        asked for again once a Request reserving it is recorded
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200, test_environment_name='env1')
+        monkeypatch.setattr(test_environment, 'mirror', None)
+        monkeypatch.setattr(test_environment, 'patch', mock.Mock(return_value=dict(TEST_ENVIRONMENT, stage='install')))
+        get = mock.Mock(return_value=[TEST_ENVIRONMENT])
+        monkeypatch.setattr(test_environment, 'get', get)
+
+        test_environment.update_test_environment_stage('install', 'id1')
+        assert test_environment.retrieve_test_environment_by_name()['stage'] == 'install'
+        assert test_environment.retrieve_test_environment_by_id('id1')['stage'] == 'install'
+        get.assert_not_called()
+
+        requests = Requests(dev_mode=True, retry_timeout=7200)
+        monkeypatch.setattr(requests, 'mirror', None)
+        monkeypatch.setattr(requests, 'get', mock.Mock(return_value=[
+            {'id': 'request1', 'status': 'Reserved', 'testEnvironmentId': 'id1'}]))
+        requests.get_request_with_id('request1')
+        assert test_environment.retrieve_test_environment_by_name()['status'] == 'Standby'
+        assert get.call_count == 1
+
+    def test_missing_entities_are_not_asked_for_again(self, monkeypatch):
+        """
+        Tests that a test environment or pool RPT does not hold is only asked for once
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200, test_environment_name='env2')
+        pool = Pools(dev_mode=True, retry_timeout=7200, pool_name='pool2')
+        get = mock.Mock(return_value=[])
+        for operator in (test_environment, pool):
+            monkeypatch.setattr(operator, 'mirror', None)
+            monkeypatch.setattr(operator, 'get', get)
+
+        for _ in range(2):
+            with pytest.raises(FatalException):
+                test_environment.retrieve_test_environment_by_name()
+            with pytest.raises(FatalException):
+                pool.retrieve_test_environments_by_pool('pool2')
+        assert get.call_count == 2
@@ -0,0 +1,106 @@
+"""
+Unit tests for fan_out.py
+"""
+import threading
+import time
+
+import pytest
+
+from rptrc.src.etc.fan_out import fan_out
+
+
+class TestFanOut:
+    """
+    Class to run unit tests for fan_out.py
+    """
+
+    def test_fan_out_preserves_order(self):
+        """
+        Tests that results are returned in the order of the items passed in
+        """
+        def operation(item):
+            """
+            Sleeps longer for earlier items so that they complete last
+            :param item:
+            :return: item doubled
+            :rtype: int
+            """
+            time.sleep((5 - item) * 0.01)
+            return item * 2
+
+        results = fan_out(operation, [1, 2, 3, 4], concurrency=4)
+        assert [result.item for result in results] == [1, 2, 3, 4]
+        assert [result.value for result in results] == [2, 4, 6, 8]
+
+    def test_fan_out_collects_failures(self):
+        """
+        Tests that a failing item does not stop the remaining items from running
+        """
+        def operation(item):
+            """
+            Fails for a single item
+            :param item:
+            :return: item
+            :rtype: str
+            """
+            if item == 'bad':
+                raise ValueError('bad item')
+            return item
+
+        results = fan_out(operation, ['good', 'bad', 'also_good'], concurrency=2)
+        assert [result.succeeded for result in results] == [True, False, True]
+        assert str(results[1].error) == 'bad item'
+
+    def test_fan_out_bounds_concurrency(self):
+        """
+        Tests that no more than the requested number of operations run at the same time
+        """
+        lock = threading.Lock()
+        in_flight = 0
+        max_in_flight = 0
+
+        def operation(item):
+            """
+            Records how many operations are running at once
+            :param item:
+            :return: item
+            :rtype: int
+            """
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+            return item
+
+        fan_out(operation, range(20), concurrency=3)
+        assert 1 < max_in_flight <= 3
+
+    def test_fan_out_serial(self):
+        """
+        Tests that a concurrency of one runs every item on the calling thread
+        """
+        calling_thread = threading.current_thread()
+        results = fan_out(lambda item: threading.current_thread(), ['a', 'b'], concurrency=1)
+        assert all(result.value is calling_thread for result in results)
+
+    def test_fan_out_timeout(self):
+        """
+        Tests that a single overall timeout is applied to all of the items
+        """
+        release = threading.Event()
+        with pytest.raises(Exception) as exception:
+            fan_out(lambda item: release.wait(1), range(4), concurrency=2, timeout=0.05)
+        release.set()
+        assert str(exception.value).startswith('Timed out after 0.05 seconds with')
+        assert str(exception.value).endswith('of 4 operations still outstanding')
+
+    def test_fan_out_serial_timeout(self):
+        """
+        Tests that the overall timeout is also applied when running on the calling thread
+        """
+        with pytest.raises(Exception) as exception:
+            fan_out(lambda item: time.sleep(0.03), range(4), concurrency=1, timeout=0.05)
+        assert str(exception.value) == 'Timed out after 0.05 seconds with 2 of 4 operations still outstanding'
@@ -0,0 +1,216 @@
+"""
+Unit tests for inventory.py
+"""
+from unittest import mock
+
+import pytest
+
+from rptrc.src.etc.exceptions import FatalException
+
+from rptrc.src.inventory import Inventory
+from rptrc.src.models import TestEnvironment
+from rptrc.src.operators.pools import Pools
+from rptrc.src.operators.test_environments import TestEnvironments
+
+TEST_ENVIRONMENTS = [
+    {'id': 'id1', 'name': 'env1', 'status': 'Standby', 'pools': ['pool1'], 'stage': 'start',
+     'properties': {'version': '1.0.0'}},
+    {'id': 'id2', 'name': 'env2', 'status': 'Available', 'pools': ['pool1', 'pool2'], 'stage': 'start',
+     'properties': {'version': '1.0.1'}},
+    {'id': 'id3', 'name': 'env3', 'status': 'Standby', 'pools': ['pool2'], 'stage': 'start',
+     'properties': {'version': '1.0.2'}},
+]
+POOLS = [
+    {'id': 'poolId1', 'poolName': 'pool1', 'assignedTestEnvironmentIds': ['id1', 'id2']},
+    {'id': 'poolId2', 'poolName': 'pool2', 'assignedTestEnvironmentIds': ['id2', 'id3']},
+]
+
+
+def ids(test_environments):
+    """
+    Returns the sorted ids of test environments
+    :param test_environments:
+    :return: ids
+    :rtype: list
+    """
+    return sorted(test_environment.id for test_environment in test_environments)
+
+
+class TestInventory:
+    """
+    Class to run unit tests for inventory.py
+    """
+
+    def test_lookups(self):
+        """
+        Tests that test environments are looked up by id, name, status and pool, and pools by name
+        """
+        inventory = Inventory(TEST_ENVIRONMENTS, POOLS)
+        assert len(inventory) == 3
+        assert inventory.test_environment_by_id('id2').name == 'env2'
+        assert inventory.test_environment_by_name('env3').id == 'id3'
+        assert inventory.test_environment_by_name('env4') is None
+        assert ids(inventory.test_environments_with_status('Standby')) == ['id1', 'id3']
+        assert ids(inventory.test_environments_with_status('Standby', 'pool2')) == ['id3']
+        assert ids(inventory.test_environments_in_pool('pool1')) == ['id1', 'id2']
+        assert inventory.test_environments_in_pool('pool3') == []
+        assert inventory.pool_by_name('pool2').test_environment_ids == ('id2', 'id3')
+
+    def test_record_test_environment_moves_it_between_indexes(self):
+        """
+        Tests that recording a changed test environment re-indexes it by its new name, status and pools
+        """
+        inventory = Inventory(TEST_ENVIRONMENTS)
+        changed = inventory.record_test_environment(
+            dict(TEST_ENVIRONMENTS[0], name='env1b', status='Available', pools=['pool2']))
+        assert changed
+        assert inventory.test_environment_by_name('env1') is None
+        assert inventory.test_environment_by_name('env1b').id == 'id1'
+        assert ids(inventory.test_environments_with_status('Standby')) == ['id3']
+        assert ids(inventory.test_environments_with_status('Available')) == ['id1', 'id2']
+        assert ids(inventory.test_environments_in_pool('pool1')) == ['id2']
+        assert ids(inventory.test_environments_in_pool('pool2')) == ['id1', 'id2', 'id3']
+        assert not inventory.record_test_environment(TestEnvironment.from_json(
+            dict(TEST_ENVIRONMENTS[0], name='env1b', status='Available', pools=['pool2'])))
+
+    def test_remove_test_environment(self):
+        """
+        Tests that removing a test environment drops it from every index
+        """
+        inventory = Inventory(TEST_ENVIRONMENTS)
+        assert inventory.remove_test_environment('id2').name == 'env2'
+        assert inventory.remove_test_environment('id2') is None
+        assert inventory.remove_test_environment('id3').name == 'env3'
+        assert len(inventory) == 1
+        assert inventory.test_environment_by_name('env2') is None
+        assert inventory.test_environments_with_status('Available') == []
+        assert ids(inventory.test_environments_in_pool('pool1')) == ['id1']
+        assert inventory.test_environments_in_pool('pool2') == []
+
+    def test_refresh_applies_only_changes(self):
+        """
+        Tests that refreshing from RPT adds, changes and removes only the test environments and pools that
+        differ, and counts them
+        """
+        test_environments_operator = mock.Mock()
+        test_environments_operator.retrieve_all_test_environments.return_value = TEST_ENVIRONMENTS
+        pools_operator = mock.Mock()
+        pools_operator.retrieve_all_pools.return_value = POOLS
+        inventory = Inventory.load(test_environments_operator, pools_operator)
+        assert len(inventory) == 3
+
+        test_environments_operator.retrieve_all_test_environments.return_value = [
+            TEST_ENVIRONMENTS[0], dict(TEST_ENVIRONMENTS[1], status='Reserved'),
+            {'id': 'id4', 'name': 'env4', 'status': 'Standby', 'pools': ['pool1']}]
+        pools_operator.retrieve_all_pools.return_value = POOLS[:1]
+        assert inventory.refresh(test_environments_operator, pools_operator) == 4
+        assert inventory.test_environment_by_id('id3') is None
+        assert inventory.pool_by_name('pool2') is None
+        assert ids(inventory.test_environments_with_status('Standby', 'pool1')) == ['id1', 'id4']
+        assert ids(inventory.test_environments_with_status('Reserved')) == ['id2']
+
+    def test_freshest_standby_test_environment(self):
+        """
+        Tests that the freshest standby test environment of a pool follows test environments as they are
+        recorded, change version or status and are removed
+        """
+        inventory = Inventory(TEST_ENVIRONMENTS)
+        assert inventory.freshest_standby_test_environment('pool1').id == 'id1'
+        assert inventory.freshest_standby_test_environment('pool1', {'id1'}) is None
+        assert inventory.freshest_standby_test_environment('pool3') is None
+
+        inventory.record_test_environment(dict(TEST_ENVIRONMENTS[1], status='Standby'))
+        assert inventory.freshest_standby_test_environment('pool1').id == 'id2'
+        assert inventory.freshest_standby_test_environment('pool2').id == 'id3'
+        inventory.record_test_environment(dict(TEST_ENVIRONMENTS[1], status='Standby',
+                                               properties={'version': '1.0.10'}))
+        assert inventory.freshest_standby_test_environment('pool2').id == 'id2'
+        assert inventory.freshest_standby_test_environment('pool2', {'id2'}).id == 'id3'
+        inventory.record_test_environment(dict(TEST_ENVIRONMENTS[0], properties={'version': '1.1.0'}))
+        assert inventory.freshest_standby_test_environment('pool1').id == 'id1'
+
+        inventory.record_test_environment(dict(TEST_ENVIRONMENTS[0], status='Available'))
+        inventory.remove_test_environment('id2')
+        assert inventory.freshest_standby_test_environment('pool1') is None
+        assert inventory.freshest_standby_test_environment('pool2').id == 'id3'
+
+    def test_operator_confirms_the_freshest_standby_test_environment(self, monkeypatch):
+        """
+        Tests that the freshest standby test environment of a pool is confirmed with RPT, moving on to the
+        next freshest when RPT reports the candidate is no longer standby
+        :param monkeypatch:
+        """
+        inventory = Inventory(TEST_ENVIRONMENTS + [dict(TEST_ENVIRONMENTS[2], id='id4', name='env4',
+                                                        properties={'version': '1.0.3'})])
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200, inventory=inventory)
+        monkeypatch.setattr(test_environment, 'mirror', None)
+        responses = {'id4': dict(TEST_ENVIRONMENTS[2], id='id4', name='env4', status='Reserved'),
+                     'id3': TEST_ENVIRONMENTS[2]}
+        get = mock.Mock(side_effect=lambda url: [responses[url.rsplit('/', 1)[1]]])
+        monkeypatch.setattr(test_environment, 'get', get)
+
+        assert test_environment.retrieve_freshest_standby_test_environment_in_pool('pool2')['name'] == 'env3'
+        assert get.call_count == 2
+        assert inventory.test_environment_by_id('id4').status == 'Reserved'
+
+        responses['id3'] = dict(TEST_ENVIRONMENTS[2], pools=['pool1'])
+        with pytest.raises(FatalException) as exception:
+            test_environment.retrieve_freshest_standby_test_environment_in_pool('pool2')
+        assert str(exception.value) == 'There are no test environments with status "Standby"!'
+
+    def test_operators_answer_lookups_from_the_inventory(self, monkeypatch):
+        """
+        Tests that operators sharing an inventory only ask RPT for a test environment or pool once, and
+        record the test environments they update, forgetting the pools a test environment left or joined
+        :param monkeypatch:
+        """
+        inventory = Inventory()
+        gets = []
+
+        def get(url):
+            gets.append(url)
+            if '/pools/' in url:
+                return POOLS[:1]
+            return TEST_ENVIRONMENTS[:1]
+
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200, test_environment_name='env1',
+                                            inventory=inventory)
+        pool = Pools(dev_mode=True, retry_timeout=7200, pool_name='pool1', inventory=inventory)
+        monkeypatch.setattr(test_environment, 'get', get)
+        monkeypatch.setattr(pool, 'get', get)
+        monkeypatch.setattr(test_environment, 'patch',
+                            lambda url, body: dict(TEST_ENVIRONMENTS[0], pools=['pool2']))
+
+        assert test_environment.retrieve_test_environment_by_name()['id'] == 'id1'
+        assert test_environment.retrieve_test_environment_by_id('id1')['name'] == 'env1'
+        test_environment.update_test_environment_pool(['pool2'])
+        assert pool.retrieve_test_environments_by_pool('pool1') == ['id1', 'id2']
+        assert pool.retrieve_test_environments_by_pool('pool1') == ['id1', 'id2']
+        assert len(gets) == 2
+        assert test_environment.retrieve_test_environment_by_name()['pools'] == ['pool2']
+
+        inventory.record_pool(POOLS[1])
+        inventory.record_pool({'id': 'poolId3', 'poolName': 'pool3', 'assignedTestEnvironmentIds': []})
+        test_environment.update_test_environment_pool(['pool2'])
+        assert [inventory.pool_by_name(pool_name) is None for pool_name in ('pool1', 'pool2', 'pool3')] \
+            == [True, True, False]
+        assert pool.retrieve_test_environments_by_pool('pool1') == ['id1', 'id2']
+        assert len(gets) == 3
+
+    def test_pool_lookup_with_refresh_asks_rpt(self, monkeypatch):
+        """
+        Tests that a pool lookup passing refresh asks RPT for the pool even though the inventory holds it,
+        and records the membership RPT reports
+        :param monkeypatch:
+        """
+        inventory = Inventory()
+        inventory.record_pool(POOLS[0])
+        pool = Pools(dev_mode=True, retry_timeout=7200, pool_name='pool1', inventory=inventory)
+        get = mock.MagicMock(return_value=[dict(POOLS[0], assignedTestEnvironmentIds=['id2'])])
+        monkeypatch.setattr(pool, 'get', get)
+
+        assert pool.retrieve_test_environments_by_pool('pool1') == ['id1', 'id2']
+        assert get.call_count == 0
+        assert pool.retrieve_test_environments_by_pool('pool1', refresh=True) == ['id2']
+        assert get.call_count == 1
+        assert pool.retrieve_test_environments_by_pool('pool1') == ['id2']
@@ -0,0 +1,206 @@
+"""
+Unit tests for mirror.py
+"""
+from unittest import mock
+
+import pytest
+
+from rptrc.src import configuration, mirror
+from rptrc.src.mirror import Mirror
+from rptrc.src.operators.requests import Requests
+from rptrc.src.operators.test_environments import TestEnvironments
+
+TEST_ENVIRONMENT = {
+    'id': 'id1',
+    'name': 'env1',
+    'status': 'Standby',
+    'pools': ['pool1', 'pool2'],
+    'stage': 'start',
+    'properties': {'version': '1.0.0'},
+    'modifiedOn': 'Wed, 30 Jun 2021 15:59:25 GMT',
+}
+POOL = {'id': 'poolId1', 'poolName': 'pool1', 'assignedTestEnvironmentIds': ['id1', 'id2']}
+
+
+class FakeClock:
+    """
+    A clock that only moves when told to
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(name='clock')
+def fixture_clock():
+    """
+    Provides a clock that only moves when told to
+    :return: clock
+    :rtype: FakeClock
+    """
+    return FakeClock()
+
+
+@pytest.fixture(name='local_mirror')
+def fixture_local_mirror(tmp_path, clock):
+    """
+    Provides a mirror in a temporary directory with a staleness bound of 30 seconds
+    :param tmp_path:
+    :param clock:
+    :return: mirror
+    :rtype: Mirror
+    """
+    local_mirror = Mirror(str(tmp_path / 'state' / 'mirror.sqlite'), max_staleness=30, clock=clock)
+    yield local_mirror
+    local_mirror.close()
+
+
+class TestMirror:
+    """
+    Class to run unit tests for mirror.py
+    """
+
+    def test_test_environments_are_served_while_fresh(self, local_mirror, clock):
+        """
+        Tests that mirrored test environments are looked up by id and name until they are older than the
+        staleness bound
+        :param local_mirror:
+        :param clock:
+        """
+        local_mirror.record_test_environments([TEST_ENVIRONMENT])
+        clock.now += 30
+        test_environment = local_mirror.test_environment_by_name('env1')
+        assert test_environment.to_json() == {'id': 'id1', 'name': 'env1', 'status': 'Standby',
+                                              'pools': ['pool1', 'pool2'], 'stage': 'start',
+                                              'properties': {'version': '1.0.0'}}
+        assert local_mirror.test_environment_by_id('id1').name == 'env1'
+        clock.now += 1
+        assert local_mirror.test_environment_by_name('env1') is None
+        assert local_mirror.test_environment_by_id('id1') is None
+
+    def test_unmodified_test_environment_is_only_marked_fresh(self, local_mirror, clock):
+        """
+        Tests that recording a test environment identical to the one mirrored only marks its row fresh,
+        while a change rewrites the row even when RPT stamped it with the same watermark
+        :param local_mirror:
+        :param clock:
+        """
+        local_mirror.record_test_environments([TEST_ENVIRONMENT])
+        clock.now += 60
+        with mock.patch.object(local_mirror, '__write__', wraps=local_mirror.__write__) as write:
+            local_mirror.record_test_environments([dict(TEST_ENVIRONMENT)])
+        assert [sql for sql, _ in write.call_args.args[0]] \
+            == ['UPDATE test_environments SET mirrored_at = ? WHERE id = ?']
+        assert local_mirror.test_environment_by_id('id1').status == 'Standby'
+
+        local_mirror.record_test_environments([dict(TEST_ENVIRONMENT, pools=['pool1'])])
+        local_mirror.record_test_environments([dict(TEST_ENVIRONMENT, status='Available', pools=['pool3'])])
+        test_environment = local_mirror.test_environment_by_id('id1')
+        assert (test_environment.status, test_environment.pools) == ('Available', ('pool3',))
+
+    def test_duplicate_names_are_not_answered(self, local_mirror):
+        """
+        Tests that a name held by more than one test environment is left for RPT to answer
+        :param local_mirror:
+        """
+        local_mirror.record_test_environments([TEST_ENVIRONMENT, dict(TEST_ENVIRONMENT, id='id2')])
+        assert local_mirror.test_environment_by_name('env1') is None
+
+    def test_pools_and_requests(self, local_mirror):
+        """
+        Tests that pools are looked up by name and forgotten once the pools of a test environment
+        changed, and that active Requests are looked up by idempotency key
+        :param local_mirror:
+        """
+        local_mirror.record_pool(POOL)
+        local_mirror.record_pool({'assignedTestEnvironmentIds': []})
+        assert local_mirror.pool_by_name('pool1').test_environment_ids == ('id1', 'id2')
+        assert local_mirror.pool_by_name('pool2') is None
+
+        local_mirror.record_pool({'id': 'poolId2', 'poolName': 'pool2', 'assignedTestEnvironmentIds': ['id2']})
+        local_mirror.record_pool({'id': 'poolId3', 'poolName': 'pool3', 'assignedTestEnvironmentIds': ['id11']})
+        local_mirror.forget_pools(['pool2'], 'id1')
+        assert [local_mirror.pool_by_name(pool_name) is None for pool_name in ('pool1', 'pool2', 'pool3')] \
+            == [True, True, False]
+
+        local_mirror.record_request({'id': 'request1', 'status': 'Queued', 'idempotencyKey': 'key1'})
+        assert local_mirror.request_by_idempotency_key('key1', ('Queued', 'Reserved')).id == 'request1'
+        local_mirror.record_request({'id': 'request1', 'status': 'Aborted', 'idempotencyKey': 'key1'})
+        assert local_mirror.request_by_idempotency_key('key1', ('Queued', 'Reserved')) is None
+
+    def test_refresh_and_load_inventory(self, local_mirror, clock):
+        """
+        Tests that a refresh deletes the rows of entities RPT no longer has, leaving the mirror complete
+        until the staleness bound passes, and that an inventory is loaded from the fresh rows
+        :param local_mirror:
+        :param clock:
+        """
+        local_mirror.record_test_environments([dict(TEST_ENVIRONMENT, id='id3', name='env3')])
+        local_mirror.record_pool(dict(POOL, poolName='pool3'))
+        clock.now += 1
+        test_environments_operator = mock.Mock()
+        test_environments_operator.retrieve_all_test_environments.return_value = [
+            TEST_ENVIRONMENT, dict(TEST_ENVIRONMENT, id='id2', name='env2', status='Available', pools=['pool1'])]
+        pools_operator = mock.Mock()
+        pools_operator.retrieve_all_pools.return_value = [POOL]
+        assert not local_mirror.is_complete()
+        local_mirror.refresh(test_environments_operator, pools_operator)
+        assert local_mirror.is_complete()
+
+        inventory = local_mirror.load_inventory()
+        assert len(inventory) == 2
+        assert inventory.test_environment_by_name('env3') is None
+        assert inventory.pool_by_name('pool3') is None
+        assert sorted(test_environment.id for test_environment in inventory.test_environments_in_pool('pool1')) == [
+            'id1', 'id2']
+        assert inventory.test_environment_by_id('id1').version == '1.0.0'
+        clock.now += 31
+        assert not local_mirror.is_complete()
+
+    def test_get_mirror(self, monkeypatch, tmp_path):
+        """
+        Tests that the mirror is only used once enabled in application.ini
+        :param monkeypatch:
+        :param tmp_path:
+        """
+        monkeypatch.setattr(mirror, '_MIRROR_LOADED', False)
+        monkeypatch.setattr(mirror, '_MIRROR', None)
+        monkeypatch.setattr(configuration, '_CONFIG', configuration.FrozenApplicationConfig({}))
+        assert mirror.get_mirror() is None
+
+        monkeypatch.setattr(mirror, '_MIRROR_LOADED', False)
+        monkeypatch.setattr(configuration, '_CONFIG', configuration.FrozenApplicationConfig({
+            'RPTRC_MIRROR_ENABLED': 'true',
+            'RPTRC_MIRROR_PATH': str(tmp_path / 'mirror.sqlite'),
+            'RPTRC_MIRROR_MAX_STALENESS': '5',
+        }))
+        enabled_mirror = mirror.get_mirror()
+        assert (enabled_mirror.path, enabled_mirror.max_staleness) == (str(tmp_path / 'mirror.sqlite'), 5)
+        assert mirror.get_mirror() is enabled_mirror
+        enabled_mirror.close()
+
+    def test_operators_read_from_the_mirror(self, monkeypatch, local_mirror):
+        """
+        Tests that operators answer lookups from the mirror without a request to RPT and mirror what
+        they retrieve
+        :param monkeypatch:
+        :param local_mirror:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200, test_environment_name='env1')
+        monkeypatch.setattr(test_environment, 'mirror', local_mirror)
+        get = mock.Mock(return_value=[TEST_ENVIRONMENT])
+        monkeypatch.setattr(test_environment, 'get', get)
+        assert test_environment.retrieve_test_environment_by_name()['id'] == 'id1'
+        assert test_environment.retrieve_test_environment_by_name()['properties'] == {'version': '1.0.0'}
+        assert test_environment.retrieve_test_environment_by_id('id1')['name'] == 'env1'
+        assert get.call_count == 1
+
+        requests = Requests(dev_mode=True, retry_timeout=7200)
+        monkeypatch.setattr(requests, 'mirror', local_mirror)
+        local_mirror.record_request({'id': 'request1', 'status': 'Reserved', 'idempotencyKey': 'key1'})
+        get = mock.Mock()
+        monkeypatch.setattr(requests, 'get', get)
+        assert requests.find_request_by_idempotency_key('key1')['id'] == 'request1'
+        get.assert_not_called()
@@ -0,0 +1,67 @@
+"""
+Unit tests for models.py
+"""
+import json
+
+import pytest
+
+from rptrc.src.models import Pool, QueuedRequest, TestEnvironment
+
+TEST_ENVIRONMENT_DOCUMENT = {
+    'id': 'ckuctyf5j00000ppcdfd16196',
+    'requestId': '9876asrb12',
+    'name': 'validTestEnvironment',
+    'status': 'Standby',
+    'pools': ['validPool'],
+    'properties': {'version': '1.0.0', 'ccdVersion': '1.0.0'},
+    'stage': 'start',
+    'additionalInfo': '',
+}
+
+
+class TestModels:
+    """
+    Class to run unit tests for models.py
+    """
+
+    def test_test_environment_from_json(self):
+        """
+        Tests that a test environment keeps only the fields RPT-RC uses
+        """
+        test_environment = TestEnvironment.from_json(TEST_ENVIRONMENT_DOCUMENT)
+        assert (test_environment.id, test_environment.name, test_environment.status) == \
+            ('ckuctyf5j00000ppcdfd16196', 'validTestEnvironment', 'Standby')
+        assert test_environment.pools == ('validPool',)
+        assert test_environment.stage == 'start'
+        assert test_environment.version == '1.0.0'
+        with pytest.raises(AttributeError):
+            setattr(test_environment, 'requestId', '9876asrb12')
+
+    def test_test_environment_properties_decoded_on_first_access(self):
+        """
+        Tests that properties kept as JSON text are decoded once, when first accessed
+        """
+        test_environment = TestEnvironment('id1', properties=json.dumps({'version': '2.0.0'}))
+        assert isinstance(test_environment._TestEnvironment__properties, str)  # pylint: disable=protected-access
+        properties = test_environment.properties
+        assert properties == {'version': '2.0.0'}
+        assert test_environment.properties is properties
+        assert TestEnvironment('id2').version is None
+
+    def test_pool_from_json(self):
+        """
+        Tests that a pool keeps its id, name and assigned test environments
+        """
+        pool = Pool.from_json({'id': 'pool1', 'poolName': 'testPool', 'assignedTestEnvironmentIds': ['env1', 'env2'],
+                               'createdOn': 'Mon, 04 Oct 2021 15:51:00 GMT'})
+        assert (pool.id, pool.name, pool.test_environment_ids) == ('pool1', 'testPool', ('env1', 'env2'))
+
+    def test_queued_request_from_json(self):
+        """
+        Tests that a Request keeps its id, status, pool, idempotency key and test environment
+        """
+        request = QueuedRequest.from_json({'id': 'req1', 'status': 'Reserved', 'poolName': 'testPool',
+                                           'idempotencyKey': 'key', 'testEnvironmentId': 'env1',
+                                           'requestorDetails': {'name': 'Spinnaker'}})
+        assert (request.id, request.status, request.pool_name, request.idempotency_key, request.test_environment_id) \
+            == ('req1', 'Reserved', 'testPool', 'key', 'env1')
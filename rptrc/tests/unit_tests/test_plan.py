@@ -0,0 +1,108 @@
+"""
+Unit tests for plan.py
+"""
+import json
+
+import click
+import pytest
+
+from rptrc.src import plan
+from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.operators.artifact_properties import ArtifactProperties, capture_artifacts
+
+IN_FILE = '/usr/src/app/in/artifact.properties'
+OUT_FILE = '/usr/src/app/out/artifact.properties'
+
+
+@click.group()
+def stand_in_cli():
+    """
+    A small CLI standing in for the commands of RPT-RC
+    """
+
+
+@stand_in_cli.command()
+def reserve():
+    """
+    Generates the artifact properties of a reserved test environment
+    """
+    ArtifactProperties({'REQUEST_ID': '1234'}).generate()
+    ArtifactProperties({'RESOURCE_NAME': 'env1'}, mode='a').generate()
+
+
+@stand_in_cli.command()
+@click.option('-t', '--test_environment_name')
+def describe(test_environment_name):
+    """
+    Generates artifact properties from its arguments and the artifact properties passed in
+    :param test_environment_name:
+    """
+    request_id = ArtifactProperties().read()['REQUEST_ID']
+    ArtifactProperties({'DESCRIPTION': f'{test_environment_name} reserved by {request_id}'}).generate()
+
+
+@stand_in_cli.command()
+def fail():
+    """
+    Fails the way RPT-RC commands do
+    """
+    raise FatalException('No Request entity with ID 1234 was found in RPT')
+
+
+class TestPlan:
+    """
+    Class to run unit tests for plan.py
+    """
+
+    def test_run_plan_passes_artifact_properties_between_steps(self):
+        """
+        Tests that steps read and reference the artifact properties of earlier steps and that the
+        properties generated by every step are written once at the end
+        """
+        steps = [('reserve', []), ('describe', ['-t', '${RESOURCE_NAME}'])]
+        with capture_artifacts({IN_FILE: 'POOL=pool1\n'}) as capture:
+            generated = plan.run_plan(stand_in_cli, steps)
+        assert generated == {'REQUEST_ID': '1234', 'RESOURCE_NAME': 'env1', 'DESCRIPTION': 'env1 reserved by 1234'}
+        assert capture.written_files() == {
+            OUT_FILE: 'REQUEST_ID=1234\nRESOURCE_NAME=env1\nDESCRIPTION=env1 reserved by 1234\n'
+        }
+
+    def test_run_plan_stops_at_failing_step(self):
+        """
+        Tests that a failing step stops the plan without writing any artifact properties
+        """
+        with capture_artifacts() as capture:
+            with pytest.raises(FatalException) as exception:
+                plan.run_plan(stand_in_cli, [('reserve', []), ('fail', []), ('reserve', [])])
+        assert str(exception.value) == 'Step 2 (fail) of the plan failed with exit code 1'
+        assert capture.written_files() == {}
+
+    def test_run_plan_unknown_reference(self):
+        """
+        Tests that referencing an artifact property no earlier step generated fails before running the step
+        """
+        with capture_artifacts():
+            with pytest.raises(FatalException) as exception:
+                plan.run_plan(stand_in_cli, [('describe', ['-t', '${RESOURCE_NAME}'])])
+        assert str(exception.value) == ("Step 1 (describe) of the plan references an artifact property no "
+                                        "earlier step generated: 'RESOURCE_NAME'")
+
+    def test_load_plan(self, tmp_path):
+        """
+        Tests that a plan is loaded as its steps and that invalid plans are rejected
+        :param tmp_path:
+        """
+        plan_file = tmp_path / 'plan.json'
+        plan_file.write_text(json.dumps({'steps': [{'command': 'reserve'},
+                                                   {'command': 'describe', 'args': ['-t', 'env1']}]}))
+        assert plan.load_plan(str(plan_file)) == [('reserve', []), ('describe', ['-t', 'env1'])]
+
+        plan_file.write_text(json.dumps({'steps': [{'args': ['-t', 'env1']}]}))
+        with pytest.raises(FatalException) as exception:
+            plan.load_plan(str(plan_file))
+        assert str(exception.value) == f"Invalid plan {plan_file}: KeyError('command')"
+
+        plan_file.write_text(json.dumps({'steps': [{'command': 'run_plan', 'args': [str(plan_file)]}]}))
+        with pytest.raises(FatalException) as exception:
+            plan.load_plan(str(plan_file))
+        assert str(exception.value) == f'Invalid plan {plan_file}: run_plan cannot be run as a step of a plan'
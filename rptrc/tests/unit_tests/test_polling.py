@@ -0,0 +1,53 @@
+"""
+Unit tests for polling.py
+"""
+import pytest
+
+from rptrc.src.etc import polling
+from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.etc.polling import PollingStrategy
+
+
+class TestPolling:
+    """
+    Class to run unit tests for polling.py
+    """
+
+    def test_next_interval_grows_geometrically_up_to_maximum(self):
+        """
+        Tests that without jitter the interval grows by the multiplier and is capped at the maximum
+        """
+        strategy = PollingStrategy(min_interval=2, max_interval=10, multiplier=2, jitter=0)
+        assert [strategy.next_interval(polls) for polls in range(1, 6)] == [2, 4, 8, 10, 10]
+
+    def test_next_interval_jitter_stays_within_bounds(self):
+        """
+        Tests that jittered intervals vary around the backoff and never exceed the maximum
+        """
+        strategy = PollingStrategy(min_interval=2, max_interval=10, multiplier=2, jitter=0.5)
+        first_intervals = {strategy.next_interval(1) for _ in range(50)}
+        assert all(1 <= interval <= 3 for interval in first_intervals)
+        assert len(first_intervals) > 1
+        assert all(5 <= strategy.next_interval(10) <= 10 for _ in range(50))
+
+    @pytest.mark.parametrize('min_interval, max_interval', [(0, 10), (-1, 10), (10, 5)])
+    def test_invalid_intervals(self, min_interval, max_interval):
+        """
+        Tests that a non-positive minimum or a maximum below the minimum is rejected
+        :param min_interval:
+        :param max_interval:
+        """
+        with pytest.raises(FatalException):
+            PollingStrategy(min_interval=min_interval, max_interval=max_interval)
+
+    def test_get_polling_strategy_uses_config_and_overrides(self):
+        """
+        Tests that the configured intervals are used unless overridden, and that a configured maximum
+        below an overridden minimum is raised to it
+        """
+        configured = polling.get_polling_strategy()
+        assert (configured.min_interval, configured.max_interval) == (2, 30)
+        overridden = polling.get_polling_strategy(min_interval=0.5, max_interval=5)
+        assert (overridden.min_interval, overridden.max_interval) == (0.5, 5)
+        raised = polling.get_polling_strategy(min_interval=60)
+        assert (raised.min_interval, raised.max_interval) == (60, 60)
@@ -0,0 +1,129 @@
+"""
+Unit tests for query.py
+"""
+from unittest import mock
+
+import pytest
+
+from rptrc.src import query
+from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.inventory import Inventory
+
+TEST_ENVIRONMENTS = [
+    {'id': 'id1', 'name': 'env1', 'status': 'Standby', 'pools': ['product-staging'], 'stage': 'start',
+     'properties': {'version': '1.2.2', 'ccdVersion': '2.0.0'}},
+    {'id': 'id2', 'name': 'env2', 'status': 'Standby', 'pools': ['product-staging', 'other'], 'stage': 'install',
+     'properties': {'version': '1.10.0'}},
+    {'id': 'id3', 'name': 'env3', 'status': 'Available', 'pools': ['product-staging'], 'stage': 'start',
+     'properties': {'version': '1.0.0'}},
+    {'id': 'id4', 'name': 'env 4', 'status': 'Standby', 'pools': ['other'], 'stage': 'start',
+     'properties': {'version': '1.1.0'}},
+]
+
+
+def names(test_environments):
+    """
+    Returns the names of test environments
+    :param test_environments:
+    :return: names
+    :rtype: list
+    """
+    return [test_environment.name for test_environment in test_environments]
+
+
+class TestQuery:
+    """
+    Class to run unit tests for query.py
+    """
+
+    def test_parse_query(self):
+        """
+        Tests that filter expressions are parsed into their conditions
+        """
+        assert query.parse_query('status=Standby and pool=product-staging and version<1.2.3') == [
+            ('status', '=', 'Standby'), ('pool', '=', 'product-staging'), ('version', '<', '1.2.3')]
+        assert query.parse_query('name = "env 4" AND properties.ccdVersion!=2.0.0') == [
+            ('name', '=', 'env 4'), ('properties.ccdVersion', '!=', '2.0.0')]
+        assert not query.parse_query('')
+
+    @pytest.mark.parametrize('expression, message', [
+        ('status', '"status" is not a condition such as status=Standby'),
+        ('status=Standby and', '"" is not a condition such as status=Standby'),
+        ('colour=blue', 'unknown field "colour". Fields are id, name, status, pool, stage, version and '
+                        'properties.<key>'),
+        ('name>env1', 'name can only be compared with = or !='),
+        ('name="env1', 'No closing quotation'),
+    ])
+    def test_parse_invalid_query(self, expression, message):
+        """
+        Tests that invalid filter expressions are rejected
+        :param expression:
+        :param message:
+        """
+        with pytest.raises(FatalException) as exception:
+            query.parse_query(expression)
+        assert str(exception.value) == f'Invalid query: {message}'
+
+    def test_run_query(self):
+        """
+        Tests that test environments are filtered on every condition, comparing versions by their numeric
+        parts, and sorted
+        """
+        inventory = Inventory(TEST_ENVIRONMENTS)
+        assert names(query.run_query(inventory, query.parse_query(
+            'status=Standby and pool=product-staging and version<1.2.3'))) == ['env1']
+        assert names(query.run_query(inventory, query.parse_query('version>=1.2.0'))) == ['env1', 'env2']
+        assert names(query.run_query(inventory, query.parse_query('pool!=other and stage=start'))) == [
+            'env1', 'env3']
+        assert names(query.run_query(inventory, query.parse_query('properties.ccdVersion=2.0.0'))) == ['env1']
+        assert names(query.run_query(inventory, [], 'version', descending=True)) == [
+            'env2', 'env1', 'env 4', 'env3']
+        assert not query.run_query(inventory, query.parse_query('name=env5'))
+
+    def test_run_query_uses_indexes(self):
+        """
+        Tests that equality conditions on indexed fields are answered from the indexes without listing
+        every test environment
+        """
+        inventory = mock.Mock(wraps=Inventory(TEST_ENVIRONMENTS))
+        inventory.__len__ = mock.Mock(return_value=len(TEST_ENVIRONMENTS))
+        selected = query.run_query(inventory, query.parse_query('status=Standby and pool=other and version>1.0.0'))
+        assert names(selected) == ['env 4', 'env2']
+        inventory.test_environments.assert_not_called()
+        inventory.test_environments_with_status.assert_called_once_with('Standby')
+        inventory.test_environments_in_pool.assert_called_once_with('other')
+
+    def test_project_and_format_rows(self):
+        """
+        Tests that the fields asked for are output as newline delimited JSON or a table
+        """
+        test_environments = query.run_query(Inventory(TEST_ENVIRONMENTS), query.parse_query('stage=start'))
+        fields = query.parse_fields('name, pools,properties.ccdVersion')
+        rows = query.project(test_environments, fields)
+        assert query.format_rows(rows, fields, 'ndjson')[0] == (
+            '{"name": "env 4", "pools": ["other"], "properties.ccdVersion": null}')
+        assert query.format_rows(rows, fields, 'table') == [
+            'name  pools           properties.ccdVersion',
+            'env 4 other',
+            'env1  product-staging 2.0.0',
+            'env3  product-staging',
+        ]
+        with pytest.raises(FatalException):
+            query.parse_fields('name,pool')
+
+    def test_load_inventory(self):
+        """
+        Tests that the inventory is loaded from the mirror, refreshing it first unless it is complete,
+        and from RPT when there is no mirror
+        """
+        test_environments_operator = mock.Mock()
+        test_environments_operator.retrieve_all_test_environments.return_value = TEST_ENVIRONMENTS
+        assert len(query.load_inventory(test_environments_operator)) == 4
+
+        local_mirror = mock.Mock()
+        local_mirror.is_complete.return_value = True
+        assert query.load_inventory(test_environments_operator, local_mirror) is local_mirror.load_inventory()
+        local_mirror.refresh.assert_not_called()
+        local_mirror.is_complete.return_value = False
+        query.load_inventory(test_environments_operator, local_mirror)
+        local_mirror.refresh.assert_called_once_with(test_environments_operator)
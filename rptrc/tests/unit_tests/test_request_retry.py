@@ -1,11 +1,15 @@
 """
 Unit tests for request_retry.py
 """
+from unittest import mock
+
 import pytest
 import requests
 
 from rptrc.src import configuration
-from rptrc.src.etc import request_retry
+from rptrc.src.etc import request_retry, retry_policy, transport
+from rptrc.src.etc.deadline import Deadline
+from rptrc.src.etc.exceptions import DeadlineExceededException, NonRetryableRequestException, RetriesExhaustedException
 from rptrc.tests.unit_tests.mock_response import MockResponse
 
 CONSTANTS = configuration.ApplicationConfig()
@@ -31,7 +35,7 @@ class TestRequestRetry:
             """
             raise requests.exceptions.ProxyError
 
-        monkeypatch.setattr(requests, "get", get_request_mock)
+        monkeypatch.setattr(transport.get_session('some_url'), "get", get_request_mock)
         actual_response = request_retry.make_request_based_on_input('GET', 'some_url', 1, None, False)
         assert actual_response is None
 
@@ -67,7 +71,7 @@ class TestRequestRetry:
 
         request_types = ['GET', 'PATCH', 'PUT', 'POST', 'DELETE']
         for request_type in request_types:
-            monkeypatch.setattr(requests, request_type.lower(), request_mock)
+            monkeypatch.setattr(transport.get_session('some_url'), request_type.lower(), request_mock)
             actual_response = request_retry.make_request_based_on_input(request_type, 'some_url', 1, None, False)
             assert actual_response.content == valid_content
 
@@ -90,7 +94,7 @@ class TestRequestRetry:
 
         request_types = ['GET', 'PATCH', 'PUT', 'POST', 'DELETE']
         for request_type in request_types:
-            monkeypatch.setattr(requests, request_type.lower(), request_mock)
+            monkeypatch.setattr(transport.get_session('some_url'), request_type.lower(), request_mock)
             actual_response = request_retry\
                 .make_request_based_on_input(request_type, 'some_url', 1, None, False)
             assert actual_response.status_code == 500
@@ -164,3 +168,186 @@ class TestRequestRetry:
             expected_exception_value = 'Bad request detected. It is possible you may be missing ' \
                                        'required information in your request. Please see above.'
             assert str(exception.value) == expected_exception_value
+
+    def test_request_retry_sleeps_according_to_policy(self, monkeypatch):
+        """
+        Tests that the delay between attempts comes from the retry policy and honours Retry-After
+        :param monkeypatch:
+        """
+        responses = [MockResponse('', 503), MockResponse('', 503), MockResponse('{}', 200)]
+        responses[1].headers = {'Retry-After': '7'}
+        slept = []
+
+        # pylint: disable=unused-argument
+        def request_mock(*args):
+            """
+            A mock for a request that succeeds on the third attempt
+            :param args:
+            :return: Mock Response
+            :rtype: MockResponse
+            """
+            return responses.pop(0)
+
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', request_mock)
+        monkeypatch.setattr(request_retry, 'sleep', slept.append)
+        actual_response = request_retry.request_retry('GET', 'some_url', 60,
+                                                      retry_policy=retry_policy.ExponentialBackoff(2, 60))
+        assert actual_response.status_code == 200
+        assert slept == [2, 7]
+
+    def test_request_retry_stops_when_retry_timeout_spent(self, monkeypatch):
+        """
+        Tests that retries stop once the total time slept reaches the retry timeout
+        :param monkeypatch:
+        """
+        slept = []
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', lambda *args: MockResponse('', 503))
+        monkeypatch.setattr(request_retry, 'sleep', slept.append)
+        with pytest.raises(Exception) as exception:
+            request_retry.request_retry('PUT', 'some_url', 20, retry_policy=retry_policy.ExponentialBackoff(4, 60))
+        assert slept == [4, 8, 8]
+        assert str(exception.value) == 'Failed to execute PUT request after 4 tries.'
+        assert isinstance(exception.value, RetriesExhaustedException)
+        assert exception.value.status_code == 503
+        assert exception.value.attempts == 4
+
+    def test_request_retry_fails_fast_on_non_retryable_status(self, monkeypatch):
+        """
+        Tests that a non-retryable status is raised on the first attempt without sleeping
+        :param monkeypatch:
+        """
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', lambda *args: MockResponse('', 404))
+        monkeypatch.setattr(request_retry, 'sleep', pytest.fail)
+        with pytest.raises(NonRetryableRequestException) as exception:
+            request_retry.request_retry('GET', 'some_url', 7200)
+        assert str(exception.value) == 'Non-retryable response from RPT: 404 .'
+        assert exception.value.status_code == 404
+        assert exception.value.attempts == 1
+        assert exception.value.elapsed < 1
+
+    def test_request_retry_conditional_status_depends_on_method(self, monkeypatch):
+        """
+        Tests that a conditional status is retried for a GET but not for a POST
+        :param monkeypatch:
+        """
+        responses = [MockResponse('', 504), MockResponse('{}', 200)]
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', lambda *args: responses.pop(0))
+        monkeypatch.setattr(request_retry, 'sleep', lambda delay: None)
+        assert request_retry.request_retry('GET', 'some_url', 60).status_code == 200
+
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', lambda *args: MockResponse('', 504))
+        with pytest.raises(NonRetryableRequestException) as exception:
+            request_retry.request_retry('POST', 'some_url', 60)
+        assert exception.value.status_code == 504
+
+    def test_request_retry_retries_bad_gateway_for_every_method(self, monkeypatch):
+        """
+        Tests that a 502 Bad Gateway, sent by a proxy that could not reach RPT, is retried for a PATCH and a
+        POST as well as a GET
+        :param monkeypatch:
+        """
+        monkeypatch.setattr(request_retry, 'sleep', lambda delay: None)
+        for type_of_request in ('GET', 'PATCH', 'POST'):
+            make_request = mock.Mock(side_effect=[MockResponse('', 502), MockResponse('{}', 200)])
+            monkeypatch.setattr(request_retry, 'make_request_based_on_input', make_request)
+            assert request_retry.request_retry(type_of_request, 'some_url', 60).status_code == 200
+            assert make_request.call_count == 2
+
+    def test_request_retry_retries_connection_errors(self, monkeypatch):
+        """
+        Tests that connection errors are retried and read timeouts on a POST are not
+        :param monkeypatch:
+        """
+        outcomes = [requests.exceptions.ConnectionError('Connection refused'), MockResponse('{}', 201)]
+
+        def request_mock(*_args):
+            """
+            A mock for a request that fails to connect once
+            :param _args:
+            :return: Mock Response
+            :rtype: MockResponse
+            """
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', request_mock)
+        monkeypatch.setattr(request_retry, 'sleep', lambda delay: None)
+        assert request_retry.request_retry('POST', 'some_url', 60).status_code == 201
+
+        def read_timeout_mock(*args):
+            """
+            A mock for a request whose response never arrives
+            :param args:
+            """
+            raise requests.exceptions.ReadTimeout('Read timed out')
+
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', read_timeout_mock)
+        with pytest.raises(NonRetryableRequestException) as exception:
+            request_retry.request_retry('POST', 'some_url', 60)
+        assert isinstance(exception.value.__cause__, requests.exceptions.ReadTimeout)
+
+    def test_request_retry_stops_at_command_deadline(self, monkeypatch):
+        """
+        Tests that the command deadline caps both the request timeout and the retry backoff, and that
+        no further attempt is made once it has been spent
+        :param monkeypatch:
+        """
+        request_timeouts = []
+        sleeps = []
+        deadline = Deadline(5)
+
+        def request_mock(*args):
+            """
+            A mock for a request that always fails with a retryable status
+            :param args:
+            :return: Mock Response
+            :rtype: MockResponse
+            """
+            request_timeouts.append(args[5])
+            return MockResponse('', 503)
+
+        def sleep_mock(delay):
+            """
+            A mock for sleep that spends the whole budget
+            :param delay:
+            """
+            sleeps.append(delay)
+            deadline.started -= 5
+
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', request_mock)
+        monkeypatch.setattr(request_retry, 'sleep', sleep_mock)
+        with pytest.raises(DeadlineExceededException) as exception:
+            request_retry.request_retry('GET', 'some_url', 7200, deadline=deadline)
+        assert str(exception.value).startswith('Command timeout of 5s exceeded before GET some_url.')
+        assert len(request_timeouts) == 1
+        assert request_timeouts[0] <= 5
+        assert len(sleeps) == 1
+        assert sleeps[0] <= 5
+
+    def test_request_retry_not_repeated_once_before_retry_finds_it_took_effect(self, monkeypatch):
+        """
+        Tests that a request is not sent again when the before_retry hook reports it already took effect
+        :param monkeypatch:
+        """
+        attempts = []
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input',
+                            lambda *args: attempts.append(args) or MockResponse('', 503))
+        monkeypatch.setattr(request_retry, 'sleep', lambda delay: None)
+        checks = [False, True]
+        assert request_retry.request_retry('POST', 'some_url', 60, headers={'Idempotency-Key': 'key'},
+                                           before_retry=lambda: checks.pop(0)) is None
+        assert len(attempts) == 2
+        assert all(attempt[6] == {'Idempotency-Key': 'key'} for attempt in attempts)
+        assert not checks
+
+    def test_get_request_timeout_per_method(self, monkeypatch):
+        """
+        Tests that the timeout of every attempt is configured per HTTP method
+        :param monkeypatch:
+        """
+        monkeypatch.setattr(configuration, '_CONFIG', configuration.FrozenApplicationConfig(
+            environment={'RPTRC_PERFORMANCE_TIMEOUT_POST': '45'}))
+        assert request_retry.get_request_timeout('POST') == 45
+        assert request_retry.get_request_timeout('GET') == 10
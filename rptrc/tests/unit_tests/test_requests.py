@@ -1,9 +1,21 @@
 """
 Unit tests for requests.py
 """
+import json
+import threading
+import time
+from unittest import mock
+
 import pytest
 
+from rptrc.src.etc import request_retry
+from rptrc.src.etc.deadline import Deadline
+from rptrc.src.etc.exceptions import DeadlineExceededException, FatalException
+from rptrc.src.etc.polling import PollingStrategy
+from rptrc.src.operators import requests as requests_module
 from rptrc.src.operators.requests import Requests
+from rptrc.tests.unit_tests.mock_response import MockResponse
+from rptrc.tests.unit_tests.stand_in_rpt import StandInRpt
 
 VALID_SAMPLE_REQUEST = {
     "id": "876asd9fh",
@@ -20,6 +32,18 @@ VALID_SAMPLE_REQUEST = {
 }
 
 
+@pytest.fixture(name='stand_in_rpt')
+def fixture_stand_in_rpt():
+    """
+    Serves a stand-in RPT Requests service supporting long polling for the duration of a test
+    :return: stand_in_rpt
+    :rtype: StandInRpt
+    """
+    stand_in_rpt = StandInRpt().start()
+    yield stand_in_rpt
+    stand_in_rpt.stop()
+
+
 @pytest.fixture(autouse=True)
 def reset_valid_sample_request():
     """
@@ -85,12 +109,99 @@ class TestRequests:
         :param monkeypatch:
         """
         requests = Requests(dev_mode=True, retry_timeout=7200)
-        monkeypatch.setattr(requests, "post", lambda url, request_body: VALID_SAMPLE_REQUEST)
+        monkeypatch.setattr(requests, "post", lambda url, request_body, **kwargs: VALID_SAMPLE_REQUEST)
         monkeypatch.setattr(requests, "wait_for_the_queued_request_be_resolved",
                             lambda url: VALID_SAMPLE_REQUEST)
         actual_queued_request = requests.create_queued_request(VALID_SAMPLE_REQUEST)
         assert actual_queued_request == VALID_SAMPLE_REQUEST
 
+    def test_create_queued_request_sends_idempotency_key(self, monkeypatch):
+        """
+        Tests that the POST carries an idempotency key derived from the execution ID, pipeline stage and
+        invocation
+        :param monkeypatch:
+        """
+        requests = Requests(dev_mode=True, retry_timeout=7200)
+        monkeypatch.setattr(requests_module.uuid, 'uuid4', lambda: mock.Mock(hex='invocation1'))
+        sent_headers = []
+
+        def post_mock(*args):
+            """
+            A mock for a POST that records the headers sent
+            :param args:
+            :return: Mock Response
+            :rtype: MockResponse
+            """
+            sent_headers.append(args[6])
+            return MockResponse(json.dumps(VALID_SAMPLE_REQUEST), 201)
+
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', post_mock)
+        requests.create_queued_request(dict(VALID_SAMPLE_REQUEST), 'install')
+        expected_key = Requests.build_idempotency_key('01FTZPSYFZ7V3XWMME5BA358QT', 'install', 'invocation1')
+        assert sent_headers == [{'Idempotency-Key': expected_key}]
+        assert expected_key != Requests.build_idempotency_key('01FTZPSYFZ7V3XWMME5BA358QT', 'upgrade', 'invocation1')
+        assert expected_key != Requests.build_idempotency_key('01FTZPSYFZ7V3XWMME5BA358QT', 'install', 'invocation2')
+
+    def test_create_queued_request_retry_reuses_existing_request(self, monkeypatch):
+        """
+        Tests that a POST whose response was lost is not repeated when RPT already holds a Request
+        created with the same idempotency key
+        :param monkeypatch:
+        """
+        requests = Requests(dev_mode=True, retry_timeout=7200)
+        monkeypatch.setattr(requests_module.uuid, 'uuid4', lambda: mock.Mock(hex='invocation1'))
+        posts = []
+        idempotency_key = Requests.build_idempotency_key('01FTZPSYFZ7V3XWMME5BA358QT', 'install', 'invocation1')
+        existing_request = {'id': 'existing', 'status': 'Queued', 'idempotencyKey': idempotency_key}
+        lookups = []
+
+        def lookup_mock(url, retry_timeout):
+            """
+            A mock for the lookup of Requests by idempotency key
+            :param url:
+            :param retry_timeout:
+            :return: Mock Response
+            :rtype: MockResponse
+            """
+            lookups.append((url, retry_timeout))
+            return MockResponse(json.dumps([
+                {'id': 'other', 'status': 'Queued', 'idempotencyKey': 'other'},
+                {'id': 'finished', 'status': 'Timeout', 'idempotencyKey': idempotency_key},
+                existing_request]), 200)
+
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input',
+                            lambda *args: posts.append(args) or MockResponse('', 502))
+        monkeypatch.setattr(request_retry, 'sleep', lambda delay: None)
+        monkeypatch.setattr(requests, 'get_response', lookup_mock)
+        assert requests.create_queued_request(dict(VALID_SAMPLE_REQUEST), 'install') == existing_request
+        assert len(posts) == 1
+        assert lookups == [(f'{requests.requests_url}?idempotencyKey={idempotency_key}', 0)]
+
+    def test_create_queued_request_retry_posts_again_when_no_request_found(self, monkeypatch):
+        """
+        Tests that a failed POST is repeated when no Request was created by the earlier attempt, and that
+        the lookup sends one GET bounded by what is left of the deadline, treated as no Request found when
+        it fails
+        :param monkeypatch:
+        """
+        requests = Requests(dev_mode=True, retry_timeout=7200)
+        responses = [MockResponse('', 502), MockResponse(json.dumps(VALID_SAMPLE_REQUEST), 201)]
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input', lambda *args: responses.pop(0))
+        monkeypatch.setattr(request_retry, 'sleep', lambda delay: None)
+        monkeypatch.setattr(requests, 'get_response', lambda url, retry_timeout: MockResponse('[]', 200))
+        assert requests.create_queued_request(dict(VALID_SAMPLE_REQUEST), 'install')['id'] == '876asd9fh'
+        assert not responses
+
+        requests = Requests(dev_mode=True, retry_timeout=7200, deadline=Deadline(2))
+        monkeypatch.setattr(requests, 'mirror', None)
+        attempts = []
+        monkeypatch.setattr(request_retry, 'make_request_based_on_input',
+                            lambda *args: attempts.append(args) or MockResponse('', 502))
+        monkeypatch.setattr(request_retry, 'sleep', mock.Mock(side_effect=AssertionError('Retried the lookup')))
+        assert requests.find_request_by_idempotency_key('key1') is None
+        assert len(attempts) == 1
+        assert attempts[0][5] <= 2
+
     def test_create_queued_request_try_catch_no_execution_id(self):
         """
         Tests that the try/catch block correctly handles key error if no execution ID provided or other
@@ -124,7 +235,7 @@ class TestRequests:
         :param monkeypatch:
         """
         requests = Requests(dev_mode=True, retry_timeout=7200)
-        monkeypatch.setattr(requests, "post", lambda url, request_body: {'error'})
+        monkeypatch.setattr(requests, "post", lambda url, request_body, **kwargs: {'error'})
         with pytest.raises(Exception) as exception:
             requests.create_queued_request(VALID_SAMPLE_REQUEST)
         expected_exception_value = 'Error found in the request response. ' \
@@ -143,6 +254,100 @@ class TestRequests:
         actual_reserved_request = requests.wait_for_the_queued_request_be_resolved('dummy')
         assert actual_reserved_request == reserved_request
 
+    def test_wait_for_the_queued_request_be_resolved_backs_off(self, monkeypatch):
+        """
+        Tests that the interval between polls of a queued request grows up to the maximum interval
+        :param monkeypatch:
+        """
+        requests = Requests(dev_mode=True, retry_timeout=7200,
+                            polling_strategy=PollingStrategy(min_interval=1, max_interval=5, multiplier=2, jitter=0))
+        statuses = ['Queued'] * 5 + ['Reserved']
+        sleeps = []
+        monkeypatch.setattr(time, 'sleep', sleeps.append)
+        monkeypatch.setattr(requests, "get_request_with_id",
+                            lambda request_id: {**VALID_SAMPLE_REQUEST, "status": statuses.pop(0)})
+        assert requests.wait_for_the_queued_request_be_resolved('dummy')['status'] == 'Reserved'
+        assert sleeps == [1, 2, 4, 5, 5]
+
+    def test_wait_for_request_to_be_resolved_by_long_poll(self, stand_in_rpt):
+        """
+        Tests that a queued request is long polled and resolved as soon as its status changes
+        :param stand_in_rpt:
+        """
+        requests = Requests(dev_mode=True, retry_timeout=7200)
+        requests.requests_url = f'{stand_in_rpt.url}/api/requests'
+        request = stand_in_rpt.add_request({'poolName': 'theFunOne'})
+        threading.Timer(0.2, stand_in_rpt.set_status, (request['id'], 'Reserved'),
+                        {'testEnvironmentId': '9876asrb12'}).start()
+        resolved_request = requests.wait_for_request_to_be_resolved(request['id'], 'auto')
+        assert resolved_request['status'] == 'Reserved'
+        assert resolved_request['testEnvironmentId'] == '9876asrb12'
+        assert stand_in_rpt.gets == 1
+
+    def test_wait_for_request_to_be_resolved_falls_back_to_polling(self):
+        """
+        Tests that waiting falls back to polling when RPT does not support long polling
+        """
+        stand_in_rpt = StandInRpt(long_poll=False).start()
+        try:
+            requests = Requests(dev_mode=True, retry_timeout=7200,
+                                polling_strategy=PollingStrategy(min_interval=0.05, max_interval=0.05))
+            requests.requests_url = f'{stand_in_rpt.url}/api/requests'
+            request = stand_in_rpt.add_request({'poolName': 'theFunOne'})
+            threading.Timer(0.2, stand_in_rpt.set_status, (request['id'], 'Reserved')).start()
+            assert requests.wait_for_request_to_be_resolved(request['id'], 'auto')['status'] == 'Reserved'
+            assert stand_in_rpt.gets > 1
+        finally:
+            stand_in_rpt.stop()
+
+    def test_wait_for_request_to_be_resolved_by_long_poll_aborted(self, stand_in_rpt):
+        """
+        Tests that a long polled request that is aborted is reported as such
+        :param stand_in_rpt:
+        """
+        requests = Requests(dev_mode=True, retry_timeout=7200)
+        requests.requests_url = f'{stand_in_rpt.url}/api/requests'
+        request = stand_in_rpt.add_request({'poolName': 'theFunOne'})
+        threading.Timer(0.1, stand_in_rpt.set_status, (request['id'], 'Aborted')).start()
+        with pytest.raises(FatalException) as exception:
+            requests.wait_for_request_to_be_resolved(request['id'])
+        assert str(exception.value) == 'Request aborted.'
+
+    def test_wait_for_request_to_be_resolved_by_waiter(self, monkeypatch):
+        """
+        Tests that the wait is handed to the waiter on the agent when one is running
+        :param monkeypatch:
+        """
+        requests = Requests(dev_mode=True, retry_timeout=7200)
+        waits = []
+
+        def wait_with_waiter_mock(socket_path, request_id, target_host, deadline):
+            """
+            A mock for a waiter resolving the Request
+            :param socket_path:
+            :param request_id:
+            :param target_host:
+            :param deadline:
+            :return: request
+            :rtype: dict
+            """
+            waits.append((socket_path, request_id, target_host, deadline))
+            return {**VALID_SAMPLE_REQUEST, "status": "Reserved"}
+
+        monkeypatch.setattr(requests_module, 'wait_with_waiter', wait_with_waiter_mock)
+        monkeypatch.setattr(requests, 'get', pytest.fail)
+        assert requests.wait_for_request_to_be_resolved('dummy')['status'] == 'Reserved'
+        assert waits == [(requests.waiter_socket_path, 'dummy', requests.target_host, requests.deadline)]
+
+    def test_wait_for_request_to_be_resolved_invalid_wait_mode(self):
+        """
+        Tests that an unsupported wait mode is rejected
+        """
+        requests = Requests(dev_mode=True, retry_timeout=7200)
+        with pytest.raises(FatalException) as exception:
+            requests.wait_for_request_to_be_resolved('dummy', 'push')
+        assert str(exception.value) == 'Unsupported wait mode: push. Supported wait modes are: auto, poll'
+
     def test_wait_for_the_queued_request_be_resolved_request_timeout(self, monkeypatch):
         """
         Tests that when we wait for a queued request to be resolved, if it times out,
@@ -159,6 +364,34 @@ class TestRequests:
             'Request timed out, there are no available environments. Please try again'
         assert str(exception.value) == expected_exception_value
 
+    def test_wait_for_the_queued_request_be_resolved_command_timeout(self, monkeypatch):
+        """
+        Tests that waiting for a queued request gives up once the command deadline has been spent
+        :param monkeypatch:
+        """
+        deadline = Deadline(15)
+        requests = Requests(dev_mode=True, retry_timeout=7200, deadline=deadline,
+                            polling_strategy=PollingStrategy(min_interval=10, max_interval=10, jitter=0))
+        sleeps = []
+
+        def sleep_mock(duration):
+            """
+            A mock for sleep that moves the deadline on by the duration slept
+            :param duration:
+            """
+            sleeps.append(duration)
+            deadline.started -= duration
+
+        monkeypatch.setattr(time, 'sleep', sleep_mock)
+        queued_request = {**VALID_SAMPLE_REQUEST, "status": "Queued"}
+        monkeypatch.setattr(requests, "get_request_with_id", lambda request_id: queued_request)
+        with pytest.raises(DeadlineExceededException) as exception:
+            requests.wait_for_the_queued_request_be_resolved('dummy')
+        assert str(exception.value).startswith('Command timeout of 15s exceeded before polling queued request dummy.')
+        assert len(sleeps) == 2
+        assert sleeps[0] == 10
+        assert sleeps[1] <= 5
+
     def test_abort_request_by_id_invalid_id_passed(self, monkeypatch):
         """
         Tests that when we abort a request with an invalid ID,
@@ -0,0 +1,151 @@
+"""
+Unit tests for retry_policy.py
+"""
+from configparser import ConfigParser
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from rptrc.src import configuration
+from rptrc.src.etc import retry_policy
+from rptrc.tests.unit_tests.mock_response import MockResponse
+
+
+def build_constants(**performance_settings):
+    """
+    Builds a config with the given settings in the PERFORMANCE section
+    :param performance_settings:
+    :return: constants
+    :rtype: ConfigParser
+    """
+    constants = ConfigParser()
+    constants.read_dict({'PERFORMANCE': performance_settings})
+    return constants
+
+
+class TestRetryPolicy:
+    """
+    Class to run unit tests for retry_policy.py
+    """
+
+    def test_linear_backoff(self):
+        """
+        Tests that the linear policy keeps the original sleep time multiplier
+        """
+        policy = retry_policy.LinearBackoff()
+        assert [policy.next_delay(attempt) for attempt in range(1, 5)] == [5, 10, 15, 20]
+
+    def test_linear_backoff_is_capped(self):
+        """
+        Tests that the linear policy is capped at the configured max delay
+        """
+        policy = retry_policy.build_retry_policy('linear', base_delay=1, max_delay=12)
+        assert [policy.next_delay(attempt) for attempt in range(1, 5)] == [5, 10, 12, 12]
+        assert retry_policy.LinearBackoff().next_delay(20) == retry_policy.DEFAULT_MAX_DELAY
+
+    def test_exponential_backoff_is_capped(self):
+        """
+        Tests that the exponential policy doubles the delay up to the max delay
+        """
+        policy = retry_policy.ExponentialBackoff(base_delay=1, max_delay=10)
+        assert [policy.next_delay(attempt) for attempt in range(1, 7)] == [1, 2, 4, 8, 10, 10]
+
+    def test_exponential_full_jitter_backoff_bounds(self):
+        """
+        Tests that the full jitter policy stays between zero and the exponential ceiling
+        """
+        policy = retry_policy.ExponentialFullJitterBackoff(base_delay=1, max_delay=10)
+        for attempt in range(1, 10):
+            for _ in range(50):
+                assert 0 <= policy.next_delay(attempt) <= min(10, 2 ** (attempt - 1))
+
+    def test_exponential_full_jitter_backoff_spreads_clients(self):
+        """
+        Tests that clients retrying at the same attempt do not all sleep for the same delay
+        """
+        policy = retry_policy.ExponentialFullJitterBackoff(base_delay=1, max_delay=60)
+        assert len({policy.next_delay(6) for _ in range(20)}) > 1
+
+    def test_decorrelated_jitter_backoff_bounds(self):
+        """
+        Tests that the decorrelated jitter policy stays between the base delay and the cap
+        """
+        policy = retry_policy.DecorrelatedJitterBackoff(base_delay=1, max_delay=20)
+        delay = 0
+        for attempt in range(1, 20):
+            next_delay = policy.next_delay(attempt, delay)
+            assert 1 <= next_delay <= min(20, max(1, delay * 3))
+            delay = next_delay
+
+    def test_retry_after_is_honoured(self):
+        """
+        Tests that a Retry-After longer than the policy delay is honoured
+        """
+        policy = retry_policy.ExponentialBackoff(base_delay=1, max_delay=10)
+        assert policy.next_delay(1, retry_after=30) == 30
+        assert policy.next_delay(4, retry_after=2) == 8
+
+    def test_build_retry_policy_unsupported(self):
+        """
+        Tests that an unsupported policy name is rejected
+        """
+        with pytest.raises(Exception) as exception:
+            retry_policy.build_retry_policy('fibonacci')
+        assert str(exception.value) == ('Unsupported retry policy: fibonacci. Supported retry policies are: '
+                                        'linear, exponential, exponential_full_jitter, decorrelated_jitter')
+
+    def test_get_retry_policy_per_method(self, monkeypatch):
+        """
+        Tests that a per method policy takes precedence over the default policy
+        """
+        monkeypatch.setattr(configuration, '_CONFIG',
+                            build_constants(retry_policy='exponential', retry_policy_post='decorrelated_jitter',
+                                            retry_base_delay='2', retry_max_delay='30'))
+        get_policy = retry_policy.get_retry_policy('GET')
+        post_policy = retry_policy.get_retry_policy('POST')
+        assert isinstance(get_policy, retry_policy.ExponentialBackoff)
+        assert isinstance(post_policy, retry_policy.DecorrelatedJitterBackoff)
+        assert (post_policy.base_delay, post_policy.max_delay) == (2, 30)
+
+    def test_get_retry_policy_override(self, monkeypatch):
+        """
+        Tests that the policy named e.g. from the CLI takes precedence over every configured policy
+        """
+        monkeypatch.setattr(configuration, '_CONFIG', build_constants(retry_policy_post='decorrelated_jitter'))
+        assert isinstance(retry_policy.get_retry_policy('POST', 'linear'), retry_policy.LinearBackoff)
+        assert isinstance(retry_policy.get_retry_policy('POST'), retry_policy.DecorrelatedJitterBackoff)
+
+    def test_retry_policy_is_abstract(self):
+        """
+        Tests that a retry policy must compute its delay
+        """
+        with pytest.raises(TypeError):
+            retry_policy.RetryPolicy()  # pylint: disable=abstract-class-instantiated
+
+    def test_parse_retry_after_seconds(self):
+        """
+        Tests that a Retry-After header in seconds is parsed
+        """
+        response = MockResponse('', 503)
+        response.headers = {'Retry-After': '120'}
+        assert retry_policy.parse_retry_after(response) == 120
+
+    def test_parse_retry_after_http_date(self):
+        """
+        Tests that a Retry-After header holding an HTTP date is parsed
+        """
+        response = MockResponse('', 503)
+        response.headers = {'Retry-After': format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60),
+                                                           usegmt=True)}
+        assert 55 <= retry_policy.parse_retry_after(response) <= 60
+
+    def test_parse_retry_after_missing_or_invalid(self):
+        """
+        Tests that a missing or invalid Retry-After header is ignored
+        """
+        response = MockResponse('', 503)
+        assert retry_policy.parse_retry_after(response) is None
+        response.headers = {'Retry-After': 'soon'}
+        assert retry_policy.parse_retry_after(response) is None
+        assert retry_policy.parse_retry_after(None) is None
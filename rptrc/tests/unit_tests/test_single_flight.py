@@ -0,0 +1,142 @@
+"""
+Unit tests for single_flight.py
+"""
+import threading
+import time
+from unittest import mock
+
+from rptrc.src.etc.deadline import Deadline
+from rptrc.src.etc.exceptions import FatalException, NonRetryableRequestException
+from rptrc.src.etc.single_flight import SingleFlight
+from rptrc.src.operators import crud as crud_module
+from rptrc.src.operators.crud import Crud
+from rptrc.tests.unit_tests.mock_response import MockResponse
+
+
+def run_concurrently(single_flight, caller, callers, release):
+    """
+    Runs a caller on several threads once a first one has a call in flight, releasing the call once
+    every other caller is waiting on it, and collects what each caller returned or raised
+    :param single_flight:
+    :param caller: Callable taking no arguments
+    :param callers:
+    :param release: The event the call waits for
+    :return: outcomes
+    :rtype: list
+    """
+    outcomes = {}
+    arrived = []
+
+    def run(index):
+        arrived.append(index)
+        try:
+            outcomes[index] = caller()
+        except FatalException as call_exception:
+            outcomes[index] = call_exception
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(callers)]
+    threads[0].start()
+    deadline = time.monotonic() + 5
+    while not single_flight and time.monotonic() < deadline:
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    while len(arrived) < callers and time.monotonic() < deadline:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return [outcomes[index] for index in range(callers)]
+
+
+class TestSingleFlight:
+    """
+    Class to run unit tests for single_flight.py
+    """
+
+    def test_concurrent_calls_share_one_call(self):
+        """
+        Tests that callers arriving while a call is in flight share its result, each getting a copy
+        """
+        single_flight = SingleFlight()
+        release = threading.Event()
+        call = mock.Mock(side_effect=lambda: release.wait() and {'pools': ['pool1']})
+
+        outcomes = run_concurrently(single_flight, lambda: single_flight.run('url', call), 4, release)
+        assert call.call_count == 1
+        assert outcomes == [{'pools': ['pool1']}] * 4
+        outcomes[0]['pools'].append('pool2')
+        assert outcomes[1] == {'pools': ['pool1']}
+        assert not single_flight
+
+    def test_waiting_callers_share_only_shared_exceptions(self):
+        """
+        Tests that every caller waiting on a call that raised a shared exception gets the exception, that
+        callers waiting on a call that raised any other exception run the call themselves, and that a
+        later call runs again
+        """
+        single_flight = SingleFlight()
+        release = threading.Event()
+
+        def call():
+            release.wait()
+            raise FatalException('RPT is unavailable')
+
+        outcomes = run_concurrently(single_flight, lambda: single_flight.run(
+            'url', call, shared_errors=(FatalException,)), 3, release)
+        assert [str(outcome) for outcome in outcomes] == ['RPT is unavailable'] * 3
+        assert single_flight.run('url', lambda: 'run again') == 'run again'
+
+        release = threading.Event()
+        calls = []
+
+        def call_failing_first():
+            calls.append(threading.current_thread())
+            if len(calls) == 1:
+                release.wait()
+                raise FatalException('Deadline of the first caller exceeded')
+            return 'own result'
+
+        outcomes = run_concurrently(single_flight, lambda: single_flight.run(
+            'url', call_failing_first, shared_errors=(NonRetryableRequestException,)), 3, release)
+        assert sorted(str(outcome) for outcome in outcomes) == [
+            'Deadline of the first caller exceeded', 'own result', 'own result']
+        assert len(calls) == 3
+
+    def test_waiting_caller_runs_the_call_at_its_timeout(self):
+        """
+        Tests that a caller waiting on a call in flight runs the call itself once its own timeout passes,
+        while the call in flight carries on
+        """
+        single_flight = SingleFlight()
+        release = threading.Event()
+        leader = threading.Thread(target=single_flight.run, args=('url', lambda: release.wait() and 'result'))
+        leader.start()
+        while not single_flight:
+            time.sleep(0.001)
+
+        started = time.monotonic()
+        assert single_flight.run('url', lambda: 'own result', timeout=0.05) == 'own result'
+        assert time.monotonic() - started < 1
+        release.set()
+        leader.join()
+        assert not single_flight
+
+    def test_crud_get_coalesces_identical_requests(self, monkeypatch):
+        """
+        Tests that GET requests for the same URL sent at the same time share one request, even when sent
+        by operators of different commands, each with its own deadline
+        :param monkeypatch:
+        """
+        single_flight = SingleFlight()
+        monkeypatch.setattr(crud_module, 'IN_FLIGHT_GETS', single_flight)
+        release = threading.Event()
+        get_response = mock.Mock(side_effect=lambda url: release.wait() and MockResponse('{"poolName": "pool1"}', 200))
+        monkeypatch.setattr(Crud, 'get_response', lambda crud, url: get_response(url))
+
+        url = 'http://rpt/api/pools/name/pool1'
+        outcomes = run_concurrently(single_flight, lambda: Crud(dev_mode=True, deadline=Deadline(10)).get(url),
+                                    3, release)
+        assert outcomes == [{'poolName': 'pool1'}] * 3
+        assert get_response.call_count == 1
@@ -0,0 +1,55 @@
+"""
+Unit tests for status_classification.py
+"""
+import requests
+
+from rptrc.src.etc import status_classification
+from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.etc.status_classification import CONDITIONAL, FATAL, RETRYABLE
+
+
+class TestStatusClassification:
+    """
+    Class to run unit tests for status_classification.py
+    """
+
+    def test_classify_status_code(self):
+        """
+        Tests that status codes are classified from the table
+        """
+        assert status_classification.classify_status_code(404) == FATAL
+        assert status_classification.classify_status_code(409) == FATAL
+        assert status_classification.classify_status_code(422) == FATAL
+        assert status_classification.classify_status_code(429) == RETRYABLE
+        assert status_classification.classify_status_code(503) == RETRYABLE
+        assert status_classification.classify_status_code(502) == RETRYABLE
+        assert status_classification.classify_status_code(504) == CONDITIONAL
+
+    def test_classify_status_code_not_in_table(self):
+        """
+        Tests that status codes missing from the table are classified by their class
+        """
+        assert status_classification.classify_status_code(418) == FATAL
+        assert status_classification.classify_status_code(599) == CONDITIONAL
+        assert status_classification.classify_status_code(204) == RETRYABLE
+
+    def test_classify_exception(self):
+        """
+        Tests that exceptions are classified by their most specific type
+        """
+        assert status_classification.classify_exception(requests.exceptions.ConnectTimeout()) == RETRYABLE
+        assert status_classification.classify_exception(requests.exceptions.ConnectionError()) == RETRYABLE
+        assert status_classification.classify_exception(requests.exceptions.ReadTimeout()) == CONDITIONAL
+        assert status_classification.classify_exception(requests.exceptions.MissingSchema()) == FATAL
+        assert status_classification.classify_exception(FatalException('Unsupported')) == FATAL
+        assert status_classification.classify_exception(ValueError()) == RETRYABLE
+
+    def test_is_retryable(self):
+        """
+        Tests that conditional failures are only retried for idempotent requests
+        """
+        assert status_classification.is_retryable(CONDITIONAL, 'GET')
+        assert not status_classification.is_retryable(CONDITIONAL, 'POST')
+        assert status_classification.is_retryable(CONDITIONAL, 'POST', idempotent=True)
+        assert status_classification.is_retryable(RETRYABLE, 'POST')
+        assert not status_classification.is_retryable(FATAL, 'GET')
@@ -2,10 +2,13 @@
 Unit tests for test_environment.py.
 """
 import os
+import time
 from pathlib import Path
 from unittest import mock
 import pytest
 
+from rptrc.src import configuration
+from rptrc.src.inventory import Inventory
 from rptrc.src.operators.test_environments import TestEnvironments
 from rptrc.src.operators.artifact_properties import ArtifactProperties
 
@@ -310,6 +313,64 @@ class TestTestEnvironment:
         assert test_environment\
             .retrieve_freshest_test_environment('ltg78dv4673pj378cb,rd674nc67kne34vw') == expected_value
 
+    def test_retrieve_freshest_test_environment_in_chunks(self, monkeypatch):
+        """
+        Tests that the ids are sent to RPT in chunks no longer than freshest_chunk_length and that the
+        freshest of the winners of every chunk is returned.
+        :param monkeypatch:
+        """
+        monkeypatch.setattr(configuration, '_CONFIG', configuration.FrozenApplicationConfig({
+            'RPTRC_PERFORMANCE_FRESHEST_CHUNK_LENGTH': '13'}))
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200)
+        winners = {
+            'env1Id,env2Id': {'id': 'env2Id', 'properties': {'version': '2.9.0'}},
+            'env3Id,env4Id': {'id': 'env4Id', 'properties': {'version': '2.10.0-3'}},
+            'env5Id': {},
+        }
+        get = mock.Mock(side_effect=lambda url: winners[url.rsplit('/', 1)[1]])
+        monkeypatch.setattr(test_environment, 'get', get)
+
+        assert test_environment.retrieve_freshest_test_environment('env1Id,env2Id,env3Id,env4Id,env5Id') == {
+            'id': 'env4Id', 'properties': {'version': '2.10.0-3'}}
+        assert get.call_count == 3
+
+        get.side_effect = lambda url: {}
+        with pytest.raises(Exception) as exception:
+            test_environment.retrieve_freshest_test_environment('env1Id,env2Id,env5Id')
+        assert str(exception.value) == 'No test environments with ids "env1Id,env2Id,env5Id" found!'
+
+    def test_retrieve_freshest_test_environment_in_chunks_timeout_stops_requests(self, monkeypatch):
+        """
+        Tests that the requests for the chunks of a retrieval that timed out stop at its timeout rather
+        than carrying on under the deadline of the command.
+        :param monkeypatch:
+        """
+        monkeypatch.setattr(configuration, '_CONFIG', configuration.FrozenApplicationConfig({
+            'RPTRC_PERFORMANCE_FRESHEST_CHUNK_LENGTH': '6', 'RPTRC_PERFORMANCE_SCAN_CONCURRENCY': '3'}))
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=0.05)
+        finished = []
+
+        def request_retry_mock(**kwargs):
+            """
+            A mock for a request that only ends once its deadline expired
+            :param kwargs:
+            """
+            deadline = kwargs['deadline']
+            while not deadline.expired:
+                time.sleep(0.005)
+            finished.append(deadline)
+            deadline.check(f'GET {kwargs["url"]}')
+
+        monkeypatch.setattr('rptrc.src.operators.crud.request_retry', request_retry_mock)
+        started = time.monotonic()
+        with pytest.raises(Exception):
+            test_environment.retrieve_freshest_test_environment('env1Id,env2Id,env3Id')
+        while len(finished) < 3 and time.monotonic() - started < 2:
+            time.sleep(0.005)
+        assert len(finished) == 3
+        assert time.monotonic() - started < 1
+        assert all(deadline.parent is test_environment.deadline for deadline in finished)
+
     def test_retrieve_freshest_test_environment_id_doesnt_exist(self, monkeypatch):
         """
         Tests the retrieve_freshest_test_environment function when test environment
@@ -342,6 +403,61 @@ class TestTestEnvironment:
             'No test environments with ids "" found!'
         assert str(exception.value) == expected_exception_value
 
+    def test_update_details_for_test_environments(self, monkeypatch):
+        """
+        Tests the update_details_for_test_environments function patches every test environment
+        without retrieving it first.
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200)
+        patched_urls = []
+
+        def patch_mock(url, _request_body):
+            """
+            A mock for the patch request
+            :param url:
+            :param _request_body:
+            :return: patch response
+            :rtype: dict
+            """
+            patched_urls.append(url)
+            return {'id': url.rsplit('/', 1)[-1]}
+
+        monkeypatch.setattr(test_environment, "patch", patch_mock)
+        monkeypatch.setattr(test_environment, "get", mock.Mock(side_effect=AssertionError('Unexpected GET')))
+
+        responses = test_environment.update_details_for_test_environments('{}', ['id1', 'id2', 'id3'], 2)
+        assert responses == [{'id': 'id1'}, {'id': 'id2'}, {'id': 'id3'}]
+        assert sorted(patched_urls) == [f'{test_environment.test_environment_url}/id{index}' for index in (1, 2, 3)]
+
+    def test_update_details_for_test_environments_partial_failure(self, monkeypatch):
+        """
+        Tests the update_details_for_test_environments function attempts every test environment
+        and reports all failures together.
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200)
+        patched_urls = []
+
+        def patch_mock(url, _request_body):
+            """
+            A mock for the patch request that fails for two test environments
+            :param url:
+            :param _request_body:
+            :return: patch response
+            :rtype: dict
+            """
+            patched_urls.append(url)
+            if url.endswith(('id1', 'id3')):
+                return {'error': 'Failed'}
+            return {'id': 'id2'}
+
+        monkeypatch.setattr(test_environment, "patch", patch_mock)
+        with pytest.raises(Exception) as exception:
+            test_environment.update_details_for_test_environments('{}', ['id1', 'id2', 'id3'], 3)
+        assert len(patched_urls) == 3
+        assert str(exception.value) == 'Failed to update details of 2 of 3 Test Environments: id1, id3'
+
     def test_retrieve_standby_test_environments(self, monkeypatch):
         """
         Tests the retrieve_standby_test_environments function successful case.
@@ -358,6 +474,95 @@ class TestTestEnvironment:
                                                                     'rd674nc67kne34vw',
                                                                     'ql67ybd45gh4763t']) == expected_value
 
+    def test_retrieve_standby_test_environments_concurrently(self, monkeypatch):
+        """
+        Tests the retrieve_standby_test_environments function keeps the order of the ids passed in
+        when test environments are retrieved concurrently.
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200)
+        test_environments = {
+            f'id{index}': {'id': f'id{index}', 'status': 'Standby' if index % 2 else 'Reserved'}
+            for index in range(10)
+        }
+
+        def retrieve_test_environment_by_id_mock(test_environment_id, refresh=False):
+            """
+            A mock that completes the later ids first
+            :param test_environment_id:
+            :param refresh:
+            :return: test_environment
+            :rtype: dict
+            """
+            assert refresh
+            time.sleep((10 - int(test_environment_id[2:])) * 0.002)
+            return test_environments[test_environment_id]
+
+        monkeypatch.setattr(test_environment, "retrieve_test_environment_by_id", retrieve_test_environment_by_id_mock)
+
+        actual_value = test_environment.retrieve_standby_test_environments(list(test_environments), concurrency=4)
+        assert actual_value == ['id1', 'id3', 'id5', 'id7', 'id9']
+        assert test_environment.test_environment_id is None
+
+    def test_retrieve_standby_test_environments_timeout(self, monkeypatch):
+        """
+        Tests the retrieve_standby_test_environments function fails once the scan exceeds its timeout.
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200)
+        monkeypatch.setattr(test_environment, "retrieve_test_environment_by_id",
+                            lambda test_environment_id, refresh=False: time.sleep(0.2) or SAMPLE_TEST_ENVIRONMENT_1)
+
+        with pytest.raises(Exception) as exception:
+            test_environment.retrieve_standby_test_environments(['id1', 'id2', 'id3'], concurrency=3, timeout=0.01)
+        assert str(exception.value) == 'Timed out after 0.01 seconds with 3 of 3 operations still outstanding'
+
+    def test_retrieve_standby_test_environments_timeout_stops_requests(self, monkeypatch):
+        """
+        Tests that the requests of a scan that timed out stop at the scan timeout rather than carrying on
+        under the deadline of the command.
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200)
+        finished = []
+
+        def request_retry_mock(**kwargs):
+            """
+            A mock for a request that only ends once its deadline expired
+            :param kwargs:
+            """
+            deadline = kwargs['deadline']
+            while not deadline.expired:
+                time.sleep(0.005)
+            finished.append(deadline)
+            deadline.check(f'GET {kwargs["url"]}')
+
+        monkeypatch.setattr('rptrc.src.operators.crud.request_retry', request_retry_mock)
+        started = time.monotonic()
+        with pytest.raises(Exception):
+            test_environment.retrieve_standby_test_environments(['id1', 'id2', 'id3'], concurrency=3, timeout=0.05)
+        while len(finished) < 3 and time.monotonic() - started < 2:
+            time.sleep(0.005)
+        assert len(finished) == 3
+        assert time.monotonic() - started < 1
+        assert all(deadline.parent is test_environment.deadline for deadline in finished)
+
+    def test_retrieve_standby_test_environments_reads_status_from_rpt(self, monkeypatch):
+        """
+        Tests that the status of the test environments scanned is read from RPT even when the inventory
+        holds them, as it may have changed since.
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200, inventory=Inventory([
+            dict(SAMPLE_TEST_ENVIRONMENT_2, status='Standby'), dict(SAMPLE_TEST_ENVIRONMENT_3, status='Standby')]))
+        get = mock.Mock(side_effect=lambda url: [SAMPLE_TEST_ENVIRONMENT_2 if url.endswith(
+            SAMPLE_TEST_ENVIRONMENT_2['id']) else dict(SAMPLE_TEST_ENVIRONMENT_3, status='Reserved')])
+        monkeypatch.setattr(test_environment, 'get', get)
+
+        assert test_environment.retrieve_standby_test_environments(
+            [SAMPLE_TEST_ENVIRONMENT_2['id'], SAMPLE_TEST_ENVIRONMENT_3['id']]) == [SAMPLE_TEST_ENVIRONMENT_2['id']]
+        assert get.call_count == 2
+
     def test_retrieve_standby_test_environments_no_standby_environment(self, monkeypatch):
         """
         Tests the retrieve_standby_test_environments function where no
@@ -445,3 +650,31 @@ class TestTestEnvironment:
 
         result = test_environment.check_if_test_environment_on_specified_version('2.35.168')
         assert result == "false"
+
+    def test_check_if_test_environment_on_specified_version_compares_versions_exactly(self, monkeypatch):
+        """
+        Tests the check_if_test_environment_on_specified_version function compares a version given
+        without an operator exactly, as written.
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200)
+        monkeypatch.setattr(test_environment, "get",
+                            lambda url: [{'properties': {'version': 'v2.35.0'}}])
+
+        for version_for_comparison in ('2.35.0', 'v2.35', 'v2.35.0 '):
+            assert test_environment.check_if_test_environment_on_specified_version(version_for_comparison) == "false"
+        assert test_environment.check_if_test_environment_on_specified_version('v2.35.0') == "true"
+        assert test_environment.check_if_test_environment_on_specified_version('==2.35') == "true"
+
+    def test_check_if_test_environment_on_specified_version_specification(self, monkeypatch):
+        """
+        Tests the check_if_test_environment_on_specified_version function when a version
+        specification is given instead of a version.
+        :param monkeypatch:
+        """
+        test_environment = TestEnvironments(dev_mode=True, retry_timeout=7200)
+        monkeypatch.setattr(test_environment, "get",
+                            lambda url: [{'properties': {'version': '2.35.168'}}])
+
+        assert test_environment.check_if_test_environment_on_specified_version('>=2.35.0,<2.36') == "true"
+        assert test_environment.check_if_test_environment_on_specified_version('2.34.1 || ~=2.36.0') == "false"
@@ -0,0 +1,94 @@
+"""
+Unit tests for transport.py
+"""
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from rptrc.src.etc import transport
+from rptrc.src.etc.transport import SessionRegistry
+
+
+class TestTransport:
+    """
+    Class to run unit tests for transport.py
+    """
+
+    def test_get_session_reuses_session_for_same_host(self):
+        """
+        Tests that requests towards the same host share a single session
+        """
+        registry = SessionRegistry()
+        first_session = registry.get_session('http://rpt.example.com/api/pools')
+        second_session = registry.get_session('http://rpt.example.com/api/test-environments/1234')
+        assert first_session is second_session
+        assert len(registry) == 1
+
+    def test_get_session_separates_hosts(self):
+        """
+        Tests that requests towards different hosts get their own session
+        """
+        registry = SessionRegistry()
+        prod_session = registry.get_session('http://rpt.example.com/api/pools')
+        staging_session = registry.get_session('http://rpt-staging.example.com/api/pools')
+        assert prod_session is not staging_session
+        assert len(registry) == 2
+
+    def test_get_session_separates_proxies(self):
+        """
+        Tests that requests routed through a proxy do not share a pool with direct requests
+        """
+        registry = SessionRegistry()
+        proxy = {'http': 'http://proxy.example.com:8080'}
+        direct_session = registry.get_session('http://rpt.example.com/api/pools')
+        proxied_session = registry.get_session('http://rpt.example.com/api/pools', proxy)
+        assert direct_session is not proxied_session
+        assert proxied_session.proxies['http'] == 'http://proxy.example.com:8080'
+
+    def test_get_session_sets_connection_pool_size(self):
+        """
+        Tests that the connection pool size is applied to the mounted adapters
+        """
+        registry = SessionRegistry(connection_pool_size=25)
+        session = registry.get_session('https://rpt.example.com/api/pools')
+        # pylint: disable=protected-access
+        assert session.get_adapter('https://rpt.example.com')._pool_maxsize == 25
+        assert session.get_adapter('http://rpt.example.com')._pool_maxsize == 25
+
+    def test_get_session_is_thread_safe(self):
+        """
+        Tests that concurrent callers for the same host all receive the same session
+        """
+        registry = SessionRegistry()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            sessions = list(executor.map(lambda _: registry.get_session('http://rpt.example.com/api'), range(32)))
+        assert all(session is sessions[0] for session in sessions)
+        assert len(registry) == 1
+
+    def test_close_empties_registry(self):
+        """
+        Tests that closing the registry drops every session
+        """
+        registry = SessionRegistry()
+        registry.get_session('http://rpt.example.com/api/pools')
+        registry.close()
+        assert len(registry) == 0
+
+    def test_process_wide_registry_is_shared(self):
+        """
+        Tests that the module level helper always hands out the process-wide registry
+        """
+        assert transport.get_registry() is transport.get_registry()
+        assert transport.get_session('http://rpt.example.com/a') is transport.get_session('http://rpt.example.com/b')
+
+    def test_set_session_factory(self):
+        """
+        Tests that a session factory replaces how the process-wide registry creates sessions
+        """
+        stand_in_session = mock.Mock()
+        transport.set_session_factory(lambda proxy: stand_in_session)
+        try:
+            assert transport.get_session('http://rpt.example.com/api/pools') is stand_in_session
+        finally:
+            transport.set_session_factory(None)
+        stand_in_session.close.assert_called_once()
+        assert transport.get_session('http://rpt.example.com/api/pools') is not stand_in_session
@@ -0,0 +1,80 @@
+"""
+Unit tests for versions.py
+"""
+import pytest
+
+from rptrc.src.etc.exceptions import FatalException
+from rptrc.src.etc.versions import parse_version, select_freshest, version_matches
+from rptrc.src.models import TestEnvironment
+
+
+def build_test_environment(name, version):
+    """
+    Builds a test environment on a version
+    :param name:
+    :param version:
+    :return: test_environment
+    :rtype: TestEnvironment
+    """
+    return TestEnvironment.from_json({'id': name, 'name': name, 'properties': {'version': version}})
+
+
+class TestVersions:
+    """
+    Class to run unit tests for versions.py
+    """
+
+    def test_versions_are_ordered(self):
+        """
+        Tests that versions are ordered by release, then build, with pre-releases first and unparsable
+        versions lowest
+        """
+        ordered = ['junk', '2.1.0-rc1', '2.1.0-56', '2.1.0-57-h1a2b3c', '2.1.0', '2.1.0+56', '2.9.0+100',
+                   '2.10.0-1']
+        assert sorted(ordered[::-1], key=parse_version) == ordered
+        assert parse_version('2.1') == parse_version('v2.1.0')
+        assert parse_version('2.1.0-56') != parse_version('2.1.0+56')
+
+    @pytest.mark.parametrize('version, specification, expected', [
+        ('2.1.0-56', '2.1.0-56', True),
+        ('2.1.0-56', '2.1.0-57', False),
+        ('2.1.0', '2.1', False),
+        ('v2.1.0', '2.1.0', False),
+        ('2.1.0', 'v2.1.0', False),
+        ('2.1.0', '==2.1', True),
+        ('v2.1.0', '==2.1.0', True),
+        (None, '2.1.0', False),
+        ('2.1.0-56', '>=2.1.0-50,<2.1.0', True),
+        ('2.1.3', '~=2.1.0', True),
+        ('2.2.0', '~=2.1.0', False),
+        ('2.9.0', '~=2.1', True),
+        ('3.0.0', '~=2.1', False),
+        ('2.1.0-57', '2.1.0-56 || 2.1.0-57', True),
+        ('2.10.0', '!=2.10.0 || <2.9', False),
+        (None, '>0', False),
+    ])
+    def test_version_matches(self, version, specification, expected):
+        """
+        Tests that versions are checked against specifications
+        :param version:
+        :param specification:
+        :param expected:
+        """
+        assert version_matches(version, specification) is expected
+
+    def test_invalid_specification(self):
+        """
+        Tests that a specification with an empty clause is rejected
+        """
+        with pytest.raises(FatalException) as exception:
+            version_matches('1.0.0', '>=1.0.0,')
+        assert str(exception.value) == 'Invalid version specification: ">=1.0.0,"'
+
+    def test_select_freshest(self):
+        """
+        Tests that the test environment on the freshest version is selected, the first passed in winning a tie
+        """
+        test_environments = [build_test_environment('env1', '2.9.0'), build_test_environment('env2', '2.10.0-3'),
+                             build_test_environment('env3', '2.10.0-3'), build_test_environment('env4', None)]
+        assert select_freshest(test_environments).name == 'env2'
+        assert select_freshest([]) is None
@@ -0,0 +1,197 @@
+"""
+Unit tests for waiter.py
+"""
+import socket
+import threading
+
+import pytest
+
+from rptrc.src.etc import waiter
+from rptrc.src.etc.deadline import Deadline
+from rptrc.src.etc.exceptions import FatalException, RetriesExhaustedException
+from rptrc.src.etc.polling import PollingStrategy
+from rptrc.src.etc.waiter import Waiter, WaiterServer
+
+TARGET_HOST = 'http://rpt.example.com'
+
+
+class FakeRequests:
+    """
+    A stand-in for the Requests operator holding the status of every Request
+    """
+    def __init__(self, statuses):
+        self.target_host = TARGET_HOST
+        self.statuses = statuses
+        self.retrieved = []
+
+    def bounded_by(self, _timeout):
+        """
+        Returns this stand-in, whose requests take no time
+        :param _timeout:
+        :return: operator
+        :rtype: FakeRequests
+        """
+        return self
+
+    def get_request_with_id(self, request_id):
+        """
+        Returns the Request with the ID
+        :param request_id:
+        :return: request
+        :rtype: dict
+        """
+        self.retrieved.append(request_id)
+        if request_id not in self.statuses:
+            raise FatalException(f'No Request entity with ID {request_id} was found in RPT')
+        if isinstance(self.statuses[request_id], Exception):
+            raise self.statuses[request_id]
+        return {'id': request_id, 'status': self.statuses[request_id]}
+
+
+@pytest.fixture(name='waiter_server')
+def fixture_waiter_server(tmp_path):
+    """
+    Serves a waiter with a fast sweep on a Unix socket for the duration of a test
+    :param tmp_path:
+    :return: socket_path, fake_requests
+    :rtype: tuple
+    """
+    fake_requests = FakeRequests({'queued': 'Queued'})
+    request_waiter = Waiter(fake_requests, sweep_interval=0.05, polling_strategy=PollingStrategy(0.05, 0.05))
+    socket_path = str(tmp_path / 'waiter.sock')
+    server = WaiterServer(socket_path, request_waiter, max_wait=1)
+    threads = [threading.Thread(target=server.serve_forever, daemon=True),
+               threading.Thread(target=request_waiter.run, daemon=True)]
+    for thread in threads:
+        thread.start()
+    yield socket_path, fake_requests
+    request_waiter.stop()
+    server.shutdown()
+    server.server_close()
+
+
+class TestWaiter:
+    """
+    Class to run unit tests for waiter.py
+    """
+
+    def test_sweep_resolves_requests_that_left_the_queue(self):
+        """
+        Tests that a sweep resolves Requests that left the queue and keeps waiting on queued ones, polling
+        them again once the interval of their backoff passed
+        """
+        fake_requests = FakeRequests({'queued': 'Queued', 'reserved': 'Reserved'})
+        request_waiter = Waiter(fake_requests, polling_strategy=PollingStrategy(2, 30, multiplier=2, jitter=0))
+        queued = request_waiter.register('queued')
+        reserved = request_waiter.register('reserved')
+        assert request_waiter.register('reserved') is reserved
+        assert request_waiter.sweep(1000) == 1
+        assert reserved.wait(0) and reserved.request == {'id': 'reserved', 'status': 'Reserved'}
+        assert not queued.wait(0)
+        assert len(request_waiter) == 1
+
+        assert request_waiter.sweep(1001.9) == 0
+        assert request_waiter.sweep(1002) == 0
+        assert request_waiter.sweep(1005.9) == 0
+        fake_requests.statuses['queued'] = 'Timeout'
+        assert request_waiter.sweep(1006) == 1
+        assert queued.request['status'] == 'Timeout'
+        assert len(request_waiter) == 0
+        assert request_waiter.sweep() == 0
+        assert fake_requests.retrieved == ['queued', 'reserved', 'queued', 'queued']
+
+    def test_sweep_polls_again_requests_not_retrieved_in_time(self):
+        """
+        Tests that a Request whose retrieval ran out of retries or time is polled again later rather
+        than ending the wait
+        """
+        fake_requests = FakeRequests({'queued': RetriesExhaustedException('Failed to execute GET request')})
+        request_waiter = Waiter(fake_requests, polling_strategy=PollingStrategy(2, 30, jitter=0))
+        queued = request_waiter.register('queued')
+        assert request_waiter.sweep(1000) == 0
+        assert not queued.wait(0)
+        fake_requests.statuses['queued'] = 'Reserved'
+        assert request_waiter.sweep(1001.9) == 0
+        assert request_waiter.sweep(1002) == 1
+        assert queued.request == {'id': 'queued', 'status': 'Reserved'}
+
+    def test_sweep_resolves_requests_that_cannot_be_retrieved(self):
+        """
+        Tests that a Request that cannot be retrieved ends the wait with an error
+        """
+        request_waiter = Waiter(FakeRequests({}))
+        missing = request_waiter.register('missing')
+        request_waiter.sweep()
+        assert missing.request is None
+        assert missing.error == 'No Request entity with ID missing was found in RPT'
+
+    def test_wait_with_waiter(self, waiter_server):
+        """
+        Tests that invocations waiting through the waiter receive their Request once it leaves the queue
+        :param waiter_server:
+        """
+        socket_path, fake_requests = waiter_server
+        threading.Timer(0.2, fake_requests.statuses.__setitem__, ('queued', 'Reserved')).start()
+        results = []
+        invocations = [threading.Thread(target=lambda: results.append(
+            waiter.wait_with_waiter(socket_path, 'queued', TARGET_HOST, Deadline(10)))) for _ in range(3)]
+        for invocation in invocations:
+            invocation.start()
+        for invocation in invocations:
+            invocation.join(10)
+        assert results == [{'id': 'queued', 'status': 'Reserved'}] * 3
+
+    def test_wait_with_waiter_error(self, waiter_server):
+        """
+        Tests that an error ending the wait is raised in the invocation
+        :param waiter_server:
+        """
+        socket_path, _ = waiter_server
+        with pytest.raises(FatalException) as exception:
+            waiter.wait_with_waiter(socket_path, 'missing', TARGET_HOST, Deadline(10))
+        assert str(exception.value) == ('Failed to wait for Request missing: '
+                                        'No Request entity with ID missing was found in RPT')
+
+    def test_wait_with_waiter_timeout(self, waiter_server):
+        """
+        Tests that an invocation the waiter did not resolve the Request for within its deadline, or the
+        maximum wait of the waiter, is told to wait by itself
+        :param waiter_server:
+        """
+        socket_path, _ = waiter_server
+        for deadline in (Deadline(5), Deadline()):
+            assert waiter.wait_with_waiter(socket_path, 'queued', TARGET_HOST, deadline) is None
+
+    def test_wait_with_waiter_for_another_host(self, waiter_server):
+        """
+        Tests that an invocation against a host the waiter does not serve waits by itself
+        :param waiter_server:
+        """
+        socket_path, fake_requests = waiter_server
+        assert waiter.wait_with_waiter(socket_path, 'queued', 'http://rpt-staging.example.com', Deadline(10)) is None
+        assert not fake_requests.retrieved
+
+    def test_wait_with_waiter_without_waiter(self, tmp_path):
+        """
+        Tests that an invocation waits by itself when no waiter is running
+        :param tmp_path:
+        """
+        assert waiter.wait_with_waiter(str(tmp_path / 'waiter.sock'), 'queued', TARGET_HOST, Deadline(10)) is None
+        assert waiter.wait_with_waiter(None, 'queued', TARGET_HOST, Deadline(10)) is None
+
+    def test_waiter_server_replaces_stale_socket(self, tmp_path):
+        """
+        Tests that a socket left behind by a stopped waiter is replaced while a running waiter is not
+        :param tmp_path:
+        """
+        socket_path = str(tmp_path / 'waiter.sock')
+        stale_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale_socket.bind(socket_path)
+        stale_socket.close()
+        server = WaiterServer(socket_path, Waiter(FakeRequests({})))
+        try:
+            with pytest.raises(FatalException) as exception:
+                WaiterServer(socket_path, Waiter(FakeRequests({})))
+            assert str(exception.value) == f'Another process is already serving on {socket_path}'
+        finally:
+            server.server_close()